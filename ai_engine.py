@@ -7,15 +7,52 @@ except ImportError:
     OPENAI_AVAILABLE = False
     openai = None
 
-from PyPDF2 import PdfReader
 import re
-from typing import Dict, List, Optional
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional
 import logging
+from llm_cache import DEFAULT_CACHE_PATH, LLMCache, cache_key
+from pdf_extract import DEFAULT_WORKERS as PDF_EXTRACT_WORKERS, PageStream
+from pdf_text_cache import DEFAULT_CACHE_DIR as PDF_TEXT_CACHE_DIR, PDFTextCache, file_hash
+from summarize_pipeline import estimate_tokens, iter_chunks, map_reduce, read_ahead
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bump a template's version whenever its prompt or post-processing changes,
+# so responses cached for the old wording are no longer served
+ENHANCE_TEMPLATE_VERSION = 'enhance-script-v1'
+SUMMARY_TEMPLATE_VERSION = 'summarize-pdf-v1'
+SECTION_TEMPLATE_VERSION = 'summarize-section-v1'
+COMBINE_TEMPLATE_VERSION = 'combine-summaries-v1'
+
+ENHANCE_PARAMS = {
+    'system': "You are an expert educational content creator.",
+    'max_tokens': 1500,
+    'temperature': 0.7
+}
+LESSON_FOOTER = """
+
+==============================
+Generated by NeuroLMS AI
+==============================
+"""
+
+SUMMARY_PARAMS = {
+    'system': "You are an expert document analyzer and educational content creator.",
+    'max_tokens': 1500,
+    'temperature': 0.5
+}
+# Section and combine calls of the map-reduce pipeline for long documents
+SECTION_PARAMS = {
+    'system': "You are an expert document analyzer and educational content creator.",
+    'max_tokens': 400,
+    'temperature': 0.3
+}
+# Documents (and chunks, and groups of partial summaries) are kept under this many tokens per call
+SUMMARY_CHUNK_TOKENS = 3000
+
 class NeuroLMSAI:
     def __init__(self):
         # Initialize OpenAI client
@@ -31,6 +68,89 @@ class NeuroLMSAI:
             self.use_openai = False
             logger.warning("OpenAI library not available. Using fallback methods.")
 
+        # Section summaries of a long PDF requested at once
+        self.summary_concurrency = int(os.getenv('AI_SUMMARY_CONCURRENCY', 4))
+        # Processes extracting the pages of a large PDF (1 extracts in-process); more than CPUs never helps
+        self.pdf_extract_workers = min(int(os.getenv('PDF_EXTRACT_WORKERS', PDF_EXTRACT_WORKERS)),
+                                       os.cpu_count() or 1)
+        # Uploads past these ceilings are analyzed up to them (0 lifts a ceiling)
+        self.pdf_max_pages = int(os.getenv('PDF_MAX_PAGES', 5000)) or None
+        self.pdf_max_bytes = int(float(os.getenv('PDF_MAX_TEXT_MB', 50)) * 1024 * 1024) or None
+        # Page texts of PDFs seen before, by content hash (PDF_TEXT_CACHE_MAX_MB=0 disables)
+        self.pdf_cache = PDFTextCache(
+            directory=os.getenv('PDF_TEXT_CACHE_DIR', PDF_TEXT_CACHE_DIR),
+            max_bytes=int(float(os.getenv('PDF_TEXT_CACHE_MAX_MB', 512)) * 1024 * 1024)
+        )
+        self.model = os.getenv('AI_MODEL', 'gpt-3.5-turbo')
+        # Identical requests are answered from disk instead of the API (AI_CACHE_MAX_MB=0 disables)
+        self.cache = LLMCache(
+            path=os.getenv('AI_CACHE_PATH', DEFAULT_CACHE_PATH),
+            max_bytes=int(float(os.getenv('AI_CACHE_MAX_MB', 256)) * 1024 * 1024),
+            ttl_seconds=float(os.getenv('AI_CACHE_TTL_DAYS', 30)) * 86400
+        )
+
+    def _chat(self, template_version: str, params: Dict[str, any], prompt: str,
+              payload: Dict[str, any]) -> str:
+        """
+        Run one chat completion, served from the response cache when the same
+        template, model, parameters and input were seen before. Failures
+        raise and are never cached.
+        """
+        key = cache_key(template_version, self.model, params, payload)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        response = openai.ChatCompletion.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": params['system']},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=params['max_tokens'],
+            temperature=params['temperature']
+        )
+        content = response.choices[0].message.content.strip()
+        self.cache.put(key, content)
+        return content
+
+    def _chat_stream(self, template_version: str, params: Dict[str, any], prompt: str,
+                     payload: Dict[str, any]) -> Iterator[str]:
+        """
+        As ``_chat``, but yield the completion in pieces as the API produces
+        them. A cached response comes back as one piece. The joined, stripped
+        text is cached once the stream has been read to the end.
+        """
+        key = cache_key(template_version, self.model, params, payload)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        stream = openai.ChatCompletion.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": params['system']},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=params['max_tokens'],
+            temperature=params['temperature'],
+            stream=True
+        )
+        pieces = []
+        for chunk in stream:
+            # The first and last chunks carry only the role / finish reason
+            piece = getattr(chunk.choices[0].delta, 'content', None)
+            if piece:
+                pieces.append(piece)
+                yield piece
+        self.cache.put(key, "".join(pieces).strip())
+
+    def cache_stats(self) -> Dict[str, any]:
+        stats = self.cache.stats()
+        stats['pdf_text'] = self.pdf_cache.stats()
+        return stats
+
     def enhance_script(self, script: str, subject: str = "General") -> str:
         """
         Enhance a teaching script using AI for better educational content
@@ -40,10 +160,33 @@ class NeuroLMSAI:
         else:
             return self._enhance_script_fallback(script, subject)
 
-    def _enhance_script_openai(self, script: str, subject: str) -> str:
-        """Use OpenAI GPT for script enhancement"""
-        try:
-            prompt = f"""
+    def enhance_script_stream(self, script: str, subject: str = "General") -> Iterator[str]:
+        """
+        Enhance a teaching script, yielding the lesson in pieces as the model
+        writes it. Joined, the pieces equal what enhance_script returns.
+
+        Falls back like enhance_script if the API fails before producing any
+        output; a failure mid-stream is raised to the caller.
+        """
+        if self.use_openai:
+            pieces = _strip_stream(self._chat_stream(ENHANCE_TEMPLATE_VERSION, ENHANCE_PARAMS,
+                                                     self._enhance_prompt(script, subject),
+                                                     {'script': script, 'subject': subject}))
+            try:
+                first = next(pieces, "")
+            except Exception as e:
+                logger.error(f"OpenAI enhancement failed: {e}")
+            else:
+                yield self._lesson_header(subject) + first
+                yield from pieces
+                yield LESSON_FOOTER
+                return
+
+        # The fallback is instant; hand it over a line at a time all the same
+        yield from self._enhance_script_fallback(script, subject).splitlines(keepends=True)
+
+    def _enhance_prompt(self, script: str, subject: str) -> str:
+        return f"""
             You are an expert educational content creator for a Learning Management System.
             Transform the following teaching script into an engaging, structured lesson.
 
@@ -62,32 +205,27 @@ class NeuroLMSAI:
             Format the response professionally for learners.
             """
 
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert educational content creator."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1500,
-                temperature=0.7
-            )
-
-            enhanced_content = response.choices[0].message.content.strip()
-
-            return f"""
+    def _lesson_header(self, subject: str) -> str:
+        return f"""
 ==============================
 🤖 NeuroLMS AI-Enhanced Lesson
 ==============================
 
 📚 Subject: {subject}
 
-{enhanced_content}
-
-==============================
-Generated by NeuroLMS AI
-==============================
 """
 
+    def _enhanced_lesson(self, enhanced_content: str, subject: str) -> str:
+        return self._lesson_header(subject) + enhanced_content + LESSON_FOOTER
+
+    def _enhance_script_openai(self, script: str, subject: str) -> str:
+        """Use OpenAI GPT for script enhancement"""
+        try:
+            enhanced_content = self._chat(ENHANCE_TEMPLATE_VERSION, ENHANCE_PARAMS,
+                                          self._enhance_prompt(script, subject),
+                                          {'script': script, 'subject': subject})
+            return self._enhanced_lesson(enhanced_content, subject)
+
         except Exception as e:
             logger.error(f"OpenAI enhancement failed: {e}")
             return self._enhance_script_fallback(script, subject)
@@ -134,47 +272,100 @@ Enhanced by NeuroLMS AI
 ==============================
 """
 
-    def summarize_pdf(self, file_path: str, max_length: int = 1000) -> Dict[str, any]:
+    def summarize_pdf(self, file_path: str, max_length: int = 1000,
+                      content_hash: Optional[str] = None) -> Dict[str, any]:
         """
-        Advanced PDF summarization with AI
+        Advanced PDF summarization with AI. Pages are streamed from the file
+        into the summarizer, so memory does not grow with the document.
+        ``content_hash`` is the file's SHA-256 if the caller already has it
+        (uploads are hashed as they are saved); a file seen before skips
+        text extraction.
         """
         try:
             # Extract text from PDF
-            text = self._extract_pdf_text(file_path)
-            if not text:
+            if content_hash is None and self.pdf_cache.enabled:
+                content_hash = file_hash(file_path)
+            stream = self._pdf_page_stream(file_path, content_hash)
+            pages = (text for text in stream if text.strip())
+            first = next(pages, None)
+            if first is None:
                 return {"error": "Could not extract text from PDF"}
+            pages = chain([first], pages)
 
             if self.use_openai:
-                return self._summarize_pdf_openai(text, max_length)
+                result = self._summarize_pdf_openai(pages, max_length)
             else:
-                return self._summarize_pdf_fallback(text, max_length)
+                result = self._summarize_pdf_fallback(
+                    "\n".join(read_ahead(pages, SUMMARY_CHUNK_TOKENS)).strip(), max_length)
+
+            # Pages the summary did not need still count towards the document's size
+            for _ in pages:
+                pass
+            result["word_count"] = stream.word_count
+            result["pages"] = stream.pages_read
+            result["text_cached"] = stream.cached
+            if stream.truncated:
+                result["truncated"] = True
+            return result
 
         except Exception as e:
             logger.error(f"PDF summarization failed: {e}")
             return {"error": f"Failed to process PDF: {str(e)}"}
 
-    def _extract_pdf_text(self, file_path: str) -> str:
-        """Extract text from PDF file"""
-        try:
-            reader = PdfReader(file_path)
-            text = ""
+    def _pdf_page_stream(self, file_path: str, content_hash: Optional[str] = None) -> PageStream:
+        """Lazily extracted (or cached) page texts, within the configured page and size ceilings"""
+        return PageStream(file_path, self.pdf_extract_workers, self.pdf_max_pages, self.pdf_max_bytes,
+                          cache=self.pdf_cache, content_hash=content_hash)
 
-            for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
+    def _condense_document(self, pages: Iterable[str]) -> Dict[str, any]:
+        """
+        Map-reduce a document too long for one call into section summaries
+        that fit one: pages are chunked, summarized concurrently, and the
+        partial summaries combined level by level.
+        """
+        def summarize(chunk: str) -> str:
+            prompt = f"""
+            Summarize this section of a longer document for a teacher preparing a lesson.
+            Keep every key concept, definition, conclusion and recommendation. At most 250 words.
 
-            return text.strip()
-        except Exception as e:
-            logger.error(f"PDF text extraction failed: {e}")
-            return ""
+            Section:
+            {chunk}
+            """
+            return self._chat(SECTION_TEMPLATE_VERSION, SECTION_PARAMS, prompt, {'text': chunk})
+
+        def combine(partials: List[str]) -> str:
+            joined = "\n\n---\n\n".join(partials)
+            prompt = f"""
+            Combine these summaries of consecutive sections of one document into a single summary.
+            Keep every key concept, definition, conclusion and recommendation. At most 300 words.
 
-    def _summarize_pdf_openai(self, text: str, max_length: int) -> Dict[str, any]:
-        """Use OpenAI for intelligent PDF summarization"""
+            Section summaries:
+            {joined}
+            """
+            return self._chat(COMBINE_TEMPLATE_VERSION, SECTION_PARAMS, prompt, {'partials': partials})
+
+        return map_reduce(iter_chunks(pages, SUMMARY_CHUNK_TOKENS), summarize, combine,
+                          max_tokens=SUMMARY_CHUNK_TOKENS, max_workers=self.summary_concurrency)
+
+    def _summarize_pdf_openai(self, pages: Iterable[str], max_length: int) -> Dict[str, any]:
+        """Use OpenAI for intelligent PDF summarization of an iterable of page texts"""
+        if isinstance(pages, str):
+            # A bare string would be read one character per page
+            raise TypeError("_summarize_pdf_openai takes an iterable of page texts, not a str")
+        pages = iter(pages)
+        head = read_ahead(pages, SUMMARY_CHUNK_TOKENS)
+        joined = "\n".join(head)
+        text = joined.strip()
         try:
-            # Truncate text if too long
-            if len(text) > 8000:
-                text = text[:8000] + "..."
+            chunks = 1
+            content_label = "Document content"
+            document = text
+            if estimate_tokens(joined) > SUMMARY_CHUNK_TOKENS:
+                # Too long for one call: analyze the whole document through section summaries
+                condensed = self._condense_document(chain(head, pages))
+                chunks = condensed['chunks']
+                content_label = "Document content (summarized section by section)"
+                document = "\n\n".join(condensed['partials'])
 
             prompt = f"""
             Analyze this document and provide:
@@ -183,21 +374,11 @@ Enhanced by NeuroLMS AI
             3. Main conclusions or recommendations
             4. 5 multiple-choice quiz questions with answers
 
-            Document content:
-            {text}
+            {content_label}:
+            {document}
             """
 
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert document analyzer and educational content creator."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1500,
-                temperature=0.5
-            )
-
-            analysis = response.choices[0].message.content.strip()
+            analysis = self._chat(SUMMARY_TEMPLATE_VERSION, SUMMARY_PARAMS, prompt, {'text': document})
 
             return {
                 "summary": self._extract_section(analysis, "summary"),
@@ -205,6 +386,7 @@ Enhanced by NeuroLMS AI
                 "conclusions": self._extract_section(analysis, "conclusions"),
                 "quiz_questions": self._extract_quiz_questions(analysis),
                 "word_count": len(text.split()),
+                "chunks": chunks,
                 "ai_generated": True
             }
 
@@ -295,6 +477,23 @@ Enhanced by NeuroLMS AI
             }
         ]
 
+def _strip_stream(pieces: Iterator[str]) -> Iterator[str]:
+    """Stream equivalent of str.strip(): drop leading whitespace, hold back whitespace until more text follows"""
+    started = False
+    pending = ""
+    for piece in pieces:
+        if not started:
+            piece = piece.lstrip()
+            if not piece:
+                continue
+            started = True
+        body = piece.rstrip()
+        if body:
+            yield pending + body
+            pending = piece[len(body):]
+        else:
+            pending += piece
+
 # Global AI instance
 ai_engine = NeuroLMSAI()
 
@@ -303,9 +502,9 @@ def enhance_script(script: str) -> str:
     """Legacy function for backward compatibility"""
     return ai_engine.enhance_script(script)
 
-def summarize_pdf(file_path: str) -> str:
+def summarize_pdf(file_path: str, content_hash: Optional[str] = None) -> str:
     """Legacy function for backward compatibility"""
-    result = ai_engine.summarize_pdf(file_path)
+    result = ai_engine.summarize_pdf(file_path, content_hash=content_hash)
     if "error" in result:
         return f"Error: {result['error']}"
 
@@ -325,5 +524,8 @@ def summarize_pdf(file_path: str) -> str:
     for i, q in enumerate(result.get('quiz_questions', []), 1):
         summary += f"{i}. {q['question']}\n"
 
+    if result.get('truncated'):
+        summary += f"\n⚠️ Document over the size limit: only its first {result['pages']} pages were analyzed.\n"
+
     summary += "\n==============================\n"
     return summary
\ No newline at end of file
@@ -0,0 +1,200 @@
+"""
+Durable background jobs for AI processing.
+
+upload_script and upload_pdf store an ai_job row and return its id at once;
+a small pool of worker threads in each web process claims queued jobs from
+the database, runs the registered handler and writes the result back.
+/ai_jobs/<id> reports progress.
+
+Jobs live in SQLite, so they survive restarts: queued jobs are picked up by
+whichever process polls next, and a job whose worker died mid-run is
+claimed again once its lease runs out, up to ``max_attempts`` times. A
+worker renews the lease (started_at) every third of ``lease_seconds``
+while its handler runs, so only a dead worker's job goes stale, however
+long the job takes. Claiming is a single UPDATE that also
+checks how many jobs are running, so ``max_running`` caps concurrent LLM
+calls across every process sharing the database, not just this one.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed')
+
+# Oldest claimable job: queued, or running on a lease that ran out (its worker died)
+CLAIM_JOB = text("""
+    UPDATE ai_job SET status = 'running', attempts = attempts + 1, started_at = :now, worker = :worker
+    WHERE id = (
+        SELECT id FROM ai_job
+        WHERE status = 'queued' OR (status = 'running' AND started_at < :stale_before)
+        ORDER BY id
+        LIMIT 1
+    )
+    AND (SELECT COUNT(*) FROM ai_job WHERE status = 'running' AND started_at >= :stale_before) < :max_running
+    RETURNING id, kind, payload, attempts
+""")
+
+# Only the worker holding the lease may finish a job
+FINISH_JOB = text("""
+    UPDATE ai_job SET status = :status, result = :result, error = :error, finished_at = :now
+    WHERE id = :id AND worker = :worker AND status = 'running'
+""")
+
+# Heartbeat from the worker running a job; keeps its lease from running out
+RENEW_LEASE = text("""
+    UPDATE ai_job SET started_at = :now
+    WHERE id = :id AND worker = :worker AND status = 'running'
+""")
+
+COUNT_BY_STATUS = text("SELECT status, COUNT(*) FROM ai_job GROUP BY status")
+
+
+class AIJobQueue:
+    """Runs queued ai_job rows with registered handlers on a small thread pool"""
+
+    def __init__(self, engine, workers: int = 2, max_running: int = 4, poll_interval: float = 5.0,
+                 lease_seconds: float = 900.0, max_attempts: int = 3):
+        self.engine = engine
+        self.workers = workers
+        self.max_running = max_running
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.handlers: Dict[str, Callable[[Dict[str, any]], str]] = {}
+        self.completed = 0
+        self.failed = 0
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def register(self, kind: str, handler: Callable[[Dict[str, any]], str]):
+        """``handler(payload)`` does the work for jobs of ``kind`` and returns the result text"""
+        self.handlers[kind] = handler
+
+    def start(self):
+        """Start the worker threads; called on the first notify and by start_background_workers()"""
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'ai-job-worker-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+        logger.info(f"AI job workers started: {self.workers} here, at most {self.max_running} running overall")
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Wake a worker for a freshly committed job"""
+        self.start()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                ran = self.run_one()
+            except Exception as e:
+                logger.error(f"AI job worker error: {e}")
+                ran = False
+            if not ran:
+                # Nothing claimable (or at the concurrency cap); wait for a notify or poll again
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def run_one(self) -> bool:
+        """Claim and run the oldest claimable job. Returns False if none could be claimed."""
+        worker = f"{os.getpid()}:{threading.current_thread().name}"
+        now = datetime.utcnow()
+        with self.engine.begin() as conn:
+            job = conn.execute(CLAIM_JOB, {
+                'now': now,
+                'worker': worker,
+                'stale_before': now - timedelta(seconds=self.lease_seconds),
+                'max_running': self.max_running
+            }).fetchone()
+        if job is None:
+            return False
+
+        status, result, error = 'done', None, None
+        handler = self.handlers.get(job.kind)
+        if job.attempts > self.max_attempts:
+            status, error = 'failed', f"Gave up after {self.max_attempts} interrupted attempts"
+        elif handler is None:
+            status, error = 'failed', f"No handler for job kind {job.kind!r}"
+        else:
+            started = time.perf_counter()
+            finished = threading.Event()
+            heartbeat = threading.Thread(target=self._renew_lease, args=(job.id, worker, finished),
+                                         name=f'ai-job-lease-{job.id}', daemon=True)
+            heartbeat.start()
+            try:
+                result = handler(json.loads(job.payload or '{}'))
+            except Exception as e:
+                logger.error(f"AI job {job.id} ({job.kind}) failed: {e}")
+                status, error = 'failed', str(e)
+            else:
+                logger.info(f"AI job {job.id} ({job.kind}) done in {time.perf_counter() - started:.2f}s")
+            finally:
+                finished.set()
+                heartbeat.join()
+
+        with self.engine.begin() as conn:
+            conn.execute(FINISH_JOB, {'id': job.id, 'worker': worker, 'status': status, 'result': result,
+                                      'error': error, 'now': datetime.utcnow()})
+        if status == 'done':
+            self.completed += 1
+        else:
+            self.failed += 1
+        # Another job may have been waiting on the concurrency cap
+        self._wake.set()
+        return True
+
+    def _renew_lease(self, job_id: int, worker: str, finished: threading.Event):
+        """Push the job's lease forward until its handler returns"""
+        while not finished.wait(self.lease_seconds / 3):
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(RENEW_LEASE, {'id': job_id, 'worker': worker, 'now': datetime.utcnow()})
+            except Exception as e:
+                # The next beat retries; two misses in a row let the job be claimed again
+                logger.warning(f"Could not renew the lease on AI job {job_id}: {e}")
+
+    def counts(self) -> Dict[str, int]:
+        with self.engine.connect() as conn:
+            counts = dict(conn.execute(COUNT_BY_STATUS).fetchall())
+        return {status: counts.get(status, 0) for status in JOB_STATUSES}
+
+    def wait_idle(self, timeout: float = 10.0) -> bool:
+        """Block until no job is queued or running (for tests and shutdown)"""
+        deadline = time.monotonic() + timeout
+        while True:
+            counts = self.counts()
+            if not counts['queued'] and not counts['running']:
+                return True
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.02)
+
+    def stats(self) -> Dict[str, any]:
+        stats = self.counts()
+        stats.update(workers=len(self._threads), max_running=self.max_running,
+                     completed=self.completed, failed=self.failed)
+        return stats
@@ -1,7 +1,12 @@
-from flask import Flask, render_template, request, redirect, session
+from flask import Flask, Response, render_template, request, redirect, session, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import IntegrityError
 from ai_engine import ai_engine, enhance_script, summarize_pdf
-from risk_model import risk_model, calculate_risk
+from risk_model import batch_explanations, batch_versions, risk_model
+from risk_scoring import BackgroundRiskScorer
+from ai_jobs import AIJobQueue
+from pdf_text_cache import save_upload
+import json
 import os
 from werkzeug.security import generate_password_hash, check_password_hash
 from PyPDF2 import PdfReader
@@ -83,6 +88,229 @@ class UserProgress(db.Model):
     # Relationship to Course
     course = db.relationship('Course', backref='user_progress')
 
+class ProgressRiskVersion(db.Model):
+    """
+    Which risk model produced a UserProgress row's risk_score.
+
+    A separate table rather than a user_progress column, so existing
+    databases only need the table created (db.create_all() or
+    migrate_risk_versions.py), not an ALTER of user_progress. model_version
+    is a registry version, 'seed' for the shipped artifact or 'rule_based'.
+    Rows without one predate versioning; the rescore job fills them in.
+    """
+    __tablename__ = 'progress_risk_version'
+    progress_id = db.Column(db.Integer, db.ForeignKey('user_progress.id'), primary_key=True)
+    model_version = db.Column(db.String(64), nullable=False)
+    scored_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ProgressRiskExplanation(db.Model):
+    """
+    Why a UserProgress row got its risk_score: each feature's share of it.
+
+    Written alongside the score by every scoring path, so dashboards read
+    explanations instead of calling the model per row. baseline plus the
+    three contributions add up to the model's expected risk (rule-based
+    scores: baseline 0 and each feature's rule points).
+    """
+    __tablename__ = 'progress_risk_explanation'
+    progress_id = db.Column(db.Integer, db.ForeignKey('user_progress.id'), primary_key=True)
+    baseline = db.Column(db.Float, nullable=False)
+    score_contribution = db.Column(db.Float, nullable=False)
+    attempts_contribution = db.Column(db.Float, nullable=False)
+    time_contribution = db.Column(db.Float, nullable=False)
+
+    LABELS = ('score', 'attempts', 'time')
+
+    @classmethod
+    def from_prediction(cls, progress_id, explanation):
+        return cls(
+            progress_id=progress_id,
+            baseline=explanation['baseline'],
+            score_contribution=explanation['score'],
+            attempts_contribution=explanation['attempts'],
+            time_contribution=explanation['time_taken']
+        )
+
+    @property
+    def contributions(self):
+        """(label, risk points) pairs, largest push towards risk first"""
+        pairs = zip(self.LABELS, (self.score_contribution, self.attempts_contribution, self.time_contribution))
+        return sorted(pairs, key=lambda pair: pair[1], reverse=True)
+
+    @property
+    def top_driver(self):
+        label, value = self.contributions[0]
+        return label if value > 0 else None
+
+    @property
+    def summary(self):
+        return " · ".join(f"{label} {value:+.1f}" for label, value in self.contributions)
+
+    @classmethod
+    def for_progress(cls, progress_rows):
+        """
+        Explanations for scored progress rows, keyed by progress id.
+
+        Rows scored before explanations existed are explained together in one
+        batched model call and stored, so each is only computed once. Only
+        rows whose stored model version is the one explaining them get a
+        backfill; the rest wait for the next rescore to explain them.
+        """
+        scored = [p for p in progress_rows if p.risk_score is not None]
+        if not scored:
+            return {}
+        ids = [p.id for p in scored]
+        explanations = {e.progress_id: e for e in cls.query.filter(cls.progress_id.in_(ids)).all()}
+
+        missing = [p for p in scored if p.id not in explanations]
+        if missing:
+            versions = dict(db.session.query(ProgressRiskVersion.progress_id, ProgressRiskVersion.model_version)
+                            .filter(ProgressRiskVersion.progress_id.in_([p.id for p in missing])))
+            missing = [p for p in missing if p.id in versions]
+        if missing:
+            batch = risk_model.predict_risk_batch(
+                [[p.score, p.attempts, p.time_taken] for p in missing],
+                course_ids=[p.course_id for p in missing], explain=True
+            )
+            added = []
+            for progress, explanation, version in zip(missing, batch_explanations(batch), batch_versions(batch)):
+                if explanation and version == versions[progress.id]:
+                    explanations[progress.id] = cls.from_prediction(progress.id, explanation)
+                    added.append(explanations[progress.id])
+            if added:
+                # A concurrent request may backfill the same rows; its explanations are identical, so keep them
+                columns = cls.__table__.columns.keys()
+                db.session.execute(db.insert(cls).prefix_with('OR IGNORE'),
+                                   [{column: getattr(e, column) for column in columns} for e in added])
+                db.session.commit()
+        return explanations
+
+class LearnerStats(db.Model):
+    """
+    Running aggregates of one learner's quiz scores in one course.
+
+    Updated in place on every quiz submission, so history aggregates and
+    dashboard summaries cost O(1) instead of a scan of UserProgress. Only
+    running sums are stored; each update is a single UPDATE statement, so
+    concurrent submissions from several workers cannot lose an attempt.
+    Attempt k (1-based) contributes k * score to score_index_sum, which
+    gives the least-squares trend of score against attempt number.
+    """
+    __tablename__ = 'learner_stats'
+    __table_args__ = (db.UniqueConstraint('user_id', 'course_id', name='uq_learner_stats_user_course'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0.0)
+    score_sq_sum = db.Column(db.Float, nullable=False, default=0.0)
+    score_index_sum = db.Column(db.Float, nullable=False, default=0.0)
+    last_score = db.Column(db.Float)
+    last_risk_score = db.Column(db.Float)
+    last_seen = db.Column(db.DateTime)
+
+    course = db.relationship('Course')
+
+    @property
+    def mean_score(self):
+        return self.score_sum / self.attempt_count if self.attempt_count else 0.0
+
+    @property
+    def score_variance(self):
+        """Sample variance of the scores (0 until there are two attempts)"""
+        n = self.attempt_count
+        if n < 2:
+            return 0.0
+        return max(self.score_sq_sum - self.score_sum ** 2 / n, 0.0) / (n - 1)
+
+    @property
+    def score_std(self):
+        return self.score_variance ** 0.5
+
+    @property
+    def trend_slope(self):
+        """Score points gained (or lost) per attempt, by least squares over all attempts"""
+        n = self.attempt_count
+        if n < 2:
+            return 0.0
+        # Attempt numbers are 1..n, so their sums have closed forms
+        centered_xy = self.score_index_sum - (n + 1) / 2 * self.score_sum
+        return centered_xy / (n * (n * n - 1) / 12)
+
+    @classmethod
+    def record_attempt(cls, user_id, course_id, score, risk_score=None, seen_at=None):
+        """Fold one quiz attempt into the aggregates; commits with the caller's transaction"""
+        seen_at = seen_at or datetime.utcnow()
+        values = {
+            cls.attempt_count: cls.attempt_count + 1,
+            cls.score_sum: cls.score_sum + score,
+            cls.score_sq_sum: cls.score_sq_sum + score * score,
+            # SET expressions see the old attempt_count, so this attempt's index is count + 1
+            cls.score_index_sum: cls.score_index_sum + (cls.attempt_count + 1) * score,
+            cls.last_score: score,
+            cls.last_risk_score: risk_score,
+            cls.last_seen: seen_at
+        }
+        query = cls.query.filter_by(user_id=user_id, course_id=course_id)
+        if query.update(values, synchronize_session=False):
+            return
+
+        try:
+            # Savepoint so losing a race for the first row doesn't roll back the caller's work
+            with db.session.begin_nested():
+                db.session.add(cls(
+                    user_id=user_id, course_id=course_id, attempt_count=1,
+                    score_sum=score, score_sq_sum=score * score, score_index_sum=score,
+                    last_score=score, last_risk_score=risk_score, last_seen=seen_at
+                ))
+        except IntegrityError:
+            query.update(values, synchronize_session=False)
+
+    @classmethod
+    def for_users(cls, user_ids):
+        """Aggregates for many learners in one query, keyed by (user_id, course_id)"""
+        if not user_ids:
+            return {}
+        return {(s.user_id, s.course_id): s for s in cls.query.filter(cls.user_id.in_(user_ids)).all()}
+
+class AIJob(db.Model):
+    """
+    One queued piece of AI processing (script enhancement, PDF analysis).
+
+    upload_script / upload_pdf create these and return at once; ai_jobs.py
+    workers run them and fill in result or error. payload is the handler's
+    JSON input, attempts counts claims (a job is re-claimed if its worker
+    died mid-run).
+    """
+    __tablename__ = 'ai_job'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'))
+    status = db.Column(db.String(16), nullable=False, default='queued', index=True)
+    payload = db.Column(db.Text, nullable=False)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    worker = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        data = {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+        if self.status == 'done':
+            data['result'] = self.result
+        elif self.status == 'failed':
+            data['error'] = self.error
+        return data
+
 class Enrollment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -90,6 +318,61 @@ class Enrollment(db.Model):
     user = db.relationship('User', backref='enrollments')
     course = db.relationship('Course', backref='enrollments')
 
+# sync scores the attempt inside take_quiz; async stores it pending and scores it in the background
+RISK_SCORING_MODE = os.getenv('RISK_SCORING_MODE', 'sync').lower()
+
+with app.app_context():
+    # Workers start on their first submit/notify, or from start_background_workers();
+    # nothing here touches the database
+    risk_scorer = BackgroundRiskScorer(
+        risk_model, db.engine,
+        workers=int(os.getenv('RISK_SCORING_WORKERS', 2)),
+        sweep_interval=float(os.getenv('RISK_SCORING_SWEEP_SECONDS', 30))
+    )
+    ai_jobs = AIJobQueue(
+        db.engine,
+        workers=int(os.getenv('AI_JOB_WORKERS', 2)),
+        max_running=int(os.getenv('AI_JOB_MAX_RUNNING', 4))
+    )
+
+def _run_enhance_script_job(payload):
+    ai_version = enhance_script(payload['script'])
+    with app.app_context():
+        db.session.add(Script(
+            course_id=payload['course_id'],
+            original_script=payload['script'],
+            ai_script=ai_version
+        ))
+        db.session.commit()
+    return ai_version
+
+def _run_summarize_pdf_job(payload):
+    content_hash = payload.get('sha256')
+    if content_hash and 'mtime_ns' in payload and os.stat(payload['path']).st_mtime_ns != payload['mtime_ns']:
+        # Queued before uploads were named by hash, and replaced by a later upload of the same name
+        content_hash = None
+    return summarize_pdf(payload['path'], content_hash)
+
+ai_jobs.register('enhance_script', _run_enhance_script_job)
+ai_jobs.register('summarize_pdf', _run_summarize_pdf_job)
+
+def enqueue_ai_job(kind, course_id, payload):
+    """Store a job for the AI workers and wake them; returns the committed AIJob"""
+    job = AIJob(kind=kind, user_id=session["user_id"], course_id=course_id, payload=json.dumps(payload))
+    db.session.add(job)
+    db.session.commit()
+    ai_jobs.notify()
+    return job
+
+def start_background_workers():
+    """Resume work a previous run left behind; call once the schema is in place"""
+    with app.app_context():
+        if AIJob.query.filter(AIJob.status.in_(['queued', 'running'])).count():
+            ai_jobs.start()
+        if RISK_SCORING_MODE == 'async':
+            # The scorer's sweep picks up attempts still waiting for a score
+            risk_scorer.start()
+
 # =====================
 # ROUTES
 # =====================
@@ -367,6 +650,17 @@ def risk_dashboard():
     # Get all trainers
     trainers = User.query.filter_by(role="trainer").all()
 
+    # Per-course score history for every monitored student, in one query
+    student_ids = [student.id for trainer in trainers for student in trainer.students]
+    history = LearnerStats.for_users(student_ids)
+
+    # Every monitored attempt and its stored explanation, also one query each
+    progress_by_student = {}
+    for progress in UserProgress.query.filter(UserProgress.user_id.in_(student_ids)).all():
+        progress_by_student.setdefault(progress.user_id, []).append(progress)
+    explanations = ProgressRiskExplanation.for_progress(
+        [progress for records in progress_by_student.values() for progress in records])
+
     # Build trainer data with their students and progress
     trainer_data = []
 
@@ -381,13 +675,15 @@ def risk_dashboard():
 
         for student in students:
             # Get all UserProgress records for this student
-            progress_records = UserProgress.query.filter_by(user_id=student.id).all()
+            progress_records = progress_by_student.get(student.id, [])
 
             for progress in progress_records:
                 course = Course.query.get(progress.course_id)
 
                 # Calculate risk level
-                if progress.risk_score < 40:
+                if progress.risk_score is None:
+                    risk_level = "PENDING"
+                elif progress.risk_score < 40:
                     risk_level = "LOW"
                 elif progress.risk_score < 70:
                     risk_level = "MEDIUM"
@@ -399,7 +695,9 @@ def risk_dashboard():
                     "course_name": course.title if course else "Unknown Course",
                     "score": progress.score,
                     "risk_score": progress.risk_score,
-                    "risk_level": risk_level
+                    "risk_level": risk_level,
+                    "history": history.get((student.id, progress.course_id)),
+                    "explanation": explanations.get(progress.id)
                 })
 
         if trainer_info["students"]:  # Only add trainer if they have students with progress
@@ -429,10 +727,25 @@ def my_trainees():
     # Get all students assigned to this trainer
     trainees = trainer.students
 
+    # Running per-course aggregates, read without scanning UserProgress
+    trainee_ids = [trainee.id for trainee in trainees]
+    trainee_history = {}
+    for stats in LearnerStats.for_users(trainee_ids).values():
+        trainee_history.setdefault(stats.user_id, []).append(stats)
+
+    # What drives each trainee's latest risk score per course, from stored explanations
+    latest_ids = db.session.query(db.func.max(UserProgress.id)).filter(
+        UserProgress.user_id.in_(trainee_ids)).group_by(UserProgress.user_id, UserProgress.course_id)
+    latest = UserProgress.query.filter(UserProgress.id.in_(latest_ids)).all() if trainee_ids else []
+    explanations = ProgressRiskExplanation.for_progress(latest)
+    latest_explanations = {(p.user_id, p.course_id): explanations[p.id] for p in latest if p.id in explanations}
+
     return render_template(
         "my_trainees.html",
         trainer=trainer,
         trainees=trainees,
+        trainee_history=trainee_history,
+        latest_explanations=latest_explanations,
         session=session
     )
 
@@ -445,26 +758,49 @@ def upload_script(course_id):
     if request.method == "POST":
         script_text = request.form["script"]
 
-        ai_version = enhance_script(script_text)
+        # The LLM round-trip runs on an AI job worker; the Script row is saved when it finishes
+        job = enqueue_ai_job('enhance_script', course_id, {'course_id': course_id, 'script': script_text})
 
-        new_script = Script(
-            course_id=course_id,
-            original_script=script_text,
-            ai_script=ai_version
-        )
+        return render_template("ai_job.html", job=job, title="AI Script", session=session)
 
-        db.session.add(new_script)
-        db.session.commit()
+    # The page streams the lesson from upload_script_stream; without JavaScript the form queues a job
+    return render_template("upload_script.html", course_id=course_id, session=session)
 
-        return f"<pre>{ai_version}</pre>"
+def _sse(data, event=None):
+    """One server-sent event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
 
-    return """
-        <h2>Upload Script</h2>
-        <form method="POST">
-            <textarea name="script" rows="10" cols="50"></textarea><br><br>
-            <button type="submit">Generate AI Script</button>
-        </form>
-    """
+@app.route("/upload_script/<int:course_id>/stream", methods=["POST"])
+def upload_script_stream(course_id):
+
+    if session.get("role") != "trainer":
+        return "Unauthorized Access"
+
+    script_text = request.form["script"]
+
+    def events():
+        # Sent before the model is called, so the browser gets its first byte right away
+        yield ": generating\n\n"
+        pieces = []
+        try:
+            for piece in ai_engine.enhance_script_stream(script_text):
+                pieces.append(piece)
+                yield _sse({"text": piece})
+        except Exception as e:
+            yield _sse({"error": str(e)}, event="error")
+            return
+
+        # Saved only once the whole lesson has arrived; a closed tab stops generation and saves nothing
+        with app.app_context():
+            new_script = Script(course_id=course_id, original_script=script_text, ai_script="".join(pieces))
+            db.session.add(new_script)
+            db.session.commit()
+            script_id = new_script.id
+        yield _sse({"script_id": script_id}, event="done")
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.route("/upload_pdf/<int:course_id>", methods=["GET", "POST"])
 def upload_pdf(course_id):
@@ -476,15 +812,14 @@ def upload_pdf(course_id):
         file = request.files["pdf"]
 
         if file:
-            if not os.path.exists("uploads"):
-                os.makedirs("uploads")
-
-            path = os.path.join("uploads", file.filename)
-            file.save(path)
+            # Named by its hash as it is written, so a later upload never replaces a queued job's
+            # file and a file uploaded before skips text extraction
+            path, content_hash = save_upload(file.stream, "uploads")
 
-            ai_output = summarize_pdf(path)
+            # Text extraction and analysis run on an AI job worker
+            job = enqueue_ai_job('summarize_pdf', course_id, {'path': path, 'sha256': content_hash})
 
-            return f"<pre>{ai_output}</pre>"
+            return render_template("ai_job.html", job=job, title="PDF Analysis", session=session)
 
     return """
         <h2>Upload PDF</h2>
@@ -494,6 +829,16 @@ def upload_pdf(course_id):
         </form>
     """
 
+@app.route("/ai_jobs/<int:job_id>")
+def ai_job_status(job_id):
+
+    job = db.session.get(AIJob, job_id)
+    if not job or job.user_id != session.get("user_id"):
+        # The job page polls this with fetch().json(), so refuse in JSON
+        return jsonify({"error": "Unauthorized Access"}), 403
+
+    return jsonify(job.to_dict())
+
 @app.route("/upload_note/<int:course_id>", methods=["GET", "POST"])
 def upload_note(course_id):
 
@@ -590,8 +935,12 @@ def take_quiz(course_id):
         attempts = int(request.form.get("attempts", 1))
         time_taken = float(request.form.get("time_taken", 0))
 
-        # Calculate risk
-        risk = calculate_risk(score, attempts, time_taken)
+        # Calculate risk (and its explanation) now, or leave it pending for the background scorer
+        if RISK_SCORING_MODE == 'async':
+            risk = None
+        else:
+            prediction = risk_model.predict_risk(score, attempts, time_taken, course_id=course_id, explain=True)
+            risk = prediction['risk_score']
 
         # Store in UserProgress
         progress = UserProgress(
@@ -604,8 +953,25 @@ def take_quiz(course_id):
         )
 
         db.session.add(progress)
+        if risk is not None:
+            db.session.flush()
+            # merge, not add: SQLite reuses the ids of deleted progress rows
+            db.session.merge(ProgressRiskVersion(
+                progress_id=progress.id,
+                model_version=prediction.get('model_version', prediction['method']),
+                scored_at=datetime.utcnow()
+            ))
+            # Same transaction as the score, replacing any explanation left by a deleted row
+            if 'explanation' in prediction:
+                db.session.merge(ProgressRiskExplanation.from_prediction(progress.id, prediction['explanation']))
+            else:
+                ProgressRiskExplanation.query.filter_by(progress_id=progress.id).delete()
+        LearnerStats.record_attempt(session["user_id"], course_id, score, risk)
         db.session.commit()
 
+        if risk is None:
+            risk_scorer.submit(progress.id)
+
         return render_template(
             "quiz_result.html",
             course=course,
@@ -613,6 +979,7 @@ def take_quiz(course_id):
             correct_count=correct_count,
             total_count=total_count,
             risk=risk,
+            progress_id=progress.id,
             session=session
         )
 
@@ -629,6 +996,18 @@ def take_quiz(course_id):
         session=session
     )
 
+@app.route("/risk_status/<int:progress_id>")
+def risk_status(progress_id):
+
+    progress = UserProgress.query.get(progress_id)
+    if not progress or progress.user_id != session.get("user_id"):
+        return jsonify({"error": "Unauthorized Access"}), 403
+
+    if progress.risk_score is None:
+        return jsonify({"status": "pending"})
+
+    return jsonify({"status": "done", "risk_score": progress.risk_score})
+
 # =====================
 # ADMIN ROUTES
 # =====================
@@ -660,6 +1039,15 @@ def admin_trainers_trainees():
         session=session
     )
 
+@app.route("/admin/ai_cache")
+def admin_ai_cache():
+    """Hit/miss counters and size of the LLM response cache and the PDF text cache"""
+
+    if session.get("role") != "admin":
+        return "Unauthorized Access"
+
+    return jsonify(ai_engine.cache_stats())
+
 # =====================
 # ENROLLMENT ROUTE
 # =====================
@@ -713,6 +1101,10 @@ if __name__ == "__main__":
 
         db.session.commit()
 
+    # With the debug reloader only the serving child runs the workers
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_workers()
+
     app.run(debug=True)
 
     # Add secure password hashing system
\ No newline at end of file
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark for PDF text extraction.
+
+Generates a text-heavy PDF and times the original serial page loop against
+pdf_extract.extract_pages with increasing worker counts. Results are written
+as JSON so builds can be compared:
+
+    python benchmark_pdf_extraction.py                  # 400 pages -> pdf_benchmark.json
+    python benchmark_pdf_extraction.py --pages 1000 --workers 1 2 4 8
+
+Each measurement keeps the best of --repeats runs. The speedup is bounded by
+the number of CPUs, which is recorded in the JSON.
+"""
+
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime
+
+from PyPDF2 import PageObject, PdfReader, PdfWriter
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from pdf_extract import extract_pages
+
+PAGES = 400
+LINES_PER_PAGE = 45
+WORKER_COUNTS = [1, 2, 4]
+REPEATS = 3
+
+
+def make_text_pdf(path, page_texts):
+    """Write a PDF with one page per entry of ``page_texts`` (lines split on newlines)"""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica')
+    }))
+    for text in page_texts:
+        page = PageObject.create_blank_page(width=612, height=792)
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font})
+        })
+        lines = [line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+                 for line in text.split('\n')]
+        stream = DecodedStreamObject()
+        stream.set_data(("BT /F1 10 Tf 14 TL 40 760 Td " +
+                         " ".join(f"({line}) '" for line in lines) + " ET").encode('latin-1'))
+        page[NameObject('/Contents')] = writer._add_object(stream)
+        writer.add_page(page)
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+
+def sample_page(n):
+    return "\n".join(f"Page {n} line {line}: fractions are parts of a whole, ratios compare two quantities."
+                     for line in range(LINES_PER_PAGE))
+
+
+def serial_extract(file_path):
+    """The extraction loop ai_engine used before pdf_extract"""
+    reader = PdfReader(file_path)
+    text = ""
+    for page in reader.pages:
+        page_text = page.extract_text()
+        if page_text:
+            text += page_text + "\n"
+    return text.strip()
+
+
+def _best(target, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = target()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default='pdf_benchmark.json')
+    parser.add_argument('--pages', type=int, default=PAGES)
+    parser.add_argument('--workers', type=int, nargs='+', default=WORKER_COUNTS)
+    parser.add_argument('--repeats', type=int, default=REPEATS, help='runs per measurement; the best is kept')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'benchmark.pdf')
+    print(f"Generating a {args.pages}-page PDF...")
+    make_text_pdf(path, [sample_page(n) for n in range(args.pages)])
+
+    print("Benchmarking the serial loop...")
+    serial_seconds, expected = _best(lambda: serial_extract(path), args.repeats)
+    results = {'serial': {'seconds': round(serial_seconds, 4),
+                          'pages_per_second': round(args.pages / serial_seconds, 1)}}
+
+    for workers in args.workers:
+        print(f"Benchmarking extract_pages with {workers} worker(s)...")
+        seconds, pages = _best(lambda: extract_pages(path, workers), args.repeats)
+        assert "\n".join(page for page in pages if page).strip() == expected, "extracted text differs"
+        results[f'workers_{workers}'] = {
+            'seconds': round(seconds, 4),
+            'pages_per_second': round(args.pages / seconds, 1),
+            'speedup': round(serial_seconds / seconds, 2)
+        }
+
+    report = {
+        'benchmark': 'pdf_extraction',
+        'created_at': datetime.utcnow().isoformat(),
+        'pages': args.pages,
+        'file_bytes': os.path.getsize(path),
+        'repeats': args.repeats,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'results': results
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"\n✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
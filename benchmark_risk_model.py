@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmark for risk scoring.
+
+Measures single-call predict_risk latency (ML and rule-based paths), batch
+throughput, model load time and RSS, and training time vs. n_estimators.
+Results are written as JSON so builds can be compared:
+
+    python benchmark_risk_model.py                      # full run -> risk_benchmark.json
+    python benchmark_risk_model.py --quick              # skip 1M rows and large forests
+    python benchmark_risk_model.py --compare old.json   # exit 1 on >20% regressions
+
+Each measurement keeps the best of --repeats runs. Only compare results taken
+on the same otherwise idle machine; the environment is recorded in the JSON.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Benchmarks drive training explicitly
+os.environ.setdefault('RISK_MODEL_TRAINING_MODE', 'off')
+
+import numpy as np
+
+from risk_model import RiskAssessmentModel, measure_inference_latency
+
+SEED = 1234
+SINGLE_CALLS = 2000
+BATCH_SIZES = [1_000, 100_000, 1_000_000]
+ESTIMATOR_COUNTS = [10, 50, 100, 200]
+REPEATS = 3
+
+# Metric name suffixes where a larger value is an improvement
+HIGHER_IS_BETTER = ('rows_per_second',)
+
+# Run in a fresh interpreter so load time and RSS are not polluted by this process
+_LOAD_PROBE = """
+import json, os, resource, time
+os.environ['RISK_MODEL_TRAINING_MODE'] = 'off'
+started = time.perf_counter()
+import risk_model
+loaded = time.perf_counter() - started
+risk_model.risk_model.predict_risk(55, 2, 200)
+with open('/proc/self/status') as f:
+    rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+print(json.dumps({
+    'import_and_load_seconds': round(loaded, 4),
+    'model_load_seconds': risk_model.risk_model.timings['load_seconds'],
+    'rss_mb': round(rss_kb / 1024, 1),
+    'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    'model_type': risk_model.risk_model.get_model_info()['model_type'],
+    'model_version': risk_model.risk_model.model_version
+}))
+"""
+
+
+def _feature_rows(n, rng):
+    return np.column_stack([
+        np.round(rng.uniform(0, 100, n), 2),
+        rng.integers(1, 7, n),
+        np.round(rng.uniform(30, 700, n))
+    ])
+
+
+def _percentiles(samples):
+    samples = np.asarray(samples) * 1e6
+    return {
+        'p50_us': round(float(np.percentile(samples, 50)), 2),
+        'p99_us': round(float(np.percentile(samples, 99)), 2),
+        'mean_us': round(float(samples.mean()), 2)
+    }
+
+
+def _best_of(runs):
+    # Lowest of each metric across repeats filters out scheduler noise
+    return {key: min(run[key] for run in runs) for key in runs[0]}
+
+
+def bench_single_call(model, rng, repeats=REPEATS):
+    """predict_risk latency on the ML path (uncached and cached) and the rule-based path"""
+    rows = _feature_rows(SINGLE_CALLS, rng)
+    results = {}
+
+    def timed(target):
+        runs = []
+        for _ in range(repeats):
+            samples = []
+            for score, attempts, time_taken in rows:
+                started = time.perf_counter()
+                target.predict_risk(score, attempts, time_taken)
+                samples.append(time.perf_counter() - started)
+            runs.append(_percentiles(samples))
+        return _best_of(runs)
+
+    model.cache.maxsize = 0
+    results['ml_uncached'] = timed(model)
+    model.cache.maxsize = 4096
+    model.cache.invalidate()
+    timed(model)
+    results['ml_cached'] = timed(model)
+
+    rule_based = RiskAssessmentModel()
+    rule_based._install(None, None)
+    results['rule_based'] = timed(rule_based)
+    return results
+
+
+def bench_batch(model, rng, sizes, repeats=REPEATS):
+    results = {}
+    for size in sizes:
+        X = _feature_rows(size, rng)
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            model.predict_risk_batch(X)
+            timings.append(time.perf_counter() - started)
+        elapsed = min(timings)
+        results[str(size)] = {
+            'seconds': round(elapsed, 4),
+            'rows_per_second': round(size / elapsed, 1)
+        }
+    return results
+
+
+def bench_load(repeats=REPEATS):
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, '-c', _LOAD_PROBE],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    best = _best_of([{k: v for k, v in run.items() if isinstance(v, (int, float))} for run in runs])
+    return dict(runs[-1], **best)
+
+
+def bench_training(counts, tmp_dir, repeats=REPEATS):
+    results = {}
+    X = _feature_rows(1000, np.random.default_rng(SEED))
+    for n_estimators in counts:
+        runs = []
+        for attempt in range(repeats):
+            model = RiskAssessmentModel()
+            model._install(None, None)
+            model.artifact_path = os.path.join(tmp_dir, f'bench_{n_estimators}_{attempt}', 'risk_model.nlrm')
+            model.hyperparameters['n_estimators'] = n_estimators
+            model.train_model()
+            arrays = model.model.arrays
+            runs.append({
+                'train_seconds': model.timings['train_seconds'],
+                'model_bytes': int(sum(array.nbytes for array in arrays.values())),
+                **measure_inference_latency(model.model, model.scaler, X)
+            })
+        results[str(n_estimators)] = _best_of(runs)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline, current, threshold):
+    """Print metric ratios against a baseline; return the names that regressed"""
+    old, new = _flatten(baseline['results']), _flatten(current['results'])
+    regressions = []
+    for name in sorted(set(old) & set(new)):
+        if not old[name]:
+            continue
+        ratio = new[name] / old[name]
+        worse = ratio < 1 - threshold if name.endswith(HIGHER_IS_BETTER) else ratio > 1 + threshold
+        flag = '❌' if worse else '  '
+        print(f"{flag} {name:<55} {old[name]:>14} -> {new[name]:>14}  ({ratio:.2f}x)")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default='risk_benchmark.json')
+    parser.add_argument('--quick', action='store_true', help='skip 1M-row batches and 200-tree training')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative regression')
+    parser.add_argument('--repeats', type=int, default=REPEATS, help='runs per measurement; the best is kept')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    rng = np.random.default_rng(SEED)
+    model = RiskAssessmentModel()
+    if not model.is_trained:
+        print("No trained model found; training one for the benchmark...")
+        model.artifact_path = os.path.join(tmp_dir, 'serving', 'risk_model.nlrm')
+        model.train_model()
+
+    sizes = BATCH_SIZES[:-1] if args.quick else BATCH_SIZES
+    counts = ESTIMATOR_COUNTS[:-1] if args.quick else ESTIMATOR_COUNTS
+
+    print("Benchmarking single-call latency...")
+    single = bench_single_call(model, rng, args.repeats)
+    print("Benchmarking batch throughput...")
+    batch = bench_batch(model, rng, sizes, args.repeats)
+    print("Benchmarking model load...")
+    load = bench_load(args.repeats)
+    print("Benchmarking training...")
+    training = bench_training(counts, tmp_dir, args.repeats)
+
+    report = {
+        'benchmark': 'risk_model',
+        'created_at': datetime.utcnow().isoformat(),
+        'git_commit': _git_commit(),
+        'repeats': args.repeats,
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'model': {
+            'version': model.model_version,
+            'type': model.get_model_info()['model_type'],
+            'n_estimators': model.model.n_estimators
+        },
+        'results': {
+            'single_call': single,
+            'batch': batch,
+            'load': load,
+            'training': training
+        }
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report['results'], indent=2))
+    print(f"\n✅ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nComparing against {args.compare} ({baseline.get('git_commit')}):")
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
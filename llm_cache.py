@@ -0,0 +1,210 @@
+"""
+Persistent, content-addressed cache for LLM responses.
+
+Entries live in a small SQLite file so every web worker (and restarts)
+share them. The key is a SHA-256 of everything that determines the
+response: the prompt template version, the model, its parameters and the
+input. Identical requests therefore hit, while changing any of them (for
+example bumping a template version after editing the prompt) misses
+without having to clear the cache.
+
+Values are zlib-compressed JSON. Entries older than the TTL are treated as
+misses and dropped; when the stored bytes exceed the budget the least
+recently used entries are evicted.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join('instance', 'llm_cache.db')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 30 * 86400
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS llm_cache (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_access REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0
+    )
+"""
+ACCESS_INDEX = "CREATE INDEX IF NOT EXISTS ix_llm_cache_last_access ON llm_cache (last_access)"
+
+# Keep the most recently used entries that fit in the budget, drop the rest
+EVICT_LRU = """
+    DELETE FROM llm_cache WHERE key IN (
+        SELECT key FROM (
+            SELECT key, SUM(size) OVER (ORDER BY last_access DESC, key) AS running FROM llm_cache
+        ) WHERE running > ?
+    )
+"""
+
+
+def cache_key(template_version: str, model: str, params: Dict[str, any], payload: Dict[str, any]) -> str:
+    """Content address of one LLM request"""
+    material = json.dumps({
+        'template': template_version,
+        'model': model,
+        'params': params,
+        'input': payload
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """SQLite-backed response cache with TTL and size-bounded LRU eviction"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS, compress_level: int = 6):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.compress_level = compress_level
+        self.clock = time.time
+        self._lock = threading.Lock()
+        self._ready = False
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.expired = 0
+        self.evictions = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(SCHEMA)
+                    conn.execute(ACCESS_INDEX)
+                    conn.commit()
+                    self._ready = True
+        return conn
+
+    def get(self, key: str) -> Optional[any]:
+        """Cached value for ``key``, or None on a miss (including expired entries)"""
+        if not self.enabled:
+            return None
+        if not os.path.exists(self.path):
+            self.misses += 1
+            return None
+        now = self.clock()
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    conn.commit()
+                    self.expired += 1
+                    row = None
+                if row is None:
+                    self.misses += 1
+                    return None
+                conn.execute("UPDATE llm_cache SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key))
+                conn.commit()
+            finally:
+                conn.close()
+            value = json.loads(zlib.decompress(row[0]).decode('utf-8'))
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            # A broken cache must never break content generation; treat it as a miss
+            logger.warning(f"LLM cache read failed: {e}")
+            self.errors += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: any):
+        """Store a JSON-serialisable ``value``, then evict down to the byte budget"""
+        if not self.enabled:
+            return
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8'), self.compress_level)
+        if len(blob) > self.max_bytes:
+            return
+        now = self.clock()
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = self._connect()
+            try:
+                conn.execute("INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, last_access) "
+                             "VALUES (?, ?, ?, ?, ?)", (key, blob, len(blob), now, now))
+                evicted = conn.execute(EVICT_LRU, (self.max_bytes,)).rowcount
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache write failed: {e}")
+            self.errors += 1
+            return
+        self.stores += 1
+        self.evictions += evicted
+
+    def purge_expired(self) -> int:
+        """Delete every entry past its TTL; returns how many were removed"""
+        if not self.ttl_seconds or not os.path.exists(self.path):
+            return 0
+        conn = self._connect()
+        try:
+            removed = conn.execute("DELETE FROM llm_cache WHERE created_at < ?",
+                                   (self.clock() - self.ttl_seconds,)).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        self.expired += removed
+        return removed
+
+    def clear(self):
+        if os.path.exists(self.path):
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM llm_cache")
+                conn.commit()
+            finally:
+                conn.close()
+
+    def stats(self) -> Dict[str, any]:
+        """Hit/miss counters for this process plus the shared cache's size"""
+        lookups = self.hits + self.misses
+        stats = {
+            'enabled': self.enabled,
+            'path': self.path,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'stores': self.stores,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'errors': self.errors,
+            'entries': 0,
+            'bytes': 0,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds
+        }
+        if self.enabled and os.path.exists(self.path):
+            try:
+                conn = self._connect()
+                try:
+                    entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+                finally:
+                    conn.close()
+                stats.update(entries=entries, bytes=size)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache stats failed: {e}")
+        return stats
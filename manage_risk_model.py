@@ -0,0 +1,170 @@
+import json
+import os
+import sys
+
+# This CLI trains explicitly; don't let the import kick off background training
+os.environ.setdefault('RISK_MODEL_TRAINING_MODE', 'off')
+from risk_model import risk_model
+
+def show_info():
+    print(json.dumps(risk_model.get_model_info(), indent=2, default=str))
+
+def train_synthetic(n_samples=None):
+    risk_model.train_model(n_samples=n_samples, source='synthetic')
+    show_info()
+    return risk_model.training_state == 'trained'
+
+def train_history(db_path=None, full=False):
+    """Nightly retrain: extends the current model with new UserProgress rows unless full"""
+    updated = risk_model.train_from_history(db_path, incremental=not full)
+    if updated:
+        print("✅ Risk model updated from UserProgress history")
+    else:
+        print("ℹ️  Risk model unchanged")
+    show_info()
+    return updated
+
+def tune(n_samples=5000, apply=False, max_latency_us=None):
+    report = risk_model.tune_model(n_samples=n_samples, apply=apply, max_latency_us=max_latency_us)
+    print(f"Searched {len(report['results'])} candidates in {report['search_seconds']}s "
+          f"({report['cv']}-fold CV, {report['n_samples']} samples)")
+    print(f"{'params':<62} {'acc':>7} {'nodes':>7} {'KB':>7} {'p50 us':>8} {'p99 us':>8} {'row us':>7}")
+    for r in report['results']:
+        print(f"{json.dumps(r['params']):<62} {r['cv_accuracy']:>7.4f} {r['n_nodes']:>7} "
+              f"{r['model_bytes'] / 1024:>7.0f} {r['single_p50_us']:>8.0f} {r['single_p99_us']:>8.0f} "
+              f"{r['batch_per_row_us']:>7.2f}")
+    if report['best']:
+        print(f"\n✅ Best: {report['best']['params']}" + (" (applied)" if apply else ""))
+    else:
+        print("\n❌ No candidate met the latency budget")
+    return report
+
+def compile_grid(validate_samples=200000):
+    grid = risk_model.compile_grid(validate_samples=validate_samples)
+    if grid is None:
+        print("❌ No trained model to compile")
+        return None
+    report = grid['disagreement']
+    print(f"✅ Compiled {grid['cells']} cells ({grid['nbytes'] / 1024:.0f} KB) for "
+          f"{risk_model.model_version or 'seed artifact'}")
+    print(f"   Checked {report['samples']} random inputs against the full model:")
+    print(f"   category mismatches: {report['category_mismatches']} ({report['category_mismatch_rate']:.4%}), "
+          f"worst risk_score diff {report['max_risk_score_diff']}")
+    print(f"   confidence diff: max {report['max_confidence_diff']}, p99 {report['p99_confidence_diff']}")
+    return grid
+
+def train_courses(db_path=None, min_rows=None):
+    """Train per-course models for courses with enough history; the rest keep the global model"""
+    results = risk_model.train_course_models(db_path, min_rows)
+    if not results:
+        print("ℹ️  No course has enough history for its own model")
+    for course_id, version in sorted(results.items()):
+        if version:
+            print(f"✅ Course {course_id}: activated {version}")
+        else:
+            print(f"ℹ️  Course {course_id}: keeps the global model")
+    return results
+
+def rescore(db_path=None, restart=False, chunk_size=2000, pause=0.05):
+    """Nightly job: bring stored UserProgress risk scores up to the active model"""
+    from sqlalchemy import create_engine, inspect
+    from risk_model import DEFAULT_DB_PATH
+    from risk_scoring import rescore_progress
+
+    # A generous busy timeout makes the job wait for request traffic instead of failing
+    engine = create_engine(f"sqlite:///{os.path.abspath(db_path or DEFAULT_DB_PATH)}",
+                           connect_args={'timeout': 30})
+    migrations = {'progress_risk_version': 'migrate_risk_versions.py',
+                  'progress_risk_explanation': 'migrate_risk_explanations.py',
+                  'learner_stats': 'migrate_learner_stats.py'}
+    missing = [table for table in migrations if not inspect(engine).has_table(table)]
+    if missing:
+        print(f"❌ Missing table(s) {', '.join(missing)}; run {', '.join(migrations[t] for t in missing)} first")
+        return None
+    stats = rescore_progress(risk_model, engine, chunk_size=chunk_size, pause=pause, restart=restart)
+    if stats['model_version'] is None:
+        print("❌ No trained model loaded; stored scores left unchanged")
+    else:
+        resumed = f", resumed after id {stats['resumed_from']}" if stats['resumed_from'] else ""
+        state = "✅ Complete" if stats['complete'] else "⏸️  Stopped early"
+        print(f"{state}: rescored {stats['rescored']} rows with {stats['model_version']} "
+              f"in {stats['chunks']} chunks, {stats['seconds']}s{resumed}")
+    return stats
+
+def list_versions():
+    registry = risk_model.registry
+    entries = registry.describe()
+    if not entries:
+        print(f"No versions in {registry.root}")
+        return
+    for entry in entries:
+        marker = "→" if entry['active'] else " "
+        meta = entry['meta']
+        metrics = {k: v for k, v in meta.items() if k.endswith('accuracy') or k in ('source', 'n_estimators')}
+        print(f"{marker} {entry['version']}  {entry['created_at']}  {json.dumps(metrics)}")
+
+def activate_version(version):
+    risk_model.registry.activate(version)
+    print(f"✅ Activated {version}; workers pick it up within {risk_model.refresh_interval:g}s")
+
+def rollback():
+    version = risk_model.registry.rollback()
+    if version:
+        print(f"✅ Rolled back to {version}")
+    else:
+        print("❌ No earlier version to roll back to")
+    return version
+
+def prune(keep=10):
+    removed = risk_model.registry.prune(keep)
+    print(f"Removed {len(removed)} version(s): {', '.join(removed) or '-'}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage:")
+        print("  python manage_risk_model.py info")
+        print("  python manage_risk_model.py train [n_samples]")
+        print("  python manage_risk_model.py train_history [db_path] [--full]")
+        print("  python manage_risk_model.py tune [n_samples] [max_latency_us] [--apply]")
+        print("  python manage_risk_model.py compile_grid [validate_samples]")
+        print("  python manage_risk_model.py train_courses [db_path] [min_rows]")
+        print("  python manage_risk_model.py rescore [db_path] [--restart]")
+        print("  python manage_risk_model.py versions")
+        print("  python manage_risk_model.py activate <version>")
+        print("  python manage_risk_model.py rollback")
+        print("  python manage_risk_model.py prune [keep]")
+        sys.exit(1)
+
+    command = sys.argv[1]
+    args = [arg for arg in sys.argv[2:] if not arg.startswith('--')]
+    flags = [arg for arg in sys.argv[2:] if arg.startswith('--')]
+
+    if command == "info":
+        show_info()
+    elif command == "train":
+        train_synthetic(int(args[0]) if args else None)
+    elif command == "train_history":
+        train_history(args[0] if args else None, full='--full' in flags)
+    elif command == "tune":
+        tune(int(args[0]) if args else 5000, apply='--apply' in flags,
+             max_latency_us=float(args[1]) if len(args) > 1 else None)
+    elif command == "compile_grid":
+        compile_grid(int(args[0]) if args else 200000)
+    elif command == "train_courses":
+        train_courses(args[0] if args else None, int(args[1]) if len(args) > 1 else None)
+    elif command == "rescore":
+        rescore(args[0] if args else None, restart='--restart' in flags)
+    elif command == "versions":
+        list_versions()
+    elif command == "activate":
+        if not args:
+            print("Usage: python manage_risk_model.py activate <version>")
+            sys.exit(1)
+        activate_version(args[0])
+    elif command == "rollback":
+        rollback()
+    elif command == "prune":
+        prune(int(args[0]) if args else 10)
+    else:
+        print("Unknown command. Use 'info', 'train', 'train_history', 'tune', 'compile_grid', "
+              "'train_courses', 'rescore', 'versions', 'activate', 'rollback' or 'prune'")
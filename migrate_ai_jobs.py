@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Database migration script to add the ai_job table
+Holds the background AI processing queued by upload_script and upload_pdf
+"""
+
+import sqlite3
+import os
+
+def migrate_database():
+    """Add ai_job (the app also creates it on startup)"""
+    db_path = 'instance/database.db'
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database not found: {db_path}")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='ai_job'")
+        if cursor.fetchone():
+            print("⚠️  ai_job table already exists")
+            conn.close()
+            return True
+
+        print("Creating ai_job table...")
+        cursor.execute("""
+            CREATE TABLE ai_job (
+                id INTEGER PRIMARY KEY,
+                kind VARCHAR(32) NOT NULL,
+                user_id INTEGER NOT NULL,
+                course_id INTEGER,
+                status VARCHAR(16) NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL,
+                worker VARCHAR(64),
+                created_at DATETIME,
+                started_at DATETIME,
+                finished_at DATETIME,
+                FOREIGN KEY (user_id) REFERENCES user (id),
+                FOREIGN KEY (course_id) REFERENCES course (id)
+            )
+        """)
+        cursor.execute("CREATE INDEX ix_ai_job_status ON ai_job (status)")
+
+        conn.commit()
+        conn.close()
+
+        print(f"✅ Successfully created ai_job")
+        return True
+
+    except sqlite3.OperationalError as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+    except Exception as e:
+        print(f"❌ Unexpected error: {e}")
+        return False
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("AI JOB QUEUE MIGRATION")
+    print("=" * 60)
+    migrate_database()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Database migration script to add the learner_stats table
+Running per-(user, course) score aggregates, backfilled from user_progress
+"""
+
+import sqlite3
+import os
+from datetime import datetime
+
+def backup_database():
+    """Backup the existing database"""
+    db_path = 'instance/database.db'
+    backup_path = f'instance/database.db.backup.{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+
+    if os.path.exists(db_path):
+        with open(db_path, 'rb') as src:
+            with open(backup_path, 'wb') as dst:
+                dst.write(src.read())
+        print(f"✅ Database backed up to: {backup_path}")
+        return True
+    return False
+
+def migrate_database():
+    """Add learner_stats table and fold existing attempts into it"""
+    db_path = 'instance/database.db'
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        # Check if learner_stats table already exists
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='learner_stats'")
+        if cursor.fetchone():
+            print("⚠️  learner_stats table already exists")
+            conn.close()
+            return True
+
+        print("Creating learner_stats table...")
+        cursor.execute("""
+            CREATE TABLE learner_stats (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                course_id INTEGER NOT NULL,
+                attempt_count INTEGER NOT NULL DEFAULT 0,
+                score_sum FLOAT NOT NULL DEFAULT 0,
+                score_sq_sum FLOAT NOT NULL DEFAULT 0,
+                score_index_sum FLOAT NOT NULL DEFAULT 0,
+                last_score FLOAT,
+                last_risk_score FLOAT,
+                last_seen DATETIME,
+                CONSTRAINT uq_learner_stats_user_course UNIQUE (user_id, course_id),
+                FOREIGN KEY (user_id) REFERENCES user (id),
+                FOREIGN KEY (course_id) REFERENCES course (id)
+            )
+        """)
+
+        # Attempt k of each (user, course), in id order, contributes k * score to the trend sum.
+        # user_progress has no timestamps, so last_seen starts empty for existing attempts.
+        print("Backfilling from user_progress...")
+        cursor.execute("""
+            INSERT INTO learner_stats (
+                user_id, course_id, attempt_count, score_sum, score_sq_sum,
+                score_index_sum, last_score, last_risk_score, last_seen
+            )
+            SELECT user_id, course_id, COUNT(*), SUM(score), SUM(score * score),
+                   SUM(attempt_number * score),
+                   MAX(CASE WHEN attempt_number = attempts_total THEN score END),
+                   MAX(CASE WHEN attempt_number = attempts_total THEN risk_score END),
+                   NULL
+            FROM (
+                SELECT user_id, course_id, score, risk_score,
+                       ROW_NUMBER() OVER (PARTITION BY user_id, course_id ORDER BY id) AS attempt_number,
+                       COUNT(*) OVER (PARTITION BY user_id, course_id) AS attempts_total
+                FROM user_progress
+                WHERE user_id IS NOT NULL AND course_id IS NOT NULL AND score IS NOT NULL
+            )
+            GROUP BY user_id, course_id
+        """)
+        backfilled = cursor.rowcount
+
+        conn.commit()
+        conn.close()
+
+        print(f"✅ Successfully created learner_stats with {backfilled} learner/course rows")
+        return True
+
+    except sqlite3.OperationalError as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+    except Exception as e:
+        print(f"❌ Unexpected error: {e}")
+        return False
+
+def verify_migration():
+    """Verify the migration was successful"""
+    db_path = 'instance/database.db'
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("PRAGMA table_info(learner_stats)")
+        columns = {col[1]: col[2] for col in cursor.fetchall()}
+
+        if not columns:
+            print("❌ Verification failed - learner_stats table does not exist")
+            return False
+
+        print("✅ Verification successful - learner_stats table exists with columns:")
+        expected_columns = ['id', 'user_id', 'course_id', 'attempt_count', 'score_sum', 'score_sq_sum',
+                            'score_index_sum', 'last_score', 'last_risk_score', 'last_seen']
+        for col in expected_columns:
+            if col in columns:
+                print(f"   ✓ {col} ({columns[col]})")
+            else:
+                print(f"   ✗ {col} (MISSING)")
+
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(attempt_count), 0) FROM learner_stats")
+        rows, attempts = cursor.fetchone()
+        print(f"\n   {rows} learner/course aggregates covering {attempts} attempts")
+
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"❌ Verification error: {e}")
+        return False
+
+if __name__ == "__main__":
+    print("🔄 Database Migration: Add learner_stats table")
+    print("=" * 60)
+
+    # Backup database
+    if backup_database():
+        print()
+
+        # Run migration
+        if migrate_database():
+            print()
+
+            # Verify migration
+            if verify_migration():
+                print("\n" + "=" * 60)
+                print("🎉 Migration complete!")
+                print("\nNext steps:")
+                print("1. Run: python app.py")
+                print("2. Every quiz submission now updates learner_stats")
+            else:
+                print("\n❌ Verification failed")
+        else:
+            print("\n❌ Migration failed. Using backup if needed.")
+    else:
+        print("⚠️  No database found. Creating fresh database on app start.")
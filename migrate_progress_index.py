@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Database migration script to index user_progress for risk model history training
+"""
+
+import sqlite3
+import os
+
+INDEX_NAME = 'ix_user_progress_user_course_id'
+
+def migrate_database():
+    """Add (user_id, course_id, id) index used to pair attempts with their follow-ups"""
+    db_path = 'instance/database.db'
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database not found: {db_path}")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("PRAGMA index_list(user_progress)")
+        indexes = [row[1] for row in cursor.fetchall()]
+
+        if INDEX_NAME in indexes:
+            print(f"⚠️  {INDEX_NAME} already exists on user_progress")
+            conn.close()
+            return True
+
+        print("Creating user_progress history index...")
+        cursor.execute(f"""
+            CREATE INDEX {INDEX_NAME} ON user_progress (user_id, course_id, id)
+        """)
+
+        conn.commit()
+        conn.close()
+
+        print(f"✅ Successfully created {INDEX_NAME}")
+        return True
+
+    except sqlite3.OperationalError as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+    except Exception as e:
+        print(f"❌ Unexpected error: {e}")
+        return False
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("USER_PROGRESS HISTORY INDEX MIGRATION")
+    print("=" * 60)
+    migrate_database()
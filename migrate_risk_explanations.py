@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Database migration script to add the progress_risk_explanation table
+Stores each risk_score's per-feature explanation for the trainer dashboards
+"""
+
+import sqlite3
+import os
+
+def migrate_database():
+    """Add progress_risk_explanation; existing scores are explained the first time a dashboard shows them"""
+    db_path = 'instance/database.db'
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database not found: {db_path}")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='progress_risk_explanation'")
+        if cursor.fetchone():
+            print("⚠️  progress_risk_explanation table already exists")
+            conn.close()
+            return True
+
+        print("Creating progress_risk_explanation table...")
+        cursor.execute("""
+            CREATE TABLE progress_risk_explanation (
+                progress_id INTEGER PRIMARY KEY,
+                baseline FLOAT NOT NULL,
+                score_contribution FLOAT NOT NULL,
+                attempts_contribution FLOAT NOT NULL,
+                time_contribution FLOAT NOT NULL,
+                FOREIGN KEY (progress_id) REFERENCES user_progress (id)
+            )
+        """)
+
+        cursor.execute("SELECT COUNT(*) FROM user_progress WHERE risk_score IS NOT NULL")
+        unexplained = cursor.fetchone()[0]
+
+        conn.commit()
+        conn.close()
+
+        print(f"✅ Successfully created progress_risk_explanation")
+        print(f"   {unexplained} existing scores will be explained by the dashboards or: python manage_risk_model.py rescore")
+        return True
+
+    except sqlite3.OperationalError as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+    except Exception as e:
+        print(f"❌ Unexpected error: {e}")
+        return False
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("PROGRESS RISK EXPLANATION MIGRATION")
+    print("=" * 60)
+    migrate_database()
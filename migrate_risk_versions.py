@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Database migration script to add the progress_risk_version table
+Records which risk model produced each stored risk_score
+"""
+
+import sqlite3
+import os
+
+def migrate_database():
+    """Add progress_risk_version; existing scores stay unversioned until the next rescore"""
+    db_path = 'instance/database.db'
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database not found: {db_path}")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='progress_risk_version'")
+        if cursor.fetchone():
+            print("⚠️  progress_risk_version table already exists")
+            conn.close()
+            return True
+
+        print("Creating progress_risk_version table...")
+        cursor.execute("""
+            CREATE TABLE progress_risk_version (
+                progress_id INTEGER PRIMARY KEY,
+                model_version VARCHAR(64) NOT NULL,
+                scored_at DATETIME,
+                FOREIGN KEY (progress_id) REFERENCES user_progress (id)
+            )
+        """)
+
+        cursor.execute("SELECT COUNT(*) FROM user_progress WHERE score IS NOT NULL")
+        unversioned = cursor.fetchone()[0]
+
+        conn.commit()
+        conn.close()
+
+        print(f"✅ Successfully created progress_risk_version")
+        print(f"   {unversioned} existing scores will be versioned by: python manage_risk_model.py rescore")
+        return True
+
+    except sqlite3.OperationalError as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+    except Exception as e:
+        print(f"❌ Unexpected error: {e}")
+        return False
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("PROGRESS RISK VERSION MIGRATION")
+    print("=" * 60)
+    migrate_database()
@@ -0,0 +1,213 @@
+"""
+Page-level PDF text extraction spread across a process pool.
+
+PyPDF2 extraction is pure Python and CPU bound, so threads do not help. A
+large document is split into contiguous page ranges; each worker process
+opens the file once itself (nothing but the path and ranges is pickled) and
+returns the texts of its ranges, which are reassembled in page order.
+Workers are started from a fork server (spawned where there is none), not
+forked: the app extracts on AI job threads, and forking a threaded process
+can copy locks other threads hold. Small
+documents, or a worker count of 1, are extracted in this process, where
+pool start-up would cost more than it saves.
+
+PageStream yields the page texts lazily: ranges are bounded in size and
+only a few are in flight at once, files are read through a handle rather
+than loaded whole, and each page's parsed content is released once its
+text is out. What remains per page is PyPDF2's small page dictionary,
+bounded by the page ceiling; a byte ceiling bounds the text.
+"""
+
+import logging
+import multiprocessing
+import os
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, Optional, Tuple
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import IndirectObject
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+# Documents shorter than this are not worth a pool
+PARALLEL_MIN_PAGES = 16
+# Ranges per worker; more than one evens out pages that are slower to parse
+RANGES_PER_WORKER = 4
+MIN_RANGE_PAGES = 4
+# Bounds the text a range holds, and so the text in flight while streaming
+MAX_RANGE_PAGES = 32
+# Ranges submitted ahead of the one being consumed, per worker
+RANGES_IN_FLIGHT = 2
+POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def page_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    """Split ``page_count`` pages into contiguous, near-equal (start, stop) ranges"""
+    count = max(workers * RANGES_PER_WORKER, -(-page_count // MAX_RANGE_PAGES))
+    count = max(1, min(count, page_count // MIN_RANGE_PAGES))
+    size, extra = divmod(page_count, count)
+    ranges, start = [], 0
+    for i in range(count):
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _page_text(reader: PdfReader, index: int) -> str:
+    page = reader.pages[index]
+    text = page.extract_text() or ""
+    # The reader caches every object it parses; drop this page's content stream now its text is out
+    contents = page.raw_get('/Contents') if '/Contents' in page else None
+    for ref in contents if isinstance(contents, list) else [contents]:
+        if isinstance(ref, IndirectObject):
+            reader.resolved_objects.pop((ref.generation, ref.idnum), None)
+    return text
+
+
+# The document opened by this worker process, set by the pool initializer
+_worker_reader = None
+
+
+def _open_in_worker(file_path: str):
+    global _worker_reader
+    # Read through the handle (kept open for the worker's life) instead of loading the whole file
+    _worker_reader = PdfReader(open(file_path, 'rb'))
+
+
+def _extract_range(start: int, stop: int) -> List[str]:
+    """Worker entry point: text of pages [start, stop), '' for pages without any"""
+    return [_page_text(_worker_reader, i) for i in range(start, stop)]
+
+
+def _iter_page_texts(reader: PdfReader, file_path: str, page_count: int, workers: int) -> Iterator[str]:
+    """Texts of the first ``page_count`` pages in order, a bounded window of ranges at a time"""
+    if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+        for i in range(page_count):
+            yield _page_text(reader, i)
+        return
+
+    ranges = page_ranges(page_count, workers)
+    workers = min(workers, len(ranges))
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(POOL_START_METHOD),
+                               initializer=_open_in_worker, initargs=(file_path,))
+    ranges = iter(ranges)
+    done = 0
+    try:
+        pending = deque()
+        for start, stop in ranges:
+            pending.append(pool.submit(_extract_range, start, stop))
+            if len(pending) == workers * RANGES_IN_FLIGHT:
+                break
+        while pending:
+            texts = pending.popleft().result()
+            next_range = next(ranges, None)
+            if next_range:
+                pending.append(pool.submit(_extract_range, *next_range))
+            for text in texts:
+                yield text
+                done += 1
+    except BrokenProcessPool as e:
+        logger.warning(f"PDF extraction pool failed ({e}); extracting pages {done + 1}-{page_count} serially")
+        for i in range(done, page_count):
+            yield _page_text(reader, i)
+    finally:
+        # Also reached when the consumer stops early: drop ranges not started yet
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+class PageStream:
+    """
+    Iterable over the texts of a PDF's pages in page order ('' for pages
+    without text), extracted lazily with up to ``workers`` processes
+    (DEFAULT_WORKERS if None).
+
+    Stops after ``max_pages`` pages, or before the page that would take the
+    extracted text over ``max_bytes`` (UTF-8), and sets ``truncated``.
+    ``pages_read``, ``bytes_read`` and ``word_count`` describe what was
+    yielded so far.
+
+    With a ``cache`` (pdf_text_cache.PDFTextCache) and the file's
+    ``content_hash``, pages come from the cache when the file was extracted
+    before, and a complete extraction is stored for next time (``cached``
+    tells which happened).
+    """
+
+    def __init__(self, file_path: str, workers: Optional[int] = None,
+                 max_pages: Optional[int] = None, max_bytes: Optional[int] = None,
+                 cache=None, content_hash: Optional[str] = None):
+        self.file_path = file_path
+        self.workers = DEFAULT_WORKERS if workers is None else workers
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.cache = cache if content_hash else None
+        self.content_hash = content_hash
+        self.cached = False
+        self.page_count = None
+        self.pages_read = 0
+        self.bytes_read = 0
+        self.word_count = 0
+        self.truncated = False
+
+    def _page_limit(self) -> int:
+        if self.max_pages is not None and self.page_count > self.max_pages:
+            logger.warning(f"{self.file_path}: {self.page_count} pages, reading the first {self.max_pages}")
+            self.truncated = True
+            return self.max_pages
+        return self.page_count
+
+    def __iter__(self) -> Iterator[str]:
+        hit = self.cache.get(self.content_hash) if self.cache is not None else None
+        if hit is not None:
+            self.cached = True
+            self.page_count, texts = hit
+            try:
+                yield from self._within_ceilings(islice(texts, self._page_limit()))
+            finally:
+                texts.close()
+            return
+
+        with open(self.file_path, 'rb') as f:
+            reader = PdfReader(f)
+            self.page_count = len(reader.pages)
+            texts = _iter_page_texts(reader, self.file_path, self._page_limit(), self.workers)
+            # Only a complete extraction is worth keeping
+            writer = self.cache.writer(self.content_hash, self.page_count) \
+                if self.cache is not None and not self.truncated else None
+            try:
+                for text in self._within_ceilings(texts):
+                    if writer is not None:
+                        writer.add(text)
+                    yield text
+                if writer is not None and not self.truncated:
+                    writer.commit()
+            finally:
+                # Also reached when the consumer stops early
+                texts.close()
+                if writer is not None:
+                    writer.close()
+
+    def _within_ceilings(self, texts: Iterator[str]) -> Iterator[str]:
+        for text in texts:
+            size = len(text.encode('utf-8'))
+            if self.max_bytes is not None and self.bytes_read + size > self.max_bytes:
+                logger.warning(f"{self.file_path}: text over {self.max_bytes} bytes, "
+                               f"stopping after {self.pages_read} pages")
+                self.truncated = True
+                return
+            self.pages_read += 1
+            self.bytes_read += size
+            self.word_count += len(text.split())
+            yield text
+
+
+def extract_pages(file_path: str, workers: Optional[int] = None) -> List[str]:
+    """
+    Text of every page of ``file_path`` in page order ('' for pages without
+    text), using up to ``workers`` processes (DEFAULT_WORKERS if None).
+    """
+    return list(PageStream(file_path, workers))
@@ -0,0 +1,224 @@
+"""
+Content-addressed on-disk cache of extracted PDF page texts.
+
+Trainers upload the same handout to several courses, or again after
+renaming it. Uploads are hashed (SHA-256) while they are written to disk,
+and the page texts extracted from a file are stored under that hash, so a
+repeat upload streams its pages from the cache instead of running PyPDF2
+again, whatever it is called.
+
+Each document is one gzip file of JSON lines (a header with the page count,
+then one page per line), written to a temporary file as pages are extracted
+and renamed into place only once every page is in, so readers never see a
+partial entry and neither side holds the whole text in memory. Reading an
+entry refreshes its modification time; when the directory exceeds its byte
+budget the least recently used files are removed.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join('instance', 'pdf_text_cache')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+HASH_CHUNK_BYTES = 1024 * 1024
+SUFFIX = '.pages.gz'
+
+
+def save_and_hash(stream, path: str) -> str:
+    """Copy a readable binary stream to ``path``, returning the SHA-256 of what was written"""
+    digest = hashlib.sha256()
+    with open(path, 'wb') as f:
+        for block in iter(lambda: stream.read(HASH_CHUNK_BYTES), b''):
+            digest.update(block)
+            f.write(block)
+    return digest.hexdigest()
+
+
+def save_upload(stream, directory: str, suffix: str = '.pdf') -> Tuple[str, str]:
+    """
+    Store an upload in ``directory`` under its content hash, returning
+    (path, sha256). The file is written under a temporary name and renamed
+    into place, so a queued job's file is never overwritten by a later
+    upload: one with the same name but other content gets its own path.
+    """
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        content_hash = save_and_hash(stream, tmp_path)
+        path = os.path.join(directory, content_hash + suffix)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return path, content_hash
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CacheWriter:
+    """Pages of one document on their way into the cache; nothing is visible until commit()"""
+
+    def __init__(self, cache: 'PDFTextCache', content_hash: str, page_count: int):
+        self.cache = cache
+        self.content_hash = content_hash
+        os.makedirs(cache.directory, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=cache.directory, suffix='.tmp')
+        self.raw = os.fdopen(fd, 'wb')
+        self.file = gzip.open(self.raw, 'wt', encoding='utf-8', compresslevel=cache.compress_level)
+        self.file.write(json.dumps({'pages': page_count}) + "\n")
+        self.committed = False
+
+    def add(self, text: str):
+        self.file.write(json.dumps(text, ensure_ascii=False) + "\n")
+
+    def _close_files(self):
+        self.file.close()
+        self.raw.close()
+
+    def commit(self):
+        self._close_files()
+        path = self.cache._path(self.content_hash)
+        os.replace(self.tmp_path, path)
+        os.utime(path, (self.cache.clock(),) * 2)
+        self.committed = True
+        self.cache.stores += 1
+        self.cache.evict()
+
+    def close(self):
+        """Discard the entry unless it was committed"""
+        if not self.committed:
+            self._close_files()
+            self.cache._remove(self.tmp_path)
+
+
+class PDFTextCache:
+    """Directory of compressed page texts keyed by file hash, with a size-bounded LRU"""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 compress_level: int = 6):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+        self.clock = time.time
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, content_hash: str) -> str:
+        return os.path.join(self.directory, content_hash + SUFFIX)
+
+    def get(self, content_hash: str) -> Optional[Tuple[int, Iterator[str]]]:
+        """(page count, lazy iterator over the page texts) for a cached file, or None on a miss"""
+        if not self.enabled:
+            return None
+        path = self._path(content_hash)
+        f = None
+        try:
+            f = gzip.open(path, 'rt', encoding='utf-8')
+            page_count = json.loads(f.readline())['pages']
+            # Reading an entry makes it the most recently used
+            os.utime(path, (self.clock(),) * 2)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, EOFError, ValueError, KeyError) as e:
+            # A broken entry must never break extraction; drop it and treat it as a miss
+            logger.warning(f"PDF text cache entry {content_hash} unreadable: {e}")
+            self.errors += 1
+            self.misses += 1
+            if f is not None:
+                f.close()
+            self._remove(path)
+            return None
+        self.hits += 1
+        return page_count, self._read_pages(f)
+
+    def _read_pages(self, f) -> Iterator[str]:
+        with f:
+            for line in f:
+                yield json.loads(line)
+
+    def writer(self, content_hash: str, page_count: int) -> Optional[CacheWriter]:
+        """A CacheWriter for a file about to be extracted, or None when caching is off or fails"""
+        if not self.enabled:
+            return None
+        try:
+            return CacheWriter(self, content_hash, page_count)
+        except OSError as e:
+            logger.warning(f"PDF text cache write failed: {e}")
+            self.errors += 1
+            return None
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory) if os.path.isdir(self.directory) else []:
+            if name.endswith(SUFFIX):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name, stat.st_size))
+        return entries
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def evict(self) -> int:
+        """Remove the least recently used entries until the rest fit the byte budget"""
+        with self._lock:
+            used, removed = 0, 0
+            for mtime, name, size in sorted(self._entries(), reverse=True):
+                used += size
+                if used > self.max_bytes:
+                    self._remove(os.path.join(self.directory, name))
+                    removed += 1
+        self.evictions += removed
+        return removed
+
+    def clear(self):
+        for _, name, _ in self._entries():
+            self._remove(os.path.join(self.directory, name))
+
+    def stats(self) -> Dict[str, any]:
+        """Hit/miss counters for this process plus the shared cache's size"""
+        lookups = self.hits + self.misses
+        entries = self._entries()
+        return {
+            'enabled': self.enabled,
+            'directory': self.directory,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'errors': self.errors,
+            'entries': len(entries),
+            'bytes': sum(size for _, _, size in entries),
+            'max_bytes': self.max_bytes
+        }
@@ -0,0 +1,390 @@
+"""
+Memory-mappable on-disk format for the risk assessment model.
+
+A RandomForest + StandardScaler pair is flattened into plain NumPy arrays
+(tree node arrays, thresholds, leaf class probabilities, scaler means and
+scales) and written to a single file:
+
+    magic (8 bytes) | format version (uint32) | header length (uint32)
+    | JSON header | padding | array data, each array 64-byte aligned
+
+The JSON header records every array's dtype, shape, offset and CRC32, plus
+free-form metadata. Loading maps the file read-only, so worker processes
+share the same physical pages instead of each unpickling a private copy.
+
+Besides the node arrays, a forest carries the lookup tables inference
+walks (interleaved children, int32 features, class-major leaf values), so
+those are shared too rather than rebuilt per process.
+"""
+
+import json
+import os
+import struct
+import zlib
+from datetime import datetime
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+MAGIC = b'NLRISK\x00\x00'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct('<8sII')
+
+
+class ArtifactError(Exception):
+    """Raised when a model artifact is missing, corrupt or unsupported"""
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def export_forest(model, scaler, classes: Optional[Sequence[int]] = None) -> Dict[str, np.ndarray]:
+    """
+    Flatten a fitted RandomForestClassifier and StandardScaler into arrays.
+
+    All trees share one node table; ``roots`` holds each tree's first node.
+    Leaves point to themselves in ``left``/``right`` so a fixed number of
+    descent steps always lands on a leaf. Passing ``classes`` widens the leaf
+    distributions to that label set, e.g. when a training chunk lacked a class.
+    """
+    classes = np.asarray(model.classes_ if classes is None else classes, dtype=np.int64)
+    class_columns = np.searchsorted(classes, np.asarray(model.classes_, dtype=np.int64))
+
+    lefts, rights, features, thresholds, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        node_ids = np.arange(n_nodes)
+        is_leaf = tree.children_left == -1
+
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+
+        # Per-node class distribution, normalised the way DecisionTreeClassifier.predict_proba does
+        value = tree.value[:, 0, :].astype(np.float64)
+        totals = value.sum(axis=1, keepdims=True)
+        totals[totals == 0.0] = 1.0
+        widened = np.zeros((n_nodes, len(classes)))
+        widened[:, class_columns] = value / totals
+        values.append(widened)
+
+        roots.append(offset)
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n_nodes
+
+    return with_lookup_tables({
+        'left': np.concatenate(lefts).astype(np.int32),
+        'right': np.concatenate(rights).astype(np.int32),
+        'feature': np.concatenate(features).astype(np.uint8),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'value': np.concatenate(values),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'max_depth': np.asarray([max_depth], dtype=np.int32),
+        'classes': classes,
+        'scaler_mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scaler_scale': np.asarray(scaler.scale_, dtype=np.float64)
+    })
+
+
+def lookup_tables(arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Tables ArtifactForest walks, derived from the node arrays: ``children``
+    interleaves [right, left] per node so a descent step is one gather at
+    2 * node + went_left, ``feature_index`` widens ``feature`` for index
+    arithmetic, and ``class_values`` is ``value`` transposed to class-major.
+    Indices are int64, NumPy's native index type on 64-bit builds; int32
+    indices are converted on every gather and halve inference speed.
+    """
+    return {
+        'children': np.stack([arrays['right'], arrays['left']], axis=1).astype(np.int64).ravel(),
+        'feature_index': np.asarray(arrays['feature'], dtype=np.int64),
+        'class_values': np.ascontiguousarray(np.asarray(arrays['value']).T)
+    }
+
+
+def with_lookup_tables(arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """``arrays`` plus freshly derived lookup tables, ready to save"""
+    return dict(arrays, **lookup_tables(arrays))
+
+
+def merge_forests(base: Dict[str, np.ndarray], update: Dict[str, np.ndarray],
+                  max_trees: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Append the trees of ``update`` to ``base``, like RandomForest warm_start.
+
+    Both must share classes and scaler. With ``max_trees`` the oldest trees
+    are dropped so the forest acts as a sliding window over training batches.
+    """
+    if not np.array_equal(base['classes'], update['classes']):
+        raise ArtifactError("Cannot merge forests with different classes")
+    if not (np.allclose(base['scaler_mean'], update['scaler_mean'])
+            and np.allclose(base['scaler_scale'], update['scaler_scale'])):
+        raise ArtifactError("Cannot merge forests trained on different feature scaling")
+
+    offset = len(base['left'])
+    # Lookup tables are rebuilt from the merged node arrays below
+    merged = {
+        'left': np.concatenate([base['left'], update['left'] + offset]),
+        'right': np.concatenate([base['right'], update['right'] + offset]),
+        'feature': np.concatenate([base['feature'], update['feature']]),
+        'threshold': np.concatenate([base['threshold'], update['threshold']]),
+        'value': np.concatenate([base['value'], update['value']]),
+        'roots': np.concatenate([base['roots'], update['roots'] + offset]).astype(np.int32),
+        'max_depth': np.maximum(base['max_depth'], update['max_depth']),
+        'classes': np.asarray(base['classes']),
+        'scaler_mean': np.asarray(base['scaler_mean']),
+        'scaler_scale': np.asarray(base['scaler_scale'])
+    }
+
+    n_drop = len(merged['roots']) - max_trees if max_trees else 0
+    if n_drop > 0:
+        # Trees are stored contiguously in root order, so dropping is a slice
+        first_node = merged['roots'][n_drop]
+        for name in ('left', 'right', 'roots'):
+            merged[name] = (merged[name] - first_node).astype(np.int32)
+        merged['roots'] = merged['roots'][n_drop:]
+        for name in ('left', 'right', 'feature', 'threshold', 'value'):
+            merged[name] = merged[name][first_node:]
+
+    return with_lookup_tables(merged)
+
+
+def save_artifact(path: str, arrays: Dict[str, np.ndarray], meta: Optional[Dict] = None):
+    """Write arrays and metadata to ``path`` in the artifact format"""
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    # Lay out the arrays first, relative to the start of the data section
+    layout = {}
+    cursor = 0
+    for name, array in arrays.items():
+        cursor = _align(cursor)
+        layout[name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': cursor,
+            'nbytes': array.nbytes,
+            'crc32': zlib.crc32(array.tobytes())
+        }
+        cursor += array.nbytes
+
+    header = json.dumps({
+        'format_version': FORMAT_VERSION,
+        'created_at': datetime.utcnow().isoformat(),
+        'meta': meta or {},
+        'arrays': layout
+    }, sort_keys=True).encode('utf-8')
+    data_start = _align(_PREAMBLE.size + len(header))
+
+    # Never rewrite in place: other processes may have the old file mapped
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(array.tobytes())
+        f.truncate(data_start + cursor)
+    os.replace(tmp_path, path)
+
+
+def read_header(path: str) -> Dict:
+    """Read and validate the artifact header without touching array data"""
+    with open(path, 'rb') as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) != _PREAMBLE.size:
+            raise ArtifactError(f"{path} is too short to be a model artifact")
+        magic, version, header_len = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ArtifactError(f"{path} is not a model artifact")
+        if version > FORMAT_VERSION:
+            raise ArtifactError(f"{path} uses format v{version}, this build reads up to v{FORMAT_VERSION}")
+        try:
+            header = json.loads(f.read(header_len).decode('utf-8'))
+        except ValueError as e:
+            raise ArtifactError(f"{path} has a corrupt header: {e}")
+
+    header['data_start'] = _align(_PREAMBLE.size + header_len)
+    return header
+
+
+def load_artifact(path: str, mmap: bool = True, verify: bool = True) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """
+    Load the header and arrays from an artifact file.
+
+    With ``mmap`` the arrays are read-only views onto a shared mapping of the
+    file; otherwise they are read into private memory. ``verify`` checks each
+    array's CRC32 against the header.
+    """
+    header = read_header(path)
+    data_start = header['data_start']
+
+    if mmap:
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        with open(path, 'rb') as f:
+            buffer = np.frombuffer(f.read(), dtype=np.uint8)
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        start = data_start + spec['offset']
+        end = start + spec['nbytes']
+        if end > len(buffer):
+            raise ArtifactError(f"{path} is truncated (array '{name}')")
+        raw = buffer[start:end]
+        if verify and zlib.crc32(raw) != spec['crc32']:
+            raise ArtifactError(f"{path} failed checksum for array '{name}'")
+        # Plain ndarray views still share the mapping but skip np.memmap's per-index overhead
+        arrays[name] = raw.view(np.dtype(spec['dtype'])).reshape(spec['shape']).view(np.ndarray)
+
+    return header, arrays
+
+
+class ArtifactScaler:
+    """StandardScaler replacement backed by artifact arrays"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.mean_ = arrays['scaler_mean']
+        self.scale_ = arrays['scaler_scale']
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+
+class ArtifactForest:
+    """RandomForestClassifier replacement backed by artifact arrays"""
+
+    # Rows evaluated per pass; keeps (n_trees x chunk_rows) index arrays small
+    chunk_rows = 1024
+
+    def __init__(self, arrays: Dict[str, np.ndarray], header: Optional[Dict] = None):
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'][0])
+        self.classes_ = arrays['classes']
+        self.arrays = arrays
+        self.header = header or {}
+
+        # The tables inference walks; mapped from the file like the node arrays.
+        # Artifacts written before they were stored get private copies, as large as the model.
+        tables = arrays if 'children' in arrays else lookup_tables(arrays)
+        self._children = tables['children']
+        self._feature = tables['feature_index']
+        self._class_values = tables['class_values']
+        self._expected_values = {}
+
+    @property
+    def meta(self) -> Dict:
+        return self.header.get('meta', {})
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the model's arrays, plus its lookup tables when they were built in private memory"""
+        total = sum(array.nbytes for array in self.arrays.values())
+        if 'children' not in self.arrays:
+            total += self._children.nbytes + self._feature.nbytes + self._class_values.nbytes
+        return total
+
+    def __len__(self):
+        return self.n_estimators
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Average leaf class probabilities over all trees.
+
+        Every tree is walked at once: ``node`` holds one index per (tree, row)
+        and each descent step is a handful of flat gathers over that matrix.
+        Rows are processed in chunks to bound the (trees x rows) working set.
+        """
+        # Trees compare float32 features against float64 thresholds, as sklearn does
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        proba = np.empty((len(X), len(self._class_values)))
+        for start in range(0, len(X), self.chunk_rows):
+            chunk = X[start:start + self.chunk_rows]
+            leaves = self.apply(chunk)
+            for k, class_values in enumerate(self._class_values):
+                proba[start:start + len(chunk), k] = class_values[leaves].sum(axis=0)
+
+        proba /= self.n_estimators
+        return proba
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Return the leaf index reached in every tree, shape (n_trees, n_rows)"""
+        flat_X = np.ascontiguousarray(X, dtype=np.float64).ravel()
+        row_offsets = np.arange(len(X)) * X.shape[1]
+        node = np.repeat(self.roots.astype(np.intp)[:, None], len(X), axis=1)
+
+        for _ in range(self.max_depth):
+            go_left = flat_X[row_offsets + self._feature[node]] <= self.threshold[node]
+            node = self._children[2 * node + go_left]
+
+        return node
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def expected_values(self, class_weights: Sequence[float]) -> np.ndarray:
+        """Per-node expectation of ``class_weights`` under the node's class distribution (memoized)"""
+        key = tuple(float(weight) for weight in class_weights)
+        values = self._expected_values.get(key)
+        if values is None:
+            values = self._expected_values[key] = np.asarray(key) @ self._class_values
+        return values
+
+    def contributions(self, X: np.ndarray, node_values: np.ndarray) -> Tuple[float, np.ndarray]:
+        """
+        Split a per-node quantity into per-feature contributions along each
+        row's decision paths.
+
+        ``node_values`` holds one number per node (e.g. the expected risk of
+        its class distribution). Walking every tree at once as in ``apply``,
+        each split's change in node value is credited to the feature it
+        tested. Returns ``(bias, contributions)`` where bias is the mean root
+        value and bias + contributions.sum(axis=1) equals the mean leaf value.
+        """
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        node_values = np.asarray(node_values, dtype=np.float64)
+        contributions = np.zeros(X.shape)
+        for start in range(0, len(X), self.chunk_rows):
+            chunk = np.ascontiguousarray(X[start:start + self.chunk_rows])
+            flat_X = chunk.ravel()
+            row_offsets = np.arange(len(chunk)) * chunk.shape[1]
+            node = np.repeat(self.roots.astype(np.intp)[:, None], len(chunk), axis=1)
+            n_cells = chunk.size
+
+            for _ in range(self.max_depth):
+                cell = row_offsets + self._feature[node]
+                go_left = flat_X[cell] <= self.threshold[node]
+                child = self._children[2 * node + go_left]
+                # Leaves point to themselves, so finished paths add zero
+                delta = node_values[child] - node_values[node]
+                contributions[start:start + len(chunk)] += np.bincount(
+                    cell.ravel(), weights=delta.ravel(), minlength=n_cells
+                ).reshape(chunk.shape)
+                node = child
+
+        contributions /= self.n_estimators
+        return float(node_values[self.roots].mean()), contributions
@@ -0,0 +1,200 @@
+"""
+Dense lookup grid compiled from a risk forest.
+
+The model only sees three bounded inputs (score 0-100, a small attempt count
+and time_taken in seconds), so the forest can be evaluated once on a regular
+score x attempts x time_taken grid. Scoring then becomes a single index into
+that grid instead of a walk through every tree.
+
+Each cell stores the risk category and the confidence in whole percent as
+uint8. Grids are saved in the model artifact format next to the model they
+were built from (``v0003.nlrm`` -> ``v0003.grid.nlrm``) and memory-mapped the
+same way. Inputs that fall outside the grid are scored by the forest.
+"""
+
+import math
+import os
+import zlib
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from risk_artifact import ArtifactError, load_artifact
+
+# (start, step, count) per feature, in feature order
+DEFAULT_AXES = {
+    'score': (0.0, 0.5, 201),        # 0-100 in half points
+    'attempts': (1.0, 1.0, 10),      # 1-10 attempts
+    'time_taken': (0.0, 5.0, 361)    # 0-1800 seconds in 5 second steps
+}
+AXIS_ORDER = ('score', 'attempts', 'time_taken')
+
+
+def grid_path(artifact_path: str) -> str:
+    """Path of the grid compiled from the model at ``artifact_path``"""
+    root, ext = os.path.splitext(artifact_path)
+    return f"{root}.grid{ext}"
+
+
+def model_fingerprint(arrays: Dict[str, np.ndarray]) -> str:
+    """CRC32 over all model arrays; ties a grid to the exact forest it came from"""
+    crc = 0
+    for name in sorted(arrays):
+        crc = zlib.crc32(name.encode('utf-8'), crc)
+        crc = zlib.crc32(np.ascontiguousarray(arrays[name]).tobytes(), crc)
+    return f"{crc:08x}"
+
+
+def _axis_values(start: float, step: float, count: int) -> np.ndarray:
+    return start + step * np.arange(count)
+
+
+def _score_rows(forest, scaler, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Category and confidence (percent) from the full forest"""
+    probabilities = forest.predict_proba(scaler.transform(X))
+    category = np.asarray(forest.classes_)[probabilities.argmax(axis=1)].astype(int)
+    return category, probabilities.max(axis=1) * 100
+
+
+def build_grid(forest, scaler, axes: Optional[Dict[str, Tuple[float, float, int]]] = None
+               ) -> Dict[str, np.ndarray]:
+    """
+    Evaluate ``forest`` at every grid point.
+
+    Works one score value at a time so memory stays at a single
+    attempts x time_taken slab regardless of the grid size.
+    """
+    axes = axes or DEFAULT_AXES
+    scores, attempts, times = (_axis_values(*axes[name]) for name in AXIS_ORDER)
+    shape = (len(scores), len(attempts), len(times))
+
+    category = np.empty(shape, dtype=np.uint8)
+    confidence = np.empty(shape, dtype=np.uint8)
+
+    attempts_grid, times_grid = (a.ravel() for a in np.meshgrid(attempts, times, indexing='ij'))
+    X = np.empty((len(attempts_grid), 3))
+    X[:, 1] = attempts_grid
+    X[:, 2] = times_grid
+    for i, score in enumerate(scores):
+        X[:, 0] = score
+        slab_category, slab_confidence = _score_rows(forest, scaler, X)
+        category[i] = slab_category.reshape(shape[1:])
+        confidence[i] = np.rint(slab_confidence).reshape(shape[1:])
+
+    return {'category': category, 'confidence': confidence}
+
+
+class LookupGrid:
+    """Risk category/confidence lookup backed by grid arrays"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], header: Optional[Dict] = None):
+        self.header = header or {}
+        axes = self.meta.get('axes', DEFAULT_AXES)
+        self.axes = {name: tuple(axes[name]) for name in AXIS_ORDER}
+        self.category = arrays['category']
+        self.confidence = arrays['confidence']
+        self.shape = self.category.shape
+
+        self._start = np.array([self.axes[name][0] for name in AXIS_ORDER])
+        self._step = np.array([self.axes[name][1] for name in AXIS_ORDER])
+        self._count = np.array(self.shape)
+        self._strides = np.array([self.shape[1] * self.shape[2], self.shape[2], 1])
+        self._scalar_axes = [self.axes[name] for name in AXIS_ORDER]
+        self._scalar_strides = self._strides.tolist()
+        # Flat views make every lookup a single gather
+        self._category = self.category.reshape(-1)
+        self._confidence = self.confidence.reshape(-1)
+
+    @property
+    def meta(self) -> Dict:
+        return self.header.get('meta', {})
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.category.nbytes + self.confidence.nbytes)
+
+    def lookup(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return (category, confidence, in_grid) for an (n, 3) feature matrix.
+
+        Rows snap to the nearest grid point. ``in_grid`` is False for rows
+        outside the grid (or with NaNs); their category/confidence are 0 and
+        must be scored by the forest instead.
+        """
+        index = np.rint((np.asarray(X, dtype=np.float64) - self._start) / self._step)
+        in_grid = np.all((index >= 0) & (index < self._count), axis=1)
+
+        flat = np.zeros(len(index), dtype=np.intp)
+        flat[in_grid] = index[in_grid].astype(np.intp) @ self._strides
+        category = np.where(in_grid, self._category[flat], 0)
+        confidence = np.where(in_grid, self._confidence[flat], 0)
+        return category, confidence, in_grid
+
+    def lookup_one(self, score: float, attempts: float, time_taken: float) -> Optional[Tuple[int, int]]:
+        """Scalar lookup for single predictions; None if the point is outside the grid"""
+        flat = 0
+        for value, (start, step, count), stride in zip((score, attempts, time_taken), self._scalar_axes,
+                                                        self._scalar_strides):
+            position = (float(value) - start) / step
+            if not math.isfinite(position):
+                return None
+            index = round(position)
+            if not 0 <= index < count:
+                return None
+            flat += index * stride
+        return int(self._category[flat]), int(self._confidence[flat])
+
+    def describe(self) -> Dict[str, any]:
+        return {
+            'axes': {name: list(axis) for name, axis in self.axes.items()},
+            'cells': int(self.category.size),
+            'nbytes': self.nbytes,
+            'model_fingerprint': self.meta.get('model_fingerprint'),
+            'disagreement': self.meta.get('disagreement')
+        }
+
+
+def check_grid(grid: LookupGrid, forest, scaler, n_samples: int = 200000, seed: int = 0) -> Dict[str, any]:
+    """
+    Compare the grid against the full forest on random in-grid inputs.
+
+    Inputs look like real quiz results: scores to 0.01, whole attempts and
+    whole seconds, so most of them fall between grid points. Reports the
+    worst-case confidence gap and how often the category differs.
+    """
+    rng = np.random.default_rng(seed)
+    columns = []
+    for name, decimals in zip(AXIS_ORDER, (2, 0, 0)):
+        start, step, count = grid.axes[name]
+        columns.append(np.round(rng.uniform(start, start + step * (count - 1), n_samples), decimals))
+    X = np.column_stack(columns)
+
+    expected_category, expected_confidence = _score_rows(forest, scaler, X)
+    category, confidence, in_grid = grid.lookup(X)
+
+    mismatched = category != expected_category
+    confidence_diff = np.abs(confidence - expected_confidence)
+    category_diff = np.abs(category.astype(int) - expected_category)
+    return {
+        'samples': int(n_samples),
+        'in_grid': int(in_grid.sum()),
+        'category_mismatches': int(mismatched.sum()),
+        'category_mismatch_rate': round(float(mismatched.mean()), 6),
+        'max_category_distance': int(category_diff.max()),
+        'max_risk_score_diff': round(float(category_diff.max()) / 3 * 100, 2),
+        'max_confidence_diff': round(float(confidence_diff.max()), 2),
+        'p99_confidence_diff': round(float(np.percentile(confidence_diff, 99)), 2),
+        'max_confidence_diff_same_category': round(float(confidence_diff[~mismatched].max(initial=0)), 2)
+    }
+
+
+def load_grid(path: str, fingerprint: Optional[str] = None) -> Optional[LookupGrid]:
+    """Map the grid at ``path``; None if absent or built from a different model"""
+    if not os.path.exists(path):
+        return None
+    header, arrays = load_artifact(path)
+    if header['meta'].get('kind') != 'lookup_grid':
+        raise ArtifactError(f"{path} is not a lookup grid")
+    if fingerprint and header['meta'].get('model_fingerprint') != fingerprint:
+        return None
+    return LookupGrid(arrays, header)
@@ -1,180 +1,1341 @@
 import numpy as np
 import pickle
 import os
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
+import sqlite3
+import threading
+import time
 import logging
-from typing import Dict, Tuple, Optional
+import itertools
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from risk_artifact import (
+    ArtifactError, ArtifactForest, ArtifactScaler, export_forest, load_artifact, merge_forests,
+    save_artifact
+)
+from risk_grid import DEFAULT_AXES, LookupGrid, build_grid, check_grid, grid_path, load_grid, model_fingerprint
+from risk_registry import ModelRegistry
+from risk_server import DEFAULT_SOCKET_PATH, RiskInferenceClient, RiskServerUnavailable
+from typing import Dict, Iterator, List, Tuple, Optional, Sequence, Union
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+RISK_LEVELS = ['Low', 'Medium', 'High', 'Critical']
+# Column order of feature rows, and of explanation contributions
+FEATURE_NAMES = ('score', 'attempts', 'time_taken')
+RULE_BASED_CONFIDENCE = 85.0
+
+# How the model gets trained when no saved model exists:
+#   background - serve rule-based right away, train in a daemon thread (default)
+#   lazy       - as background, but only start on the first prediction
+#   blocking   - train synchronously at import (legacy behaviour)
+#   off        - never train automatically; call train_model() explicitly
+TRAINING_MODES = ('background', 'lazy', 'blocking', 'off')
+
+# Dense lookup grid use (RISK_LOOKUP_GRID):
+#   on   - score from a compiled grid when one exists for the loaded model (default)
+#   auto - as on, and compile a fresh grid after every training run
+#   off  - always walk the forest
+LOOKUP_GRID_MODES = ('on', 'auto', 'off')
+
+# Where predictions run (RISK_INFERENCE_MODE):
+#   local  - this process loads and serves the model (default)
+#   remote - send them to the shared risk_server.py process at RISK_INFERENCE_SOCKET,
+#            scoring rule-based whenever it is unavailable
+INFERENCE_MODES = ('local', 'remote')
+
+# Risk below 25 is Low, below 50 Medium, below 75 High, otherwise Critical
+RISK_BUCKET_EDGES = [25, 50, 75]
+
+DEFAULT_DB_PATH = os.path.join('instance', 'database.db')
+
+# Pairs each quiz attempt with the same learner's next attempt at the course.
+# Keyed on the follow-up id so a pair is emitted once, when its outcome exists.
+# migrate_progress_index.py adds the (user_id, course_id, id) index this relies on.
+_HISTORY_QUERY = """
+    SELECT f.id, p.score, p.attempts, p.time_taken, f.score
+    FROM user_progress AS f
+    JOIN user_progress AS p ON p.id = (
+        SELECT MAX(prev.id) FROM user_progress AS prev
+        WHERE prev.user_id = f.user_id AND prev.course_id = f.course_id AND prev.id < f.id
+    )
+    WHERE f.id > ? {course_filter}AND f.score IS NOT NULL AND p.score IS NOT NULL
+      AND p.attempts IS NOT NULL AND p.time_taken IS NOT NULL
+    ORDER BY f.id
+    LIMIT ?
+"""
+HISTORY_QUERY = _HISTORY_QUERY.format(course_filter='')
+# The same pairs for one course, for per-course models
+COURSE_HISTORY_QUERY = _HISTORY_QUERY.format(course_filter='AND f.course_id = ? ')
+
+# The pairs HISTORY_QUERY emits, counted per course
+COURSE_LABELED_COUNTS_QUERY = """
+    SELECT f.course_id
+    FROM user_progress AS f
+    JOIN user_progress AS p ON p.id = (
+        SELECT MAX(prev.id) FROM user_progress AS prev
+        WHERE prev.user_id = f.user_id AND prev.course_id = f.course_id AND prev.id < f.id
+    )
+    WHERE f.course_id IS NOT NULL AND f.score IS NOT NULL AND p.score IS NOT NULL
+      AND p.attempts IS NOT NULL AND p.time_taken IS NOT NULL
+    GROUP BY f.course_id
+    HAVING COUNT(*) >= ?
+"""
+
+# Courses with at least this many labeled attempts get their own model (RISK_COURSE_MODEL_MIN_ROWS)
+DEFAULT_COURSE_MODEL_MIN_ROWS = 200
+
+# Forest settings used by train_model; tune_model can replace them
+DEFAULT_HYPERPARAMETERS = {'n_estimators': 100, 'max_depth': 10, 'min_samples_leaf': 1}
+
+DEFAULT_PARAM_GRID = {
+    'n_estimators': [25, 50, 100, 200],
+    'max_depth': [6, 8, 10, 14],
+    'min_samples_leaf': [1, 5]
+}
+
+ArrayLike = Union[np.ndarray, Sequence]
+
+def _rule_point_columns(X: np.ndarray) -> np.ndarray:
+    """Rule-based risk points per feature, an (n, 3) array in FEATURE_NAMES order"""
+    score, attempts, time_taken = X[:, 0], X[:, 1], X[:, 2]
+    return np.column_stack([
+        np.select([score < 50, score < 70], [40, 20], 0),
+        np.select([attempts > 3, attempts > 1], [30, 15], 0),
+        np.select([time_taken > 300, time_taken > 180], [30, 15], 0)
+    ])
+
+def _rule_points(X: np.ndarray) -> np.ndarray:
+    """Rule-based risk points for each [score, attempts, time_taken] row"""
+    return _rule_point_columns(X).sum(axis=1)
+
+def _explanation(baseline: float, contributions: np.ndarray) -> Optional[Dict[str, float]]:
+    if np.isnan(baseline):
+        return None
+    return dict(zip(('baseline',) + FEATURE_NAMES, map(float, (baseline, *contributions))))
+
+def batch_explanations(batch: Dict[str, any]) -> List[Optional[Dict[str, float]]]:
+    """
+    Per-row explanation dicts ({'baseline', 'score', 'attempts', 'time_taken'})
+    from a ``predict_risk_batch(..., explain=True)`` result; None for rows the
+    model could not explain, and for every row when it returned none.
+    """
+    if 'contributions' not in batch:
+        return [None] * len(batch['risk_score'])
+    return [_explanation(baseline, row) for baseline, row in zip(batch['baseline'], batch['contributions'])]
+
+def batch_versions(batch: Dict[str, any]) -> List[str]:
+    """
+    Per-row model version from a ``predict_risk_batch`` result, as stored in
+    progress_risk_version; rule-based results report their method instead.
+    """
+    versions = batch.get('model_version', batch['method'])
+    if not isinstance(versions, np.ndarray):
+        versions = [versions] * len(batch['risk_score'])
+    return [str(version) for version in versions]
+
+def _outcome_labels(score: np.ndarray, next_score: np.ndarray) -> np.ndarray:
+    """
+    Risk category implied by the learner's follow-up attempt: passing well is
+    Low, scraping through Medium, failing but improving High, failing without
+    improvement Critical.
+    """
+    return np.select(
+        [next_score >= 70, next_score >= 50, next_score > score],
+        [0, 1, 2],
+        3
+    ).astype(np.int8)
+
+def _as_feature_matrix(scores: ArrayLike, attempts: Optional[ArrayLike] = None,
+                       time_taken: Optional[ArrayLike] = None) -> np.ndarray:
+    """
+    Build an (n, 3) float matrix of [score, attempts, time_taken] rows.
+
+    Accepts either a single array/list of rows as ``scores`` or three
+    parallel columns.
+    """
+    if attempts is None and time_taken is None:
+        X = np.asarray(scores, dtype=float)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+    elif attempts is not None and time_taken is not None:
+        X = np.column_stack([
+            np.asarray(scores, dtype=float).ravel(),
+            np.asarray(attempts, dtype=float).ravel(),
+            np.asarray(time_taken, dtype=float).ravel()
+        ])
+    else:
+        raise ValueError("Pass either a matrix of rows or all three feature columns")
+
+    if X.ndim != 2 or X.shape[1] != 3:
+        raise ValueError(f"Expected rows of [score, attempts, time_taken], got shape {X.shape}")
+    return X
+
+def measure_inference_latency(forest, scaler, X: np.ndarray, repeats: int = 200) -> Dict[str, float]:
+    """
+    Time ``forest`` on the serving path: single-row calls (p50/p99, as on quiz
+    submit) and one batch over ``X`` (mean per row). Times are microseconds.
+    """
+    single = np.empty(repeats)
+    for i in range(repeats):
+        row = X[i % len(X)].reshape(1, -1)
+        started = time.perf_counter()
+        forest.predict_proba(scaler.transform(row))
+        single[i] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    forest.predict_proba(scaler.transform(X))
+    batch = time.perf_counter() - started
+
+    return {
+        'single_p50_us': round(float(np.percentile(single, 50)) * 1e6, 2),
+        'single_p99_us': round(float(np.percentile(single, 99)) * 1e6, 2),
+        'batch_per_row_us': round(batch / len(X) * 1e6, 3)
+    }
+
+# Training data shared with tuning worker processes, set once per worker
+_tuning_data = {}
+
+def _init_tuning_worker(X: np.ndarray, y: np.ndarray):
+    _tuning_data['X'] = X
+    _tuning_data['y'] = y
+
+def _evaluate_candidate(params: Dict[str, int], cv: int, seed: int) -> Dict[str, any]:
+    """Cross-validate one hyperparameter set, then refit it on all data (runs in a worker)"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.model_selection import StratifiedKFold
+
+    X, y = _tuning_data['X'], _tuning_data['y']
+    scores = []
+    started = time.perf_counter()
+    for train_idx, test_idx in StratifiedKFold(n_splits=cv, shuffle=True, random_state=seed).split(X, y):
+        scaler = StandardScaler().fit(X[train_idx])
+        model = RandomForestClassifier(random_state=seed, **params)
+        model.fit(scaler.transform(X[train_idx]), y[train_idx])
+        scores.append(model.score(scaler.transform(X[test_idx]), y[test_idx]))
+
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(random_state=seed, **params).fit(scaler.transform(X), y)
+    arrays = export_forest(model, scaler, classes=range(len(RISK_LEVELS)))
+
+    return {
+        'params': params,
+        'cv_accuracy': round(float(np.mean(scores)), 4),
+        'cv_std': round(float(np.std(scores)), 4),
+        'fit_seconds': round(time.perf_counter() - started, 3),
+        'n_nodes': int(len(arrays['left'])),
+        'model_bytes': int(sum(array.nbytes for array in arrays.values())),
+        'arrays': arrays
+    }
+
+class PredictionCache:
+    """
+    Bounded LRU cache of ML predictions keyed on quantized features.
+
+    Quiz scores are percentages of small question counts, attempts are small
+    integers and time_taken is whole seconds, so a small cache absorbs most
+    repeat inputs. ``invalidate`` bumps a generation counter; ``put`` ignores
+    results computed against an older generation (i.e. an older model).
+    """
+
+    def __init__(self, maxsize: int = 4096, score_decimals: int = 2, time_decimals: int = 0):
+        self.maxsize = maxsize
+        self.score_decimals = score_decimals
+        self.time_decimals = time_decimals
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, score: float, attempts: int, time_taken: float) -> Tuple[float, int, float]:
+        return (
+            round(float(score), self.score_decimals),
+            int(round(float(attempts))),
+            round(float(time_taken), self.time_decimals)
+        )
+
+    def get(self, key) -> Optional[Dict[str, any]]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: Dict[str, any], generation: int):
+        with self._lock:
+            if generation != self.generation or self.maxsize <= 0:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'generation': self.generation
+            }
+
+def course_model_label(course_id: int, version: str) -> str:
+    """Version label stored with scores from a per-course model"""
+    return f"course-{course_id}/{version}"
+
+class _CourseModel:
+    __slots__ = ('model', 'scaler', 'version', 'nbytes', 'checked_at')
+
+    def __init__(self, model, scaler, version: Optional[str], nbytes: int, checked_at: float):
+        self.model = model
+        self.scaler = scaler
+        self.version = version
+        self.nbytes = nbytes
+        self.checked_at = checked_at
+
+class CourseModelCache:
+    """
+    LRU of per-course models, bounded by the bytes of their arrays and
+    lookup tables (mapped, or private for artifacts saved without them).
+
+    Thousands of courses may have a model; only the recently used ones stay
+    mapped. Courses without a model are remembered too, at a nominal
+    ``NEGATIVE_ENTRY_BYTES``, so scoring them doesn't hit the filesystem on
+    every call. A model larger than the whole budget is served but not kept.
+    """
+    NEGATIVE_ENTRY_BYTES = 256
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, course_id: int) -> Optional[_CourseModel]:
+        with self._lock:
+            entry = self._entries.get(course_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(course_id)
+            self.hits += 1
+            return entry
+
+    def put(self, course_id: int, entry: _CourseModel):
+        with self._lock:
+            previous = self._entries.pop(course_id, None)
+            if previous is not None:
+                self.bytes -= previous.nbytes
+            if entry.nbytes > self.max_bytes:
+                return
+            self._entries[course_id] = entry
+            self.bytes += entry.nbytes
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def invalidate(self, course_id: Optional[int] = None):
+        with self._lock:
+            if course_id is None:
+                self._entries.clear()
+                self.bytes = 0
+            else:
+                entry = self._entries.pop(course_id, None)
+                if entry is not None:
+                    self.bytes -= entry.nbytes
+
+    def stats(self) -> Dict[str, any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'courses': len(self._entries),
+                'models': sum(1 for entry in self._entries.values() if entry.model is not None),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
 class RiskAssessmentModel:
     def __init__(self):
+        started = time.perf_counter()
         self.model = None
         self.scaler = None
+        self.grid = None
         self.is_trained = False
+        # Seed artifact shipped with the app; the registry next to it takes precedence
+        self.artifact_path = 'models/risk_model.nlrm'
+        self.model_version = None
+        self._registry = None
+        self._refresh_lock = threading.Lock()
+        self._next_refresh = 0.0
+        self.refresh_interval = float(os.getenv('RISK_REGISTRY_POLL_SECONDS', 5))
+        # Legacy pickle files, only read to migrate to the artifact format
         self.model_path = 'models/risk_model.pkl'
         self.scaler_path = 'models/risk_scaler.pkl'
 
+        # Guards swapping model/scaler so readers never see a mixed pair
+        self._swap_lock = threading.Lock()
+        self._training_thread = None
+        self._trained_event = threading.Event()
+        self.training_state = 'idle'
+        self.training_mode = 'background'
+        self.timings = {}
+        self.cache = PredictionCache(maxsize=int(os.getenv('RISK_CACHE_SIZE', 4096)))
+        # Per-course models, loaded on first use; a budget of 0 disables them
+        self.course_models = CourseModelCache(
+            max_bytes=int(float(os.getenv('RISK_COURSE_MODEL_CACHE_MB', 64)) * 1024 * 1024)
+        )
+        self.hyperparameters = dict(DEFAULT_HYPERPARAMETERS)
+        self.grid_mode = os.getenv('RISK_LOOKUP_GRID', 'on').lower()
+        if self.grid_mode not in LOOKUP_GRID_MODES:
+            logger.warning(f"Unknown RISK_LOOKUP_GRID '{self.grid_mode}', using 'on'")
+            self.grid_mode = 'on'
+
+        self.inference_mode = os.getenv('RISK_INFERENCE_MODE', 'local').lower()
+        if self.inference_mode not in INFERENCE_MODES:
+            logger.warning(f"Unknown RISK_INFERENCE_MODE '{self.inference_mode}', using 'local'")
+            self.inference_mode = 'local'
+        self.remote = None
+
         # Create models directory if it doesn't exist
         os.makedirs('models', exist_ok=True)
 
-        # Try to load existing model
-        self._load_model()
+        if self.inference_mode == 'remote':
+            # The inference process owns the model; don't map it here too
+            self.remote = RiskInferenceClient(os.getenv('RISK_INFERENCE_SOCKET', DEFAULT_SOCKET_PATH))
+            logger.info(f"Risk predictions served by inference process at {self.remote.socket_path}")
+        else:
+            # Try to load existing model
+            self._load_model()
+        self.timings['load_seconds'] = round(time.perf_counter() - started, 4)
+
+    @property
+    def scoring_version(self) -> str:
+        """Version label stored with ML scores; the shipped seed artifact has no registry version"""
+        return self.model_version or 'seed'
+
+    def _install(self, model, scaler, grid: Optional[LookupGrid] = None):
+        """Atomically swap in a fitted model/scaler pair and its lookup grid, if any"""
+        with self._swap_lock:
+            self.model = model
+            self.scaler = scaler
+            self.grid = grid
+            self.is_trained = model is not None and scaler is not None
+            # Cached predictions belong to the previous model
+            self.cache.invalidate()
+        if self.is_trained:
+            self._trained_event.set()
+
+    def _snapshot(self):
+        """Return the current (model, scaler, grid) as a consistent snapshot"""
+        with self._swap_lock:
+            if not self.is_trained:
+                return None, None, None
+            return self.model, self.scaler, self.grid
+
+    @property
+    def registry(self) -> ModelRegistry:
+        """Versioned model registry stored next to ``artifact_path``"""
+        root = os.path.join(os.path.dirname(self.artifact_path), 'registry')
+        if self._registry is None or self._registry.root != root:
+            self._registry = ModelRegistry(root)
+        return self._registry
+
+    @property
+    def course_models_root(self) -> str:
+        """One registry per course, each in a directory named by course id"""
+        return os.path.join(os.path.dirname(self.artifact_path), 'course_models')
+
+    def course_registry(self, course_id: int) -> ModelRegistry:
+        return ModelRegistry(os.path.join(self.course_models_root, str(int(course_id))))
+
+    def course_model_versions(self) -> Dict[int, str]:
+        """Active version of every course that has its own model"""
+        root = self.course_models_root
+        if not os.path.isdir(root):
+            return {}
+        versions = {}
+        for name in os.listdir(root):
+            if name.isdigit():
+                active = ModelRegistry(os.path.join(root, name)).active_version()
+                if active:
+                    versions[int(name)] = active
+        return versions
+
+    def _course_model(self, course_id) -> Optional[_CourseModel]:
+        """The course's own model, if it has one, via the LRU; None means use the global model"""
+        if course_id is None or self.course_models.max_bytes <= 0:
+            return None
+        course_id = int(course_id)
+        now = time.monotonic()
+        entry = self.course_models.get(course_id)
+        if entry is not None and now - entry.checked_at < self.refresh_interval:
+            return entry if entry.model is not None else None
+
+        registry = self.course_registry(course_id)
+        active = registry.active_version()
+        if entry is not None and entry.version == active:
+            entry.checked_at = now
+            return entry if entry.model is not None else None
+
+        entry = _CourseModel(None, None, None, CourseModelCache.NEGATIVE_ENTRY_BYTES, now)
+        if active is not None:
+            try:
+                header, arrays = load_artifact(registry.path(active))
+                forest = ArtifactForest(arrays, header)
+                entry = _CourseModel(forest, ArtifactScaler(arrays), active, forest.nbytes, now)
+                self.course_models.loads += 1
+            except ArtifactError as e:
+                logger.error(f"Risk model {active} for course {course_id} unusable, using the global model: {e}")
+        self.course_models.put(course_id, entry)
+        return entry if entry.model is not None else None
 
     def _load_model(self):
         """Load pre-trained model if available"""
         try:
-            if os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
-                with open(self.model_path, 'rb') as f:
-                    self.model = pickle.load(f)
-                with open(self.scaler_path, 'rb') as f:
-                    self.scaler = pickle.load(f)
-                self.is_trained = True
-                logger.info("Loaded pre-trained risk assessment model")
+            active = self.registry.active_version()
+            if active:
+                self._load_artifact(self.registry.path(active), active)
+            elif os.path.exists(self.artifact_path):
+                self._load_artifact(self.artifact_path, None)
+            elif os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
+                # One worker migrates; the rest wait and load its result
+                with self.registry.training_lock:
+                    active = self.registry.active_version()
+                    if active:
+                        self._load_artifact(self.registry.path(active), active)
+                        return
+                    # Unpickling pulls in sklearn; only happens once per legacy install
+                    with open(self.model_path, 'rb') as f:
+                        model = pickle.load(f)
+                    with open(self.scaler_path, 'rb') as f:
+                        scaler = pickle.load(f)
+                    logger.info("Loaded legacy pickled risk model, migrating to artifact format")
+                    self._publish(export_forest(model, scaler), {'migrated_from': 'pickle'})
+                    self.training_state = 'loaded'
             else:
                 logger.info("No pre-trained model found, using rule-based fallback")
+        except ArtifactError as e:
+            logger.error(f"Model artifact unusable, using rule-based fallback: {e}")
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
 
-    def _generate_training_data(self) -> Tuple[np.ndarray, np.ndarray]:
+    def _model_artifact_path(self) -> str:
+        """File the installed model was loaded from or published to"""
+        return self.registry.path(self.model_version) if self.model_version else self.artifact_path
+
+    def _load_grid(self, path: str, arrays: Dict[str, np.ndarray]) -> Optional[LookupGrid]:
+        """Map the lookup grid compiled for the model at ``path``, if there is a matching one"""
+        if self.grid_mode == 'off' or not os.path.exists(grid_path(path)):
+            return None
+        try:
+            grid = load_grid(grid_path(path), model_fingerprint(arrays))
+        except ArtifactError as e:
+            logger.error(f"Lookup grid unusable, scoring with the forest: {e}")
+            return None
+        if grid is None:
+            logger.warning(f"Ignoring stale lookup grid {grid_path(path)}")
+        return grid
+
+    def _load_artifact(self, path: str, version: Optional[str]):
+        header, arrays = load_artifact(path)
+        self._install(ArtifactForest(arrays, header), ArtifactScaler(arrays), self._load_grid(path, arrays))
+        self.model_version = version
+        self.hyperparameters.update(header['meta'].get('hyperparameters', {}))
+        self.training_state = 'loaded'
+        logger.info(f"Loaded risk assessment model {version or 'seed artifact'} "
+                    f"(format v{header['format_version']})")
+
+    def refresh(self) -> bool:
+        """
+        Swap in the registry's active version if it changed since we loaded.
+        Returns True when a different model was installed.
+        """
+        active = self.registry.active_version()
+        if active is not None and active == self.model_version and self.grid is None:
+            # A grid may have been compiled for the running version by another process
+            return self._refresh_grid()
+        if active is None or active == self.model_version:
+            return False
+        try:
+            self._load_artifact(self.registry.path(active), active)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to hot-swap risk model {active}: {e}")
+            return False
+
+    def _refresh_grid(self) -> bool:
+        model, _, _ = self._snapshot()
+        if not isinstance(model, ArtifactForest):
+            return False
+        grid = self._load_grid(self._model_artifact_path(), model.arrays)
+        if grid is None:
+            return False
+        with self._swap_lock:
+            if self.model is not model:
+                return False
+            self.grid = grid
+        logger.info(f"Loaded lookup grid for risk model {self.model_version or 'seed artifact'}")
+        return True
+
+    def _maybe_refresh(self):
+        """Poll the registry at most once per refresh_interval, from one thread at a time"""
+        now = time.monotonic()
+        if now < self._next_refresh or not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_refresh = now + self.refresh_interval
+            self.refresh()
+        finally:
+            self._refresh_lock.release()
+
+    def _generate_training_data(self, n_samples: int = 1000, seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
         """Generate synthetic training data for risk assessment"""
-        np.random.seed(42)
-
-        # Generate sample data: [score, attempts, time_taken]
-        n_samples = 1000
-        X = np.random.rand(n_samples, 3)
-        X[:, 0] = X[:, 0] * 100  # score 0-100
-        X[:, 1] = np.random.poisson(2, n_samples) + 1  # attempts (1-5+)
-        X[:, 2] = X[:, 2] * 600 + 60  # time_taken 60-660 seconds
-
-        # Generate risk labels based on rules
-        y = []
-        for sample in X:
-            score, attempts, time_taken = sample
-            risk = 0
-
-            if score < 50:
-                risk += 40
-            elif score < 70:
-                risk += 20
-
-            if attempts > 3:
-                risk += 30
-            elif attempts > 1:
-                risk += 15
-
-            if time_taken > 300:
-                risk += 30
-            elif time_taken > 180:
-                risk += 15
-
-            # Add some noise and cap at 100
-            risk = min(risk + np.random.normal(0, 5), 100)
-            risk = max(risk, 0)
-
-            # Convert to risk categories
-            if risk < 25:
-                y.append(0)  # Low risk
-            elif risk < 50:
-                y.append(1)  # Medium risk
-            elif risk < 75:
-                y.append(2)  # High risk
-            else:
-                y.append(3)  # Critical risk
+        chunks = list(self.iter_training_data(n_samples, seed=seed))
+        X = np.concatenate([X for X, _ in chunks])
+        y = np.concatenate([y for _, y in chunks])
+        return X, y
+
+    def iter_training_data(self, n_samples: int = 1000, chunk_size: Optional[int] = None,
+                           seed: int = 42) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Yield synthetic (X, y) training chunks of at most ``chunk_size`` rows.
+
+        Labels are the rule-based points plus N(0, 5) noise, bucketed into the
+        four risk categories. Output is deterministic for a given seed and
+        chunk size, and only one chunk is held in memory at a time.
+        """
+        rng = np.random.default_rng(seed)
+        chunk_size = chunk_size or n_samples
+
+        for start in range(0, n_samples, chunk_size):
+            n = min(chunk_size, n_samples - start)
+
+            # Generate sample data: [score, attempts, time_taken]
+            X = np.empty((n, 3))
+            X[:, 0] = rng.random(n) * 100  # score 0-100
+            X[:, 1] = rng.poisson(2, n) + 1  # attempts (1-5+)
+            X[:, 2] = rng.random(n) * 600 + 60  # time_taken 60-660 seconds
+
+            # Add some noise, cap to 0-100 and convert to risk categories
+            risk = np.clip(_rule_points(X) + rng.normal(0, 5, n), 0, 100)
+            y = np.searchsorted(RISK_BUCKET_EDGES, risk, side='right').astype(np.int8)
+
+            yield X, y
+
+    def train_model(self, n_samples: Optional[int] = None, source: Optional[str] = None,
+                    db_path: Optional[str] = None, incremental: bool = False):
+        """
+        Train the risk assessment model.
+
+        ``source`` is 'synthetic' (default, or RISK_MODEL_TRAINING_SOURCE) or
+        'history' to learn from real UserProgress rows via train_from_history.
+        """
+        source = source or os.getenv('RISK_MODEL_TRAINING_SOURCE', 'synthetic')
+        if source == 'history':
+            return self.train_from_history(db_path, incremental=incremental)
 
-        return X, np.array(y)
+        # sklearn is only needed for training; inference runs on ArtifactForest
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.model_selection import train_test_split
 
-    def train_model(self):
-        """Train the risk assessment model"""
+        started = time.perf_counter()
+        lock = self._acquire_training_lock()
+        self.training_state = 'training'
         try:
             logger.info("Training risk assessment model...")
 
-            X, y = self._generate_training_data()
+            n_samples = n_samples or int(os.getenv('RISK_MODEL_TRAINING_SAMPLES', 1000))
+            X, y = self._generate_training_data(n_samples)
 
             # Split data
             X_train, X_test, y_train, y_test = train_test_split(
                 X, y, test_size=0.2, random_state=42
             )
 
-            # Scale features
-            self.scaler = StandardScaler()
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
+            # Fit into locals so concurrent predictions keep using the old pair
+            scaler = StandardScaler()
+            X_train_scaled = scaler.fit_transform(X_train)
+            X_test_scaled = scaler.transform(X_test)
 
             # Train model
-            self.model = RandomForestClassifier(
-                n_estimators=100,
-                max_depth=10,
-                random_state=42
-            )
-            self.model.fit(X_train_scaled, y_train)
+            model = RandomForestClassifier(random_state=42, **self.hyperparameters)
+            model.fit(X_train_scaled, y_train)
 
             # Evaluate
-            train_score = self.model.score(X_train_scaled, y_train)
-            test_score = self.model.score(X_test_scaled, y_test)
+            train_score = model.score(X_train_scaled, y_train)
+            test_score = model.score(X_test_scaled, y_test)
 
             logger.info(f"Model trained - Train accuracy: {train_score:.3f}, Test accuracy: {test_score:.3f}")
 
-            # Save model
-            self._save_model()
-            self.is_trained = True
+            # Swap in and save model, serving through the same engine as loaded artifacts
+            self._publish(export_forest(model, scaler), {
+                'source': 'synthetic',
+                'hyperparameters': self.hyperparameters,
+                'train_accuracy': round(train_score, 4),
+                'test_accuracy': round(test_score, 4)
+            })
+            self.training_state = 'trained'
 
         except Exception as e:
             logger.error(f"Model training failed: {e}")
-            self.is_trained = False
+            self.training_state = 'failed'
+        finally:
+            lock.release()
+            self.timings['train_seconds'] = round(time.perf_counter() - started, 4)
+
+    def tune_model(self, param_grid: Optional[Dict[str, List[int]]] = None, n_iter: Optional[int] = None,
+                   cv: int = 5, n_samples: int = 5000, n_jobs: Optional[int] = None,
+                   max_latency_us: Optional[float] = None, apply: bool = False,
+                   seed: int = 42) -> Dict[str, any]:
+        """
+        Search forest hyperparameters with k-fold CV across a process pool.
+
+        Evaluates the full ``param_grid`` or, with ``n_iter``, a random sample
+        of it. Each candidate is cross-validated and refit in a worker; the
+        parent then times every refit forest on the serving path, so results
+        carry accuracy, size and per-row latency side by side. The best
+        candidate is the most accurate one within ``max_latency_us`` (single
+        row p99). With ``apply`` it becomes the live model and the
+        hyperparameters used by later train_model calls.
+        """
+        param_grid = param_grid or DEFAULT_PARAM_GRID
+        names = sorted(param_grid)
+        candidates = [dict(zip(names, values)) for values in itertools.product(*(param_grid[n] for n in names))]
+        if n_iter and n_iter < len(candidates):
+            picks = np.random.default_rng(seed).choice(len(candidates), n_iter, replace=False)
+            candidates = [candidates[i] for i in sorted(picks)]
+
+        X, y = self._generate_training_data(n_samples, seed=seed)
+        logger.info(f"Tuning risk model: {len(candidates)} candidates x {cv} folds on {len(X)} samples")
 
-    def _save_model(self):
-        """Save trained model to disk"""
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count(),
+                                 initializer=_init_tuning_worker, initargs=(X, y)) as pool:
+            results = list(pool.map(_evaluate_candidate, candidates,
+                                    itertools.repeat(cv), itertools.repeat(seed)))
+        search_seconds = time.perf_counter() - started
+
+        # Latency is measured here, one candidate at a time, so workers don't skew it
+        latency_X = X[:1000]
+        for result in results:
+            arrays = result['arrays']
+            result.update(measure_inference_latency(ArtifactForest(arrays), ArtifactScaler(arrays), latency_X))
+
+        results.sort(key=lambda r: (-r['cv_accuracy'], r['single_p99_us']))
+        eligible = [r for r in results if max_latency_us is None or r['single_p99_us'] <= max_latency_us]
+        best = eligible[0] if eligible else None
+
+        if apply and best:
+            self.hyperparameters = dict(DEFAULT_HYPERPARAMETERS, **best['params'])
+            self._publish(best['arrays'], {
+                'source': 'synthetic',
+                'hyperparameters': self.hyperparameters,
+                'cv_accuracy': best['cv_accuracy']
+            })
+            logger.info(f"Applied tuned hyperparameters {best['params']}")
+
+        for result in results:
+            del result['arrays']
+        return {
+            'results': results,
+            'best': best,
+            'cv': cv,
+            'n_samples': len(X),
+            'search_seconds': round(search_seconds, 2)
+        }
+
+    def iter_progress_history(self, db_path: Optional[str] = None, after_id: int = 0,
+                              chunk_size: int = 50000,
+                              course_id: Optional[int] = None) -> Iterator[Tuple[np.ndarray, np.ndarray, int]]:
+        """
+        Stream labeled (X, y, last_id) chunks of real quiz attempts from SQLite.
+
+        X holds an attempt's [score, attempts, time_taken]; y is derived from the
+        learner's next attempt at the same course. Pages are fetched by keyset
+        on the follow-up id (``id > last_id``) so each query stays cheap no
+        matter how deep into the table it is. ``course_id`` limits the
+        stream to one course.
+        """
+        conn = sqlite3.connect(f"file:{db_path or DEFAULT_DB_PATH}?mode=ro", uri=True)
         try:
-            with open(self.model_path, 'wb') as f:
-                pickle.dump(self.model, f)
-            with open(self.scaler_path, 'wb') as f:
-                pickle.dump(self.scaler, f)
-            logger.info("Model saved successfully")
+            while True:
+                if course_id is None:
+                    rows = conn.execute(HISTORY_QUERY, (after_id, chunk_size)).fetchall()
+                else:
+                    rows = conn.execute(COURSE_HISTORY_QUERY, (after_id, int(course_id), chunk_size)).fetchall()
+                if not rows:
+                    break
+
+                data = np.asarray(rows, dtype=float)
+                after_id = int(data[-1, 0])
+                yield data[:, 1:4], _outcome_labels(data[:, 1], data[:, 4]), after_id
+
+                if len(rows) < chunk_size:
+                    break
+        finally:
+            conn.close()
+
+    def train_from_history(self, db_path: Optional[str] = None, incremental: bool = True,
+                           chunk_size: int = 50000, trees_per_chunk: int = 10,
+                           max_trees: int = 200, min_rows: int = 50) -> bool:
+        """
+        Train on real UserProgress history streamed from SQLite.
+
+        Each chunk of labeled attempts grows ``trees_per_chunk`` new trees that
+        are appended to the forest (warm start), keeping the newest
+        ``max_trees``. With ``incremental`` the current history-trained model
+        is extended using only attempts whose follow-up arrived after the
+        ``last_progress_id`` checkpoint in its metadata; otherwise the forest
+        is rebuilt from the whole table. Returns True if a model was installed.
+        """
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.preprocessing import StandardScaler
+
+        db_path = db_path or DEFAULT_DB_PATH
+        started = time.perf_counter()
+        # Held across reading the checkpoint and publishing so runs never overlap
+        lock = self._acquire_training_lock()
+        self.training_state = 'training'
+        try:
+            self.refresh()
+            model, scaler, _ = self._snapshot()
+            if incremental and isinstance(model, ArtifactForest) and 'last_progress_id' in model.meta:
+                arrays = model.arrays
+                checkpoint = int(model.meta['last_progress_id'])
+                rows_seen = int(model.meta.get('history_rows', 0))
+                logger.info(f"Updating risk model with attempts after progress id {checkpoint}...")
+            else:
+                # Full rebuild: one pass to fit the scaler, a second to grow trees
+                arrays, checkpoint, rows_seen = None, 0, 0
+                scaler = StandardScaler()
+                for X, _, _ in self.iter_progress_history(db_path, 0, chunk_size):
+                    scaler.partial_fit(X)
+                if not hasattr(scaler, 'mean_'):
+                    logger.info("No labeled UserProgress history to train on")
+                    self.training_state = 'idle' if not self.is_trained else 'trained'
+                    return False
+                logger.info("Training risk model from UserProgress history...")
+
+            last_id = checkpoint
+            for X, y, chunk_last_id in self.iter_progress_history(db_path, checkpoint, chunk_size):
+                if len(y) < min_rows:
+                    # Leave a thin tail for the next run rather than fit trees on a handful of rows
+                    logger.info(f"Only {len(y)} new labeled attempts after id {last_id}, deferring")
+                    break
+
+                # Tuned settings, but each chunk grows its own few trees
+                forest = RandomForestClassifier(**dict(
+                    self.hyperparameters,
+                    n_estimators=trees_per_chunk,
+                    random_state=chunk_last_id % (2 ** 31)
+                ))
+                forest.fit(scaler.transform(X), y)
+                chunk_arrays = export_forest(forest, scaler, classes=range(len(RISK_LEVELS)))
+                arrays = chunk_arrays if arrays is None else merge_forests(arrays, chunk_arrays, max_trees)
+                last_id = chunk_last_id
+                rows_seen += len(y)
+
+            if last_id == checkpoint:
+                logger.info("No new UserProgress history since last checkpoint")
+                self.training_state = 'trained' if self.is_trained else 'idle'
+                return False
+
+            self._publish(arrays, {
+                'source': 'user_progress',
+                'last_progress_id': last_id,
+                'history_rows': rows_seen,
+                'hyperparameters': self.hyperparameters,
+                'incremental': checkpoint > 0
+            })
+            logger.info(f"Risk model trained on {rows_seen} historical attempts (checkpoint id {last_id})")
+            self.training_state = 'trained'
+            return True
+
         except Exception as e:
-            logger.error(f"Failed to save model: {e}")
+            logger.error(f"History training failed: {e}")
+            self.training_state = 'failed'
+            return False
+        finally:
+            lock.release()
+            self.timings['train_seconds'] = round(time.perf_counter() - started, 4)
+
+    def train_course_model(self, course_id: int, db_path: Optional[str] = None,
+                           min_rows: Optional[int] = None) -> Optional[str]:
+        """
+        Train a model on one course's UserProgress history and publish it to
+        the course's registry.
+
+        The new version is activated only if it scores at least as well as
+        the global model on the course's held-out attempts; otherwise the
+        course keeps falling back to the global model. Returns the activated
+        version, or None.
+        """
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.model_selection import train_test_split
+
+        min_rows = min_rows or int(os.getenv('RISK_COURSE_MODEL_MIN_ROWS', DEFAULT_COURSE_MODEL_MIN_ROWS))
+        chunks = list(self.iter_progress_history(db_path, course_id=course_id))
+        y = np.concatenate([chunk_y for _, chunk_y, _ in chunks]) if chunks else np.empty(0)
+        if len(y) < min_rows or len(np.unique(y)) < 2:
+            logger.info(f"Course {course_id}: {len(y)} labeled attempts, not enough for its own risk model")
+            return None
+        X = np.concatenate([chunk_X for chunk_X, _, _ in chunks])
+        last_id = chunks[-1][2]
+
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        scaler = StandardScaler().fit(X_train)
+        forest = RandomForestClassifier(random_state=42, **self.hyperparameters)
+        forest.fit(scaler.transform(X_train), y_train)
+        arrays = export_forest(forest, scaler, classes=range(len(RISK_LEVELS)))
+        test_score = float(forest.score(scaler.transform(X_test), y_test))
 
-    def predict_risk(self, score: float, attempts: int, time_taken: float) -> Dict[str, any]:
+        model, global_scaler, _ = self._snapshot()
+        global_score = None
+        if model is not None:
+            global_score = float(np.mean(
+                model.predict_proba(global_scaler.transform(X_test)).argmax(axis=1) == y_test
+            ))
+        activate = global_score is None or test_score >= global_score
+
+        registry = self.course_registry(course_id)
+        with registry.training_lock:
+            version = registry.publish(arrays, {
+                'source': 'user_progress',
+                'course_id': int(course_id),
+                'last_progress_id': int(last_id),
+                'history_rows': int(len(y)),
+                'hyperparameters': self.hyperparameters,
+                'test_accuracy': round(test_score, 4),
+                'global_test_accuracy': round(global_score, 4) if global_score is not None else None
+            }, activate=activate)
+        self.course_models.invalidate(int(course_id))
+
+        if not activate:
+            logger.info(f"Course {course_id}: own model {version} ({test_score:.3f}) not better than "
+                        f"the global model ({global_score:.3f}), keeping the global model")
+            return None
+        baseline = f"{global_score:.3f}" if global_score is not None else "none"
+        logger.info(f"Course {course_id}: activated risk model {version} on {len(y)} attempts "
+                    f"(test accuracy {test_score:.3f}, global {baseline})")
+        return version
+
+    def train_course_models(self, db_path: Optional[str] = None,
+                            min_rows: Optional[int] = None) -> Dict[int, Optional[str]]:
+        """Train a model for every course with at least ``min_rows`` labeled attempts"""
+        min_rows = min_rows or int(os.getenv('RISK_COURSE_MODEL_MIN_ROWS', DEFAULT_COURSE_MODEL_MIN_ROWS))
+        conn = sqlite3.connect(f"file:{db_path or DEFAULT_DB_PATH}?mode=ro", uri=True)
+        try:
+            course_ids = [row[0] for row in conn.execute(COURSE_LABELED_COUNTS_QUERY, (min_rows,))]
+        finally:
+            conn.close()
+        return {course_id: self.train_course_model(course_id, db_path, min_rows) for course_id in course_ids}
+
+    def _acquire_training_lock(self):
+        """Take the registry's cross-process training lock, waiting for any other trainer"""
+        lock = self.registry.training_lock
+        if not lock.acquire(blocking=False):
+            logger.info("Risk model training already running elsewhere, waiting for it to finish...")
+            self.training_state = 'waiting'
+            lock.acquire()
+        return lock
+
+    def _train_unless_published(self):
         """
-        Predict risk level using ML model or fallback to rule-based
+        Startup training: only one worker trains, the others load its result.
+
+        Whoever gets the training lock first trains and publishes. Workers that
+        waited on the lock find the new active version and load it instead.
         """
-        features = np.array([[score, attempts, time_taken]])
+        lock = self._acquire_training_lock()
+        try:
+            if self.refresh() or self.is_trained:
+                logger.info(f"Loaded risk model {self.model_version} trained by another process")
+                return
+            self.train_model()
+        finally:
+            lock.release()
+
+    def start_background_training(self) -> bool:
+        """
+        Train in a daemon thread while predictions use the rule-based path.
+        Returns False if a model is already trained or training is running.
+        """
+        with self._swap_lock:
+            if self.is_trained or (self._training_thread and self._training_thread.is_alive()):
+                return False
+            self.training_state = 'training'
+            self._training_thread = threading.Thread(
+                target=self._train_unless_published, name='risk-model-training', daemon=True
+            )
+        self._training_thread.start()
+        logger.info("Risk model training started in background, serving rule-based scores meanwhile")
+        return True
+
+    def wait_until_trained(self, timeout: Optional[float] = None) -> bool:
+        """Block until a trained model is installed; returns is_trained"""
+        thread = self._training_thread
+        if thread is not None:
+            thread.join(timeout)
+        elif not self.is_trained:
+            self._trained_event.wait(timeout)
+        return self.is_trained
 
-        if self.is_trained and self.model and self.scaler:
+    def initialize(self, mode: Optional[str] = None):
+        """Apply the startup training mode when no saved model was loaded"""
+        mode = (mode or os.getenv('RISK_MODEL_TRAINING_MODE', 'background')).lower()
+        if mode not in TRAINING_MODES:
+            logger.warning(f"Unknown RISK_MODEL_TRAINING_MODE '{mode}', using 'background'")
+            mode = 'background'
+        self.training_mode = mode
+
+        if self.is_trained or self.remote is not None:
+            return
+        if mode == 'background':
+            self.start_background_training()
+        elif mode == 'blocking':
+            logger.info("Initializing risk assessment model...")
+            self._train_unless_published()
+
+    def _publish(self, arrays: Dict[str, np.ndarray], meta: Dict[str, any]):
+        """Install freshly exported model arrays and persist them"""
+        meta = dict(meta)
+        meta.update({
+            'n_estimators': len(arrays['roots']),
+            'features': ['score', 'attempts', 'time_taken']
+        })
+        self._install(ArtifactForest(arrays, {'meta': meta}), ArtifactScaler(arrays))
+        self._save_model(arrays, meta)
+        if self.grid_mode == 'auto':
             try:
-                # Scale features
-                features_scaled = self.scaler.transform(features)
+                self.compile_grid()
+            except Exception as e:
+                logger.error(f"Failed to compile lookup grid: {e}")
+
+    def _save_model(self, arrays: Dict[str, np.ndarray], meta: Dict[str, any]):
+        """Publish exported model arrays as the registry's new active version"""
+        try:
+            self.model_version = self.registry.publish(arrays, meta)
+            logger.info(f"Model saved successfully as {self.model_version}")
+        except Exception as e:
+            logger.error(f"Failed to save model: {e}")
+
+    def compile_grid(self, axes: Optional[Dict[str, Tuple[float, float, int]]] = None,
+                     validate_samples: int = 200000) -> Optional[Dict[str, any]]:
+        """
+        Compile the installed forest into a dense lookup grid and start using it.
 
-                # Get prediction and probability
-                risk_category = self.model.predict(features_scaled)[0]
-                probabilities = self.model.predict_proba(features_scaled)[0]
+        The grid is saved next to the model artifact so every worker serving
+        that version maps it. Returns the grid description, including the
+        worst-case disagreement with the full forest on ``validate_samples``
+        random inputs.
+        """
+        model, scaler, _ = self._snapshot()
+        if not isinstance(model, ArtifactForest):
+            logger.warning("No trained risk model to compile into a lookup grid")
+            return None
+
+        axes = axes or DEFAULT_AXES
+        started = time.perf_counter()
+        arrays = build_grid(model, scaler, axes)
+        meta = {
+            'kind': 'lookup_grid',
+            'axes': {name: list(axis) for name, axis in axes.items()},
+            'model_fingerprint': model_fingerprint(model.arrays),
+            'model_version': self.model_version
+        }
+        grid = LookupGrid(arrays, {'meta': meta})
+        meta['disagreement'] = check_grid(grid, model, scaler, validate_samples)
+        meta['build_seconds'] = round(time.perf_counter() - started, 3)
 
-                # Convert category to risk score and level
-                risk_levels = ['Low', 'Medium', 'High', 'Critical']
-                risk_score = (risk_category / 3) * 100  # Convert to 0-100 scale
+        path = grid_path(self._model_artifact_path())
+        save_artifact(path, arrays, meta)
+        with self._swap_lock:
+            if self.model is model and self.grid_mode != 'off':
+                self.grid = load_grid(path)
+        self.cache.invalidate()
 
+        report = meta['disagreement']
+        logger.info(f"Lookup grid compiled in {meta['build_seconds']}s ({grid.category.size} cells, "
+                    f"{grid.nbytes} bytes): category mismatch rate {report['category_mismatch_rate']:.4%}, "
+                    f"max confidence diff {report['max_confidence_diff']}")
+        return grid.describe()
+
+    def predict_risk(self, score: float, attempts: int, time_taken: float,
+                     course_id: Optional[int] = None, explain: bool = False) -> Dict[str, any]:
+        """
+        Predict risk level using ML model or fallback to rule-based.
+
+        With ``course_id``, the course's own model is used if it has one.
+        ``explain`` adds an ``explanation`` dict (see ``predict_risk_batch``);
+        explained predictions skip the lookup grid but are still cached.
+        """
+        if self.remote is not None:
+            try:
+                return self._batch_row(self.remote.predict_batch([[score, attempts, time_taken]]), 0)
+            except RiskServerUnavailable:
+                # The client logs outages once; keep answering quiz submissions meanwhile
+                return self._rule_based_risk(score, attempts, time_taken)
+
+        course = self._course_model(course_id)
+        if course is not None:
+            X = _as_feature_matrix([score, attempts, time_taken])
+            batch = self._forest_risk_batch(course.model, course.scaler, X)
+            if explain:
+                self._explain_forest_batch(batch, course.model, course.scaler, X)
+            batch['model_version'] = course_model_label(course_id, course.version)
+            return self._batch_row(batch, 0)
+
+        self._maybe_refresh()
+        # The grid stores categories only, so explained predictions go through the cache
+        grid = None if explain else self.grid
+        if grid is not None:
+            hit = grid.lookup_one(score, attempts, time_taken)
+            if hit is not None:
+                risk_category, confidence = hit
                 return {
-                    'risk_score': round(risk_score, 2),
-                    'risk_level': risk_levels[risk_category],
-                    'confidence': round(max(probabilities) * 100, 2),
-                    'probabilities': {
-                        'low': round(probabilities[0] * 100, 2),
-                        'medium': round(probabilities[1] * 100, 2),
-                        'high': round(probabilities[2] * 100, 2),
-                        'critical': round(probabilities[3] * 100, 2)
-                    },
-                    'method': 'machine_learning'
+                    'risk_score': round(risk_category / 3 * 100, 2),
+                    'risk_level': RISK_LEVELS[risk_category],
+                    'confidence': float(confidence),
+                    'method': 'machine_learning',
+                    'model_version': self.scoring_version
                 }
 
+        if not self.is_trained or self.cache.maxsize <= 0 or grid is not None:
+            batch = self.predict_risk_batch([[score, attempts, time_taken]], explain=explain)
+            return self._batch_row(batch, 0)
+
+        # Score the quantized features so every cache key has exactly one answer
+        key = self.cache.key(score, attempts, time_taken)
+        cached = self.cache.get(key)
+        if cached is None or (explain and 'explanation' not in cached):
+            # An explained entry also answers plain lookups, so it replaces the plain one
+            generation = self.cache.generation
+            cached = self._batch_row(self.predict_risk_batch([key], explain=explain), 0)
+            if cached['method'] == 'machine_learning':
+                self.cache.put(key, cached, generation)
+
+        result = dict(cached)
+        if 'probabilities' in result:
+            result['probabilities'] = dict(result['probabilities'])
+        if 'explanation' in result:
+            if explain:
+                result['explanation'] = dict(result['explanation'])
+            else:
+                del result['explanation']
+        return result
+
+    def predict_risk_batch(self, scores: ArrayLike, attempts: Optional[ArrayLike] = None,
+                           time_taken: Optional[ArrayLike] = None,
+                           course_ids: Optional[ArrayLike] = None, explain: bool = False) -> Dict[str, any]:
+        """
+        Score many rows at once.
+
+        Takes an (n, 3) array / list of [score, attempts, time_taken] rows, or
+        three parallel columns. The scaler, ``predict`` and ``predict_proba``
+        each run once for the whole batch. Returns columnar arrays:
+        ``risk_score``, ``risk_level``, ``confidence`` and (ML path only)
+        ``probabilities`` with shape (n, 4), plus the ``method`` used and,
+        for ML results, the ``model_version`` that produced them.
+
+        With a compiled lookup grid, rows inside the grid are a single index
+        and only the rest walk the forest; ``probabilities`` is then omitted.
+
+        ``course_ids`` (one per row, None for no course) scores each row with
+        its course's own model where there is one. ``model_version`` is then
+        per row, and ``probabilities`` is omitted. The shared inference
+        process only serves the global model, so remote mode ignores them.
+
+        ``explain`` adds ``contributions``, an (n, 3) array splitting each
+        row's risk between score, attempts and time_taken (FEATURE_NAMES
+        order), and a per-row ``baseline`` they add up from. For the forest
+        these come from the decision paths of every tree in one vectorized
+        pass and explain the probability-weighted expected risk, which
+        ``risk_score`` (the most likely category) rounds to a bucket; for
+        rule-based scores they are each feature's rule points. Remote mode
+        returns no explanation.
+        """
+        X = _as_feature_matrix(scores, attempts, time_taken)
+
+        if self.remote is not None:
+            try:
+                return self.remote.predict_batch(X)
+            except RiskServerUnavailable:
+                return self._rule_based_risk_batch(X, explain)
+
+        if course_ids is not None:
+            return self._per_course_risk_batch(X, course_ids, explain)
+
+        self._maybe_refresh()
+        model, scaler, grid = self._snapshot()
+        if model is None and self.training_mode == 'lazy':
+            self.start_background_training()
+
+        if model is not None and scaler is not None:
+            version = self.scoring_version
+            try:
+                if grid is not None:
+                    batch = self._grid_risk_batch(grid, model, scaler, X)
+                else:
+                    batch = self._forest_risk_batch(model, scaler, X)
+                if explain:
+                    self._explain_forest_batch(batch, model, scaler, X)
+                batch['model_version'] = version
+                return batch
+
             except Exception as e:
                 logger.error(f"ML prediction failed: {e}")
-                return self._rule_based_risk(score, attempts, time_taken)
+                return self._rule_based_risk_batch(X, explain)
 
         else:
-            return self._rule_based_risk(score, attempts, time_taken)
+            return self._rule_based_risk_batch(X, explain)
+
+    @staticmethod
+    def _forest_risk_batch(model, scaler, X: np.ndarray) -> Dict[str, any]:
+        # One forest pass; predict() would walk every tree a second time
+        probabilities = model.predict_proba(scaler.transform(X))
+        risk_category = np.asarray(model.classes_)[probabilities.argmax(axis=1)].astype(int)
+
+        return {
+            'risk_score': np.round(risk_category / 3 * 100, 2),
+            'risk_level': np.asarray(RISK_LEVELS, dtype=object)[risk_category],
+            'confidence': np.round(probabilities.max(axis=1) * 100, 2),
+            'probabilities': np.round(probabilities * 100, 2),
+            'method': 'machine_learning'
+        }
+
+    @staticmethod
+    def _explain_forest_batch(batch: Dict[str, any], model, scaler, X: np.ndarray):
+        """Add per-feature contributions to expected risk from the forest's decision paths"""
+        if not hasattr(model, 'contributions'):
+            # Only mmap artifacts carry the node arrays; older pickled models stay unexplained
+            return
+        node_values = model.expected_values(np.asarray(model.classes_) / 3 * 100)
+        baseline, contributions = model.contributions(scaler.transform(X), node_values)
+        batch['baseline'] = np.full(len(X), round(baseline, 2))
+        batch['contributions'] = np.round(contributions, 2)
+
+    def _per_course_risk_batch(self, X: np.ndarray, course_ids: ArrayLike,
+                               explain: bool = False) -> Dict[str, any]:
+        """Score each course's rows with its own model, the rest with one global batch"""
+        codes = np.array([-1 if course_id is None else int(course_id) for course_id in course_ids])
+        if len(codes) != len(X):
+            raise ValueError(f"Got {len(codes)} course ids for {len(X)} rows")
+
+        own = {}
+        for course_id in np.unique(codes[codes >= 0]):
+            course = self._course_model(int(course_id))
+            if course is not None:
+                own[int(course_id)] = course
+        if not own:
+            return self.predict_risk_batch(X, explain=explain)
+
+        n = len(X)
+        batch = {
+            'risk_score': np.empty(n),
+            'risk_level': np.empty(n, dtype=object),
+            'confidence': np.empty(n),
+            'model_version': np.empty(n, dtype=object)
+        }
+        keys = ['risk_score', 'risk_level', 'confidence']
+        if explain:
+            batch['baseline'] = np.full(n, np.nan)
+            batch['contributions'] = np.full((n, len(FEATURE_NAMES)), np.nan)
+            keys += ['baseline', 'contributions']
+        methods = set()
+
+        def fill(rows, part, version):
+            for key in keys:
+                if key in part:
+                    batch[key][rows] = part[key]
+            batch['model_version'][rows] = version
+            methods.add(part['method'])
+
+        shared = ~np.isin(codes, list(own))
+        if shared.any():
+            part = self.predict_risk_batch(X[shared], explain=explain)
+            fill(shared, part, part.get('model_version', part['method']))
+        for course_id, course in own.items():
+            rows = codes == course_id
+            part = self._forest_risk_batch(course.model, course.scaler, X[rows])
+            if explain:
+                self._explain_forest_batch(part, course.model, course.scaler, X[rows])
+            fill(rows, part, course_model_label(course_id, course.version))
+
+        # 'mixed' when the global part fell back to rule-based while course models answered
+        batch['method'] = methods.pop() if len(methods) == 1 else 'mixed'
+        return batch
+
+    @staticmethod
+    def _grid_risk_batch(grid: LookupGrid, model, scaler, X: np.ndarray) -> Dict[str, any]:
+        risk_category, confidence, in_grid = grid.lookup(X)
+        risk_category = risk_category.astype(int)
+        confidence = confidence.astype(float)
+        if not in_grid.all():
+            outside = ~in_grid
+            probabilities = model.predict_proba(scaler.transform(X[outside]))
+            risk_category[outside] = np.asarray(model.classes_)[probabilities.argmax(axis=1)]
+            confidence[outside] = np.round(probabilities.max(axis=1) * 100, 2)
+
+        return {
+            'risk_score': np.round(risk_category / 3 * 100, 2),
+            'risk_level': np.asarray(RISK_LEVELS, dtype=object)[risk_category],
+            'confidence': confidence,
+            'method': 'machine_learning'
+        }
+
+    @staticmethod
+    def _batch_row(batch: Dict[str, any], i: int) -> Dict[str, any]:
+        """Convert row ``i`` of a columnar batch result into a single prediction dict"""
+        result = {
+            'risk_score': float(batch['risk_score'][i]),
+            'risk_level': str(batch['risk_level'][i]),
+            'confidence': float(batch['confidence'][i])
+        }
+        if 'probabilities' in batch:
+            probabilities = batch['probabilities'][i]
+            result['probabilities'] = {
+                'low': float(probabilities[0]),
+                'medium': float(probabilities[1]),
+                'high': float(probabilities[2]),
+                'critical': float(probabilities[3])
+            }
+        if 'contributions' in batch:
+            explanation = _explanation(batch['baseline'][i], batch['contributions'][i])
+            if explanation is not None:
+                result['explanation'] = explanation
+        result['method'] = batch['method']
+        if 'model_version' in batch:
+            version = batch['model_version']
+            result['model_version'] = str(version[i]) if isinstance(version, np.ndarray) else version
+        return result
 
     def _rule_based_risk(self, score: float, attempts: int, time_taken: float) -> Dict[str, any]:
         """Fallback rule-based risk calculation"""
@@ -213,9 +1374,26 @@ class RiskAssessmentModel:
         return {
             'risk_score': round(risk, 2),
             'risk_level': level,
-            'confidence': 85.0,  # Rule-based confidence
+            'confidence': RULE_BASED_CONFIDENCE,
+            'method': 'rule_based'
+        }
+
+    def _rule_based_risk_batch(self, X: np.ndarray, explain: bool = False) -> Dict[str, any]:
+        """Vectorized rule-based risk calculation over an (n, 3) feature matrix"""
+        risk = np.clip(_rule_points(X), 0, 100).astype(float)
+        level_index = np.searchsorted(RISK_BUCKET_EDGES, risk, side='right')
+
+        batch = {
+            'risk_score': np.round(risk, 2),
+            'risk_level': np.asarray(RISK_LEVELS, dtype=object)[level_index],
+            'confidence': np.full(len(risk), RULE_BASED_CONFIDENCE),
             'method': 'rule_based'
         }
+        if explain:
+            # The points never total more than 100, so each feature's share is exact
+            batch['baseline'] = np.zeros(len(risk))
+            batch['contributions'] = _rule_point_columns(X).astype(float)
+        return batch
 
     def get_model_info(self) -> Dict[str, any]:
         """Get information about the current model"""
@@ -223,20 +1401,31 @@ class RiskAssessmentModel:
             'is_trained': self.is_trained,
             'model_type': type(self.model).__name__ if self.model else None,
             'has_scaler': self.scaler is not None,
+            'artifact_path': self.artifact_path,
+            'model_version': self.model_version,
+            'registry_path': self.registry.root,
             'model_path': self.model_path,
-            'scaler_path': self.scaler_path
+            'scaler_path': self.scaler_path,
+            'training_mode': self.training_mode,
+            'training_state': self.training_state,
+            'timings': dict(self.timings),
+            'cache': self.cache.stats(),
+            'inference_mode': self.inference_mode,
+            'inference_socket': self.remote.socket_path if self.remote is not None else None,
+            'course_models': self.course_models.stats(),
+            'grid_mode': self.grid_mode,
+            'lookup_grid': self.grid.describe() if self.grid is not None else None
         }
 
 # Global risk model instance
+_startup_started = time.perf_counter()
 risk_model = RiskAssessmentModel()
+risk_model.initialize()
+risk_model.timings['startup_seconds'] = round(time.perf_counter() - _startup_started, 4)
+logger.info(f"Risk model ready in {risk_model.timings['startup_seconds']:.3f}s "
+            f"(mode: {risk_model.training_mode}, state: {risk_model.training_state})")
 
 # Backward compatibility function
 def calculate_risk(score, attempts, time_taken):
     """Legacy function for backward compatibility"""
-    result = risk_model.predict_risk(score, attempts, time_taken)
-    return result['risk_score']
-
-# Initialize model on import
-if not risk_model.is_trained:
-    logger.info("Initializing risk assessment model...")
-    risk_model.train_model()
\ No newline at end of file
+    return risk_model.predict_risk(score, attempts, time_taken)['risk_score']
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""
+Versioned registry of risk model artifacts.
+
+Layout under ``root`` (models/registry by default):
+
+    v0001.nlrm, v0002.nlrm, ...   immutable artifacts; metrics live in each header
+    v0001.grid.nlrm, ...          optional lookup grids compiled from a version
+    ACTIVE                        name of the version workers should serve
+    history.log                   "<utc timestamp> <version> <activate|rollback>" lines
+    .training.lock                held by whichever process is training or migrating
+
+Publishing never touches the active model until ``activate`` replaces ACTIVE
+with an atomic rename. Running workers poll ACTIVE and map the new artifact
+without a restart. Old versions stay on disk for instant rollback.
+"""
+
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from risk_artifact import ArtifactError, read_header, save_artifact
+from risk_grid import grid_path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_VERSION_PATTERN = re.compile(r'^v(\d+)\.nlrm$')
+
+
+class FileLock:
+    """
+    Exclusive lock shared by every process that opens the same lock file.
+
+    Uses flock (LockFileEx via msvcrt on Windows), so the OS drops the lock
+    if its holder dies. Re-entrant within a thread, so a method holding the
+    lock can call another that takes it too.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if not self._thread_lock.acquire(blocking):
+            return False
+        if self._depth == 0:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                locked = self._lock_fd(fd, blocking)
+            except BaseException:
+                os.close(fd)
+                self._thread_lock.release()
+                raise
+            if not locked:
+                os.close(fd)
+                self._thread_lock.release()
+                return False
+            self._fd = fd
+        self._depth += 1
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            os.close(fd)
+        self._thread_lock.release()
+
+    @staticmethod
+    def _lock_fd(fd: int, blocking: bool) -> bool:
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                return True
+            except BlockingIOError:
+                return False
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.1)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ModelRegistry:
+    def __init__(self, root: str):
+        self.root = root
+        self.active_path = os.path.join(root, 'ACTIVE')
+        self.history_path = os.path.join(root, 'history.log')
+        # Serializes training across worker processes sharing this registry
+        self.training_lock = FileLock(os.path.join(root, '.training.lock'))
+
+    def path(self, version: str) -> str:
+        return os.path.join(self.root, f"{version}.nlrm")
+
+    def versions(self) -> List[str]:
+        """All published versions, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        numbers = sorted(
+            int(match.group(1)) for match in map(_VERSION_PATTERN.match, os.listdir(self.root)) if match
+        )
+        return [f"v{number:04d}" for number in numbers]
+
+    def active_version(self) -> Optional[str]:
+        try:
+            with open(self.active_path) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version if version and os.path.exists(self.path(version)) else None
+
+    def publish(self, arrays: Dict[str, np.ndarray], meta: Dict, activate: bool = True) -> str:
+        """Store arrays as the next version; optionally make it active"""
+        os.makedirs(self.root, exist_ok=True)
+
+        # Reserve the version name with O_EXCL so concurrent publishers never collide
+        while True:
+            versions = self.versions()
+            number = int(versions[-1][1:]) + 1 if versions else 1
+            version = f"v{number:04d}"
+            try:
+                os.close(os.open(self.path(version), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                continue
+
+        save_artifact(self.path(version), arrays, dict(meta, version=version))
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version: str, action: str = 'activate'):
+        """Atomically point ACTIVE at ``version``"""
+        if not os.path.exists(self.path(version)):
+            raise ArtifactError(f"Unknown risk model version {version}")
+        read_header(self.path(version))
+
+        tmp_path = f"{self.active_path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, self.active_path)
+
+        with open(self.history_path, 'a') as f:
+            f.write(f"{datetime.utcnow().isoformat()} {version} {action}\n")
+
+    def history(self) -> List[Tuple[str, str]]:
+        """(version, action) for every activation, oldest first"""
+        try:
+            with open(self.history_path) as f:
+                return [tuple(line.split()[1:3]) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _activation_stack(self) -> List[str]:
+        # Activations push; a rollback pops back down to the version it restored
+        stack = []
+        for version, action in self.history():
+            if action == 'rollback':
+                while stack and stack[-1] != version:
+                    stack.pop()
+                if not stack:
+                    stack.append(version)
+            else:
+                stack.append(version)
+        return stack
+
+    def rollback(self) -> Optional[str]:
+        """Re-activate the version that was active before the current one"""
+        stack = self._activation_stack()
+        current = self.active_version()
+        while stack and (stack[-1] == current or not os.path.exists(self.path(stack[-1]))):
+            stack.pop()
+        if not stack:
+            return None
+        self.activate(stack[-1], action='rollback')
+        return stack[-1]
+
+    def describe(self) -> List[Dict]:
+        """Version, creation time, metrics and active flag for every version"""
+        active = self.active_version()
+        entries = []
+        for version in self.versions():
+            try:
+                header = read_header(self.path(version))
+            except ArtifactError:
+                # Reserved but not yet written by a concurrent publisher
+                continue
+            entries.append({
+                'version': version,
+                'created_at': header.get('created_at'),
+                'active': version == active,
+                'meta': header.get('meta', {})
+            })
+        return entries
+
+    def prune(self, keep: int = 10) -> List[str]:
+        """Delete all but the newest ``keep`` versions, never the active one"""
+        active = self.active_version()
+        versions = self.versions()
+        removed = [v for v in versions[:-keep] if v != active] if keep > 0 else []
+        for version in removed:
+            os.remove(self.path(version))
+            if os.path.exists(grid_path(self.path(version))):
+                os.remove(grid_path(self.path(version)))
+        return removed
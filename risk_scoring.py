@@ -0,0 +1,385 @@
+"""
+Background risk scoring for quiz submissions.
+
+With RISK_SCORING_MODE=async, take_quiz stores the UserProgress row with a
+pending (NULL) risk_score and hands its id to BackgroundRiskScorer. Worker
+threads gather pending ids into batches, score them with one
+predict_risk_batch call and write all results back in a single
+transaction. A periodic sweep also picks up rows left pending by a process
+that exited before scoring them.
+
+Writes only fill rows whose risk_score is still NULL, so overlapping sweeps
+in several web processes are harmless.
+
+rescore_progress() is the nightly job that brings every stored score up to
+the active model (manage_risk_model.py rescore).
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import bindparam, text
+
+from risk_model import batch_explanations, batch_versions, course_model_label
+
+logger = logging.getLogger(__name__)
+
+SELECT_PENDING_BY_ID = text("""
+    SELECT id, user_id, course_id, score, attempts, time_taken
+    FROM user_progress
+    WHERE risk_score IS NULL AND id IN :ids
+""").bindparams(bindparam('ids', expanding=True))
+
+SELECT_OLDEST_PENDING = text("""
+    SELECT id, user_id, course_id, score, attempts, time_taken
+    FROM user_progress
+    WHERE risk_score IS NULL
+    ORDER BY id
+    LIMIT :limit
+""")
+
+# Scores for a whole batch in one statement; rows another process scored first are left alone
+UPDATE_RISK = """
+    WITH scored(id, risk_score) AS (VALUES {values})
+    UPDATE user_progress SET risk_score = scored.risk_score
+    FROM scored
+    WHERE user_progress.id = scored.id AND user_progress.risk_score IS NULL
+    RETURNING id
+"""
+# Rows per UPDATE_RISK statement, two bind parameters each (SQLite allows 32766 per statement)
+UPDATE_RISK_ROWS = 1000
+
+UPSERT_RISK_VERSION = text("""
+    INSERT OR REPLACE INTO progress_risk_version (progress_id, model_version, scored_at)
+    VALUES (:id, :model_version, :scored_at)
+""")
+
+UPSERT_RISK_EXPLANATION = text("""
+    INSERT OR REPLACE INTO progress_risk_explanation
+        (progress_id, baseline, score_contribution, attempts_contribution, time_contribution)
+    VALUES (:id, :baseline, :score, :attempts, :time_taken)
+""")
+
+DELETE_RISK_EXPLANATION = text("DELETE FROM progress_risk_explanation WHERE progress_id = :id")
+
+# Next page of scored rows with the version that scored them; keyset on id so each page is a range scan
+SELECT_PAGE = text("""
+    SELECT p.id, p.user_id, p.course_id, p.score, p.attempts, p.time_taken, v.model_version
+    FROM user_progress AS p
+    LEFT JOIN progress_risk_version AS v ON v.progress_id = p.id
+    WHERE p.id > :after_id AND p.score IS NOT NULL
+    ORDER BY p.id
+    LIMIT :limit
+""")
+
+UPDATE_RESCORED = text("UPDATE user_progress SET risk_score = :risk_score WHERE id = :id")
+
+DEFAULT_RESCORE_CHECKPOINT = os.path.join('instance', 'risk_rescore.json')
+
+# Keep learner_stats.last_risk_score in step when the scored row is the learner's latest attempt
+UPDATE_LAST_RISK = text("""
+    UPDATE learner_stats SET last_risk_score = :risk_score
+    WHERE user_id = :user_id AND course_id = :course_id
+      AND :id = (SELECT MAX(id) FROM user_progress WHERE user_id = :user_id AND course_id = :course_id)
+""")
+
+
+class BackgroundRiskScorer:
+    """Scores pending UserProgress rows in batches on a small thread pool"""
+
+    def __init__(self, model, engine, workers: int = 2, max_batch: int = 256,
+                 max_wait: float = 0.05, sweep_interval: float = 30.0):
+        self.model = model
+        self.engine = engine
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.sweep_interval = sweep_interval
+        self.scored = 0
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Start the worker threads; called on first submit"""
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'risk-scorer-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+        logger.info(f"Background risk scoring started with {self.workers} worker(s)")
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopping.set()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, progress_id: int):
+        """Queue a freshly committed UserProgress row for scoring"""
+        self.start()
+        self._queue.put(progress_id)
+
+    def wait_idle(self, timeout: float = 10.0) -> bool:
+        """Block until every submitted id has been scored (for tests and shutdown)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return not self._queue.unfinished_tasks
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                first = self._queue.get(timeout=self.sweep_interval)
+            except queue.Empty:
+                self._sweep()
+                continue
+            if first is None:
+                self._queue.task_done()
+                return
+
+            ids = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(ids) < self.max_batch:
+                try:
+                    progress_id = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if progress_id is None:
+                    # Let a sibling worker see the stop marker too
+                    self._queue.put(None)
+                    self._queue.task_done()
+                    break
+                ids.append(progress_id)
+
+            try:
+                self.score_pending(ids)
+            except Exception as e:
+                # Rows stay pending; the next sweep retries them
+                logger.error(f"Background risk scoring failed for {len(ids)} row(s): {e}")
+            finally:
+                for _ in ids:
+                    self._queue.task_done()
+
+    def _sweep(self):
+        try:
+            self.score_pending(limit=self.max_batch)
+        except Exception as e:
+            logger.error(f"Pending risk sweep failed: {e}")
+
+    def score_pending(self, ids: Optional[Sequence[int]] = None, limit: int = 1000) -> int:
+        """
+        Score pending rows (the given ids, or the oldest ``limit``) in one
+        batch and write them back in one transaction. Returns rows updated.
+        """
+        with self.engine.begin() as conn:
+            if ids is not None:
+                rows = conn.execute(SELECT_PENDING_BY_ID, {'ids': list(ids)}).fetchall() if ids else []
+            else:
+                rows = conn.execute(SELECT_OLDEST_PENDING, {'limit': limit}).fetchall()
+            if not rows:
+                return 0
+
+            batch = self.model.predict_risk_batch(_feature_rows(rows), course_ids=[row.course_id for row in rows],
+                                                  explain=True)
+            # Another process may have scored some of these rows since the select;
+            # its version, explanation and last risk stand
+            updates = _score_updates(rows, batch)
+            won = _update_risk(conn, updates)
+            updates = [update for update in updates if update['id'] in won]
+            if updates:
+                conn.execute(UPSERT_RISK_VERSION, updates)
+                _write_explanations(conn, rows, batch, won)
+                conn.execute(UPDATE_LAST_RISK, updates)
+
+        self.scored += len(updates)
+        self.batches += 1
+        return len(updates)
+
+    def stats(self) -> Dict[str, any]:
+        return {
+            'workers': len(self._threads),
+            'queued': self._queue.qsize(),
+            'scored': self.scored,
+            'batches': self.batches,
+            'mean_batch_rows': round(self.scored / self.batches, 2) if self.batches else 0.0
+        }
+
+
+def _feature_rows(rows) -> np.ndarray:
+    return np.array([[row.score or 0.0, row.attempts or 1, row.time_taken or 0.0] for row in rows])
+
+
+def _score_updates(rows, batch: Dict[str, any]):
+    """Bind parameters for writing a batch result back to its rows"""
+    scored_at = datetime.utcnow()
+    return [
+        {'id': row.id, 'user_id': row.user_id, 'course_id': row.course_id, 'risk_score': float(risk),
+         'model_version': version, 'scored_at': scored_at}
+        for row, risk, version in zip(rows, batch['risk_score'], batch_versions(batch))
+    ]
+
+
+def _update_risk(conn, updates) -> set:
+    """Write the scores of rows still pending; returns the ids this call scored"""
+    won = set()
+    for start in range(0, len(updates), UPDATE_RISK_ROWS):
+        chunk = updates[start:start + UPDATE_RISK_ROWS]
+        values = ", ".join(f"(:id_{i}, :risk_score_{i})" for i in range(len(chunk)))
+        params = {}
+        for i, update in enumerate(chunk):
+            params[f'id_{i}'] = update['id']
+            params[f'risk_score_{i}'] = update['risk_score']
+        won.update(conn.execute(text(UPDATE_RISK.format(values=values)), params).scalars())
+    return won
+
+
+def _write_explanations(conn, rows, batch: Dict[str, any], ids=None):
+    """
+    Store each row's per-feature explanation next to its score, replacing any
+    earlier one; rows the model could not explain (remote mode) lose theirs.
+    """
+    explanations, unexplained = [], []
+    for row, explanation in zip(rows, batch_explanations(batch)):
+        if ids is not None and row.id not in ids:
+            continue
+        if explanation:
+            explanations.append(dict(explanation, id=row.id))
+        else:
+            unexplained.append({'id': row.id})
+    if explanations:
+        conn.execute(UPSERT_RISK_EXPLANATION, explanations)
+    if unexplained:
+        conn.execute(DELETE_RISK_EXPLANATION, unexplained)
+
+
+def _read_checkpoint(path: str) -> Dict[str, any]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_checkpoint(path: str, checkpoint: Dict[str, any]):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def rescore_progress(model, engine, chunk_size: int = 2000, pause: float = 0.05,
+                     checkpoint_path: Optional[str] = DEFAULT_RESCORE_CHECKPOINT,
+                     restart: bool = False, max_rows: Optional[int] = None) -> Dict[str, any]:
+    """
+    Re-score every UserProgress row not yet scored by its current model.
+
+    A row's current model is its course's own model if it has one, otherwise
+    the active global model. Rows are read in keyset-paginated pages of
+    ``chunk_size``; the stale ones in a page are scored with one
+    predict_risk_batch call and written back in one short transaction,
+    together with the producing model version in progress_risk_version and
+    the per-feature explanation in progress_risk_explanation.
+
+    Resumable: after each page the last id is saved to ``checkpoint_path``,
+    and a later run against the same model versions continues from there
+    (``restart`` starts from the first row again). Rows already carrying
+    their current version are skipped either way, so an interrupted run
+    never redoes finished work.
+
+    Throttled for a live database: after each write transaction the job
+    sleeps for at least ``pause`` and at least as long as the transaction
+    held SQLite's write lock, so request traffic gets the lock at least half
+    the time. ``max_rows`` stops early (e.g. to bound one night's window).
+    """
+    stats = {'model_version': None, 'rescored': 0, 'scanned': 0, 'chunks': 0, 'complete': False,
+             'resumed_from': 0, 'seconds': 0.0}
+    # Score with whatever the registry has active now, not what this process loaded at startup
+    model.refresh()
+    if not model.is_trained:
+        logger.warning("No trained risk model loaded; not replacing stored scores with rule-based ones")
+        return stats
+
+    started = time.perf_counter()
+    version = model.scoring_version
+    course_versions = {str(course_id): course_model_label(course_id, course_version)
+                       for course_id, course_version in model.course_model_versions().items()}
+    checkpoint = _read_checkpoint(checkpoint_path) if checkpoint_path and not restart else {}
+    resumable = (checkpoint.get('model_version') == version
+                 and checkpoint.get('course_versions', {}) == course_versions)
+    after_id = checkpoint.get('last_id', 0) if resumable else 0
+    stats.update(model_version=version, resumed_from=after_id)
+
+    while max_rows is None or stats['rescored'] < max_rows:
+        with engine.connect() as conn:
+            rows = conn.execute(SELECT_PAGE, {'after_id': after_id, 'limit': chunk_size}).fetchall()
+        if not rows:
+            stats['complete'] = True
+            break
+
+        stale = [row for row in rows if row.model_version != course_versions.get(str(row.course_id), version)]
+        page_end = rows[-1].id
+        if max_rows is not None and len(stale) > max_rows - stats['rescored']:
+            stale = stale[:max_rows - stats['rescored']]
+            page_end = stale[-1].id
+        stats['scanned'] += sum(1 for row in rows if row.id <= page_end)
+
+        write_seconds = 0.0
+        if stale:
+            batch = model.predict_risk_batch(_feature_rows(stale), course_ids=[row.course_id for row in stale],
+                                             explain=True)
+            if batch['method'] != 'machine_learning':
+                logger.error("Risk model fell back to rule-based scoring; stopping the rescore")
+                break
+            updates = _score_updates(stale, batch)
+
+            write_started = time.perf_counter()
+            with engine.begin() as conn:
+                conn.execute(UPDATE_RESCORED, updates)
+                conn.execute(UPSERT_RISK_VERSION, updates)
+                _write_explanations(conn, stale, batch)
+                conn.execute(UPDATE_LAST_RISK, updates)
+            write_seconds = time.perf_counter() - write_started
+            stats['rescored'] += len(stale)
+            stats['chunks'] += 1
+
+        after_id = page_end
+        if model.scoring_version != version:
+            # The registry moved on mid-run; earlier rows are stale again, so go round once more
+            logger.info(f"Active risk model changed from {version} to {model.scoring_version}, restarting rescore")
+            version, after_id = model.scoring_version, 0
+            stats['model_version'] = version
+
+        if checkpoint_path:
+            _write_checkpoint(checkpoint_path, {
+                'model_version': version,
+                'course_versions': course_versions,
+                'last_id': after_id,
+                'rescored': stats['rescored'],
+                'updated_at': datetime.utcnow().isoformat()
+            })
+        if stale:
+            time.sleep(max(pause, write_seconds))
+
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    logger.info(f"Rescored {stats['rescored']} of {stats['scanned']} progress rows scanned "
+                f"(global model {version}, {len(course_versions)} course models) in {stats['chunks']} chunks "
+                f"({'complete' if stats['complete'] else 'stopped early'})")
+    return stats
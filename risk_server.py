@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Local risk inference process shared by all web workers.
+
+One process owns the risk model; web workers started with
+RISK_INFERENCE_MODE=remote send it predictions over a UNIX socket instead
+of each mapping the model themselves. Rows arriving from many workers at
+once are scored together in micro-batches.
+
+    python risk_server.py [socket_path]     # default RISK_INFERENCE_SOCKET
+
+Protocol: one JSON object per line in each direction.
+
+    {"rows": [[score, attempts, time_taken], ...]}  ->  columnar batch result
+    {"op": "stats"}                                 ->  batching and model stats
+
+UNIX sockets make this POSIX-only; elsewhere leave RISK_INFERENCE_MODE=local.
+"""
+
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = os.path.join('instance', 'risk_inference.sock')
+
+# Keeps this module importable where UNIX sockets are unavailable
+_UnixStreamServer = getattr(socketserver, 'UnixStreamServer', socketserver.BaseServer)
+
+
+class RiskServerUnavailable(Exception):
+    """Raised by the client when the inference process cannot answer"""
+
+
+class MicroBatcher:
+    """
+    Collects rows from concurrent requests and scores them in one call.
+
+    A batch closes when it reaches ``max_batch`` rows or ``max_wait``
+    seconds after its first request, whichever comes first, so a lone
+    request waits at most ``max_wait``.
+    """
+
+    def __init__(self, predict_batch: Callable[[np.ndarray], Dict[str, any]],
+                 max_batch: int = 512, max_wait: float = 0.002):
+        self.predict_batch = predict_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='risk-micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, rows: np.ndarray) -> Future:
+        future = Future()
+        self._queue.put((rows, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            pending = [item]
+            n_rows = len(item[0])
+            deadline = time.monotonic() + self.max_wait
+            stopping = False
+            while n_rows < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                pending.append(item)
+                n_rows += len(item[0])
+
+            self._score(pending)
+            if stopping:
+                return
+
+    def _score(self, pending):
+        try:
+            batch = self.predict_batch(np.concatenate([rows for rows, _ in pending]))
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        self.requests += len(pending)
+        self.rows += sum(len(rows) for rows, _ in pending)
+        self.batches += 1
+        start = 0
+        for rows, future in pending:
+            end = start + len(rows)
+            future.set_result({
+                key: value[start:end] if isinstance(value, np.ndarray) else value
+                for key, value in batch.items()
+            })
+            start = end
+
+    def stats(self) -> Dict[str, any]:
+        return {
+            'requests': self.requests,
+            'rows': self.rows,
+            'batches': self.batches,
+            'mean_batch_rows': round(self.rows / self.batches, 2) if self.batches else 0.0,
+            'max_batch': self.max_batch,
+            'max_wait_ms': self.max_wait * 1000
+        }
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = self.server.respond(json.loads(line))
+            except ValueError as e:
+                response = {'error': f"malformed request: {e}"}
+            try:
+                self.wfile.write(json.dumps(response, default=str).encode('utf-8') + b'\n')
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+
+class RiskInferenceServer(socketserver.ThreadingMixIn, _UnixStreamServer):
+    daemon_threads = True
+    # Every web worker thread may connect at once; the default backlog of 5 refuses them
+    request_queue_size = 128
+
+    def __init__(self, model, socket_path: str = DEFAULT_SOCKET_PATH,
+                 max_batch: int = 512, max_wait: float = 0.002):
+        self.model = model
+        self.socket_path = socket_path
+        self.batcher = MicroBatcher(model.predict_risk_batch, max_batch, max_wait)
+        if os.path.exists(socket_path):
+            # Left behind by a server that did not shut down cleanly
+            os.unlink(socket_path)
+        os.makedirs(os.path.dirname(socket_path) or '.', exist_ok=True)
+        super().__init__(socket_path, _RequestHandler)
+
+    def respond(self, request: Dict[str, any]) -> Dict[str, any]:
+        try:
+            if request.get('op') == 'stats':
+                return {'batching': self.batcher.stats(), 'model': self.model.get_model_info()}
+            rows = np.asarray(request['rows'], dtype=np.float64).reshape(-1, 3)
+            batch = self.batcher.submit(rows).result()
+            return {key: value.tolist() if isinstance(value, np.ndarray) else value
+                    for key, value in batch.items()}
+        except Exception as e:
+            logger.error(f"Risk inference request failed: {e}")
+            return {'error': str(e)}
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class RiskInferenceClient:
+    """
+    Web worker side of the inference socket.
+
+    Keeps one connection per thread. After a failure the server is treated
+    as down for ``retry_interval`` seconds so callers fall back immediately
+    instead of paying a connect timeout on every quiz submission.
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, timeout: float = 1.0,
+                 retry_interval: float = 5.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._local = threading.local()
+        self._down_until = 0.0
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self._local.sock = sock
+        self._local.stream = sock.makefile('rwb')
+        return self._local.stream
+
+    def _disconnect(self):
+        stream, sock = getattr(self._local, 'stream', None), getattr(self._local, 'sock', None)
+        self._local.stream = self._local.sock = None
+        for closable in (stream, sock):
+            try:
+                if closable is not None:
+                    closable.close()
+            except OSError:
+                pass
+
+    def request(self, payload: Dict[str, any]) -> Dict[str, any]:
+        if time.monotonic() < self._down_until:
+            raise RiskServerUnavailable(f"risk inference server at {self.socket_path} marked down")
+
+        # A reused connection may have been closed by a server restart; retry once on a fresh one
+        reused = getattr(self._local, 'stream', None) is not None
+        for attempt in range(2 if reused else 1):
+            try:
+                stream = getattr(self._local, 'stream', None) or self._connect()
+                stream.write(json.dumps(payload).encode('utf-8') + b'\n')
+                stream.flush()
+                line = stream.readline()
+                if not line:
+                    raise ConnectionError("connection closed by risk inference server")
+                response = json.loads(line)
+                break
+            except (OSError, ValueError) as e:
+                self._disconnect()
+                if attempt == 0 and reused:
+                    continue
+                self._down_until = time.monotonic() + self.retry_interval
+                logger.warning(f"Risk inference server at {self.socket_path} unavailable ({e}), "
+                               f"using rule-based scores for {self.retry_interval:g}s")
+                raise RiskServerUnavailable(str(e)) from e
+
+        if 'error' in response:
+            raise RiskServerUnavailable(response['error'])
+        return response
+
+    def predict_batch(self, X: np.ndarray) -> Dict[str, any]:
+        """Columnar batch result, shaped like RiskAssessmentModel.predict_risk_batch"""
+        response = self.request({'rows': np.asarray(X, dtype=np.float64).tolist()})
+        batch = {'method': response.pop('method')}
+        if 'model_version' in response:
+            batch['model_version'] = response.pop('model_version')
+        for key, value in response.items():
+            batch[key] = np.asarray(value, dtype=object if key == 'risk_level' else np.float64)
+        return batch
+
+    def stats(self) -> Dict[str, any]:
+        return self.request({'op': 'stats'})
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    socket_path = argv[0] if argv else os.getenv('RISK_INFERENCE_SOCKET', DEFAULT_SOCKET_PATH)
+
+    # This process owns the model; it must not forward to itself
+    os.environ['RISK_INFERENCE_MODE'] = 'local'
+    from risk_model import risk_model
+
+    server = RiskInferenceServer(
+        risk_model, socket_path,
+        max_batch=int(os.getenv('RISK_INFERENCE_MAX_BATCH', 512)),
+        max_wait=float(os.getenv('RISK_INFERENCE_MAX_WAIT_MS', 2)) / 1000
+    )
+    logger.info(f"Risk inference server listening on {socket_path} "
+                f"(model {risk_model.model_version or 'seed artifact'}, state {risk_model.training_state})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
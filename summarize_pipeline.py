@@ -0,0 +1,166 @@
+"""
+Map-reduce summarization of documents too long for one LLM call.
+
+The document's pages are packed into chunks that fit a token budget
+(splitting a page only when it alone is over budget, at paragraph, then
+line, then character boundaries). Every chunk is summarized concurrently
+with bounded parallelism (map). The partial summaries are combined in
+groups that fit the budget, level after level until they fit into one
+final call (reduce). With a fan-in of k partials per group the reduce
+stage takes about log_k(chunks) levels, so a 300-page manual costs a
+couple of reduce levels rather than hundreds of serial calls.
+
+Both stages consume their input as a stream: pages are chunked as they
+arrive, only a bounded window of chunks is read ahead of the summaries,
+and a group is combined as soon as it fills (while the next chunks are
+still being summarized), so a document of any length holds a few chunks
+and a logarithmic number of partials in memory.
+
+The LLM calls themselves are passed in, so this module has no API or
+prompt knowledge of its own.
+"""
+
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+# Rough size of an English token in characters; only used for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _split_oversized(text: str, max_chars: int) -> List[str]:
+    """Cut one over-budget block at the coarsest boundary that makes the pieces fit"""
+    for separator in ("\n\n", "\n", ". "):
+        parts = text.split(separator)
+        if len(parts) > 1:
+            pieces = []
+            for i, part in enumerate(parts):
+                part = part + separator if i < len(parts) - 1 else part
+                pieces.extend(_split_oversized(part, max_chars) if len(part) > max_chars else [part])
+            return pieces
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def iter_chunks(pages: Iterable[str], max_tokens: int) -> Iterator[str]:
+    """
+    Pack consecutive pages into chunks of at most ``max_tokens`` (estimated),
+    keeping page boundaries wherever a page fits. Pages are read lazily.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    current, size = [], 0
+    for page in pages:
+        page = page.strip()
+        if not page:
+            continue
+        blocks = [page] if len(page) <= max_chars else _split_oversized(page, max_chars)
+        for block in blocks:
+            if current and size + len(block) + 1 > max_chars:
+                yield "\n".join(current)
+                current, size = [], 0
+            current.append(block)
+            size += len(block) + 1
+    if current:
+        yield "\n".join(current)
+
+
+def read_ahead(pages: Iterator[str], max_tokens: int) -> List[str]:
+    """
+    Take pages from ``pages`` until they are over ``max_tokens`` together or
+    run out. The pages left in the iterator continue the document.
+    """
+    head, size = [], -1
+    for page in pages:
+        head.append(page)
+        # size is the length of the pages joined by newlines; same estimate as estimate_tokens
+        size += len(page) + 1
+        if size // CHARS_PER_TOKEN + 1 > max_tokens:
+            break
+    return head
+
+
+class _Reducer:
+    """
+    Combines partial summaries as they arrive. Each level holds an open group
+    of consecutive partials; when the next one would take a group over the
+    budget it is combined into one partial on the level above, so the
+    levels behave like the digits of a counter.
+    """
+
+    def __init__(self, combine: Callable[[List[str]], str], max_tokens: int):
+        self.combine = combine
+        self.max_tokens = max_tokens
+        self.levels = []
+        self.calls = 0
+        self.depth = 0
+
+    def add(self, partial: str, level: int = 0):
+        if level == len(self.levels):
+            self.levels.append([])
+        group = self.levels[level]
+        # A group needs two partials to shrink the level, even if they are over budget together
+        if len(group) > 1 and sum(estimate_tokens(p) for p in group) + estimate_tokens(partial) > self.max_tokens:
+            self._flush(level)
+        self.levels[level].append(partial)
+
+    def _flush(self, level: int):
+        group = self.levels[level]
+        self.levels[level] = []
+        if len(group) == 1:
+            self.add(group[0], level + 1)
+        else:
+            self.calls += 1
+            self.depth = max(self.depth, level + 1)
+            self.add(self.combine(group), level + 1)
+
+    def finish(self) -> List[str]:
+        """Flush from the bottom until the open groups fit one call; returns them in document order"""
+        level = 0
+        while level < len(self.levels):
+            partials = [p for group in reversed(self.levels) for p in group]
+            if len(partials) <= 1 or sum(estimate_tokens(p) for p in partials) <= self.max_tokens:
+                return partials
+            if self.levels[level]:
+                self._flush(level)
+            level += 1
+        return [p for group in reversed(self.levels) for p in group]
+
+
+def map_reduce(chunks: Iterable[str], summarize: Callable[[str], str], combine: Callable[[List[str]], str],
+               max_tokens: int, max_workers: int = 4) -> Dict[str, any]:
+    """
+    Summarize ``chunks`` with ``summarize`` in parallel, no more than
+    ``2 * max_workers`` chunks read ahead, and merge the partials with
+    ``combine`` in budget-sized groups as they complete, until the rest fit
+    in ``max_tokens`` together. Returns the remaining partials (join them
+    for the final call) with call counts and timing.
+    """
+    started = time.perf_counter()
+    workers = max(1, max_workers)
+    reducer = _Reducer(combine, max_tokens)
+    stats = {'chunks': 0}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='summarize') as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(summarize, chunk))
+            stats['chunks'] += 1
+            if len(pending) >= 2 * workers:
+                reducer.add(pending.popleft().result())
+        while pending:
+            reducer.add(pending.popleft().result())
+        partials = reducer.finish()
+
+    stats.update(map_calls=stats['chunks'], reduce_calls=reducer.calls,
+                 reduce_levels=reducer.depth,
+                 seconds=round(time.perf_counter() - started, 3))
+    logger.info(f"Map-reduce over {stats['chunks']} chunks: {stats['reduce_calls']} reduce calls "
+                f"in {stats['reduce_levels']} level(s)")
+    stats['partials'] = partials
+    return stats
@@ -0,0 +1,38 @@
+"""
+Scratch database for tests that drive the app.
+
+Tests that create their own tables and rows run against an empty SQLite
+file in a temporary directory instead of the committed
+instance/database.db, so they neither leave rows behind nor hide a table
+the shipped database is missing.
+"""
+
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine
+
+
+@contextmanager
+def temporary_database():
+    """Point the app's session and background workers at a fresh database for the block; yields its engine"""
+    import app as lms
+
+    tmp_dir = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'database.db')}")
+    with lms.app.app_context():
+        # Flask-SQLAlchemy resolves the bind through this mapping on every query
+        engines = lms.db.engines
+        saved = (engines[None], lms.ai_jobs.engine, lms.risk_scorer.engine)
+        lms.db.session.remove()
+        engines[None] = lms.ai_jobs.engine = lms.risk_scorer.engine = engine
+        try:
+            lms.db.create_all()
+            yield engine
+        finally:
+            lms.db.session.remove()
+            engines[None], lms.ai_jobs.engine, lms.risk_scorer.engine = saved
+            engine.dispose()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
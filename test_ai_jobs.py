@@ -0,0 +1,198 @@
+"""
+Test suite for the background AI job queue
+
+Tests:
+1. upload_script returns a job id at once; the job finishes in the background
+2. upload_pdf is queued the same way, and only the owner can read a job
+3. No more than max_running jobs run at once, however many workers poll
+4. Jobs left queued or running by a dead process are picked up again
+5. A job running longer than its lease is not claimed a second time
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+sys.path.insert(0, os.getcwd())
+
+from PyPDF2 import PdfWriter
+from sqlalchemy import create_engine
+
+import app as lms
+from app import app, db, User, Course, Script, AIJob
+from ai_jobs import AIJobQueue
+from temp_database import temporary_database
+from werkzeug.security import generate_password_hash
+
+def _poll(client, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        # Requests share this test's app context, so drop cached rows between polls
+        db.session.expire_all()
+        data = client.get(f"/ai_jobs/{job_id}").get_json()
+        if data["status"] in ("done", "failed") or time.monotonic() > deadline:
+            return data
+        time.sleep(0.02)
+
+def test_ai_jobs():
+    print("\n" + "="*70)
+    print("TESTING AI JOB QUEUE")
+    print("="*70)
+
+    with temporary_database(), app.app_context():
+        emails = ["jobs_trainer@test.com", "jobs_other@test.com"]
+        trainer = User(name="Jobs Trainer", email=emails[0],
+                       password=generate_password_hash("password123"), role="trainer")
+        other = User(name="Jobs Other", email=emails[1],
+                     password=generate_password_hash("password123"), role="trainer")
+        course = Course(title="AI Jobs Course", description="Background AI processing test")
+        db.session.add_all([trainer, other, course])
+        db.session.commit()
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = trainer.id
+            sess["role"] = "trainer"
+
+        # ========== TEST 1: Script enhancement ==========
+        print("\n✅ Test 1 - upload_script returns before the LLM call finishes:")
+        gate = threading.Event()
+        enhance = lms.ai_jobs.handlers['enhance_script']
+        lms.ai_jobs.register('enhance_script', lambda payload: gate.wait(10) and enhance(payload))
+        try:
+            started = time.perf_counter()
+            response = client.post(f"/upload_script/{course.id}", data={"script": "Jobs test: fractions"})
+            elapsed = time.perf_counter() - started
+            page = response.data.decode()
+            job = AIJob.query.filter_by(user_id=trainer.id).order_by(AIJob.id.desc()).first()
+            assert f"Job #{job.id}" in page and f"/ai_jobs/{job.id}" in page
+            assert client.get(f"/ai_jobs/{job.id}").get_json()["status"] in ("queued", "running")
+            assert elapsed < 1.0
+        finally:
+            gate.set()
+            lms.ai_jobs.register('enhance_script', enhance)
+
+        status = _poll(client, job.id)
+        assert status["status"] == "done" and "Jobs test: fractions" in status["result"]
+        script = Script.query.filter_by(course_id=course.id).one()
+        assert script.ai_script == status["result"]
+        print(f"   Job #{job.id} queued in {elapsed * 1000:.1f} ms, Script #{script.id} saved when done")
+
+        # ========== TEST 2: PDF analysis ==========
+        print("\n✅ Test 2 - upload_pdf is queued and job status is private:")
+        pdf = io.BytesIO()
+        writer = PdfWriter()
+        writer.add_blank_page(width=200, height=200)
+        writer.write(pdf)
+        pdf.seek(0)
+        response = client.post(f"/upload_pdf/{course.id}", data={"pdf": (pdf, "jobs_test.pdf")},
+                               content_type="multipart/form-data")
+        job_id = AIJob.query.filter_by(user_id=trainer.id, kind='summarize_pdf').one().id
+        assert f"Job #{job_id}" in response.data.decode()
+        status = _poll(client, job_id)
+        # A blank page has no text; the analyzer's error still completes the job
+        assert status["status"] == "done" and "Could not extract text" in status["result"]
+        os.remove(json.loads(db.session.get(AIJob, job_id).payload)["path"])
+
+        with client.session_transaction() as sess:
+            sess["user_id"] = other.id
+        response = client.get(f"/ai_jobs/{job_id}")
+        assert response.status_code == 403 and response.get_json() == {"error": "Unauthorized Access"}
+        print(f"   PDF job #{job_id}: {status['result'].strip().splitlines()[0]}")
+
+    # A database of its own, so the app's workers never see these jobs
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'jobs.db')}")
+    db.metadata.create_all(engine, tables=[AIJob.__table__])
+
+    def insert_jobs(rows):
+        with engine.begin() as conn:
+            # Every row needs the same keys: a multi-row insert takes its columns from the first
+            defaults = {'user_id': 1, 'kind': 'sleep', 'status': 'queued', 'payload': '{}', 'attempts': 0,
+                        'started_at': None, 'worker': None}
+            conn.execute(AIJob.__table__.insert(), [dict(defaults, **row) for row in rows])
+
+    # ========== TEST 3: Concurrency limit ==========
+    print("\n✅ Test 3 - Concurrency limit holds across workers:")
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def sleepy(payload):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return f"slept {payload['n']}"
+
+    # Two queues stand in for two web processes sharing the database
+    queues = [AIJobQueue(engine, workers=3, max_running=2, poll_interval=0.05) for _ in range(2)]
+    for queue in queues:
+        queue.register('sleep', sleepy)
+    insert_jobs([{'payload': json.dumps({'n': n})} for n in range(12)])
+    for queue in queues:
+        queue.notify()
+    assert queues[0].wait_idle()
+    for queue in queues:
+        queue.stop()
+    stats = queues[0].stats()
+    assert stats['done'] == 12 and peak[0] <= 2
+    assert sum(queue.completed for queue in queues) == 12
+    print(f"   12 jobs on 6 workers, at most {peak[0]} running at once")
+
+    # ========== TEST 4: Restart recovery ==========
+    print("\n✅ Test 4 - Jobs survive a restart:")
+    long_ago = datetime.utcnow() - timedelta(hours=1)
+    insert_jobs([
+        {'payload': json.dumps({'n': 'left queued'})},
+        {'payload': json.dumps({'n': 'worker died'}), 'status': 'running', 'attempts': 1,
+         'started_at': long_ago, 'worker': 'gone'},
+        {'payload': json.dumps({'n': 'keeps dying'}), 'status': 'running', 'attempts': 3,
+         'started_at': long_ago, 'worker': 'gone'}
+    ])
+    restarted = AIJobQueue(engine, workers=1, poll_interval=0.05, lease_seconds=60, max_attempts=3)
+    restarted.register('sleep', sleepy)
+    restarted.start()
+    assert restarted.wait_idle()
+    restarted.stop()
+    with engine.connect() as conn:
+        rows = conn.execute(AIJob.__table__.select().order_by(AIJob.id.desc()).limit(3)).fetchall()
+    by_input = {json.loads(row.payload)['n']: row for row in rows}
+    assert by_input['left queued'].result == "slept left queued"
+    assert by_input['worker died'].status == 'done' and by_input['worker died'].attempts == 2
+    assert by_input['keeps dying'].status == 'failed' and "Gave up" in by_input['keeps dying'].error
+    print(f"   Queued and orphaned jobs finished; one over its attempt limit failed")
+
+    # ========== TEST 5: Lease renewal ==========
+    print("\n✅ Test 5 - Long jobs keep their lease:")
+    runs = []
+
+    def slow(payload):
+        runs.append(threading.current_thread().name)
+        time.sleep(1.0)
+        return "slow done"
+
+    queues = [AIJobQueue(engine, workers=1, poll_interval=0.05, lease_seconds=0.3) for _ in range(2)]
+    for queue in queues:
+        queue.register('slow', slow)
+    insert_jobs([{'kind': 'slow'}])
+    for queue in queues:
+        queue.notify()
+    assert queues[0].wait_idle()
+    for queue in queues:
+        queue.stop()
+    with engine.connect() as conn:
+        row = conn.execute(AIJob.__table__.select().order_by(AIJob.id.desc()).limit(1)).fetchone()
+    assert len(runs) == 1 and row.status == 'done' and row.attempts == 1
+    print(f"   Job ran 1.0 s on a 0.3 s lease, claimed once")
+
+    print("\n" + "="*70)
+    print("✅ ALL AI JOB QUEUE TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_ai_jobs()
@@ -0,0 +1,127 @@
+"""
+Test suite for the incremental per-learner feature store
+
+Tests:
+1. Each take_quiz submission updates the (user, course) aggregates
+2. Running mean, variance and trend match a full recomputation
+3. The migration backfill matches incremental updates
+4. Trainer dashboard shows the aggregates
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import numpy as np
+sys.path.insert(0, os.getcwd())
+
+from app import app, db, User, Course, Quiz, Enrollment, UserProgress, LearnerStats
+from werkzeug.security import generate_password_hash
+import migrate_learner_stats
+from temp_database import temporary_database
+
+def test_learner_stats():
+    print("\n" + "="*70)
+    print("TESTING LEARNER FEATURE STORE")
+    print("="*70)
+
+    with temporary_database(), app.app_context():
+        emails = ["stats_trainer@test.com", "stats_student@test.com"]
+
+        trainer = User(name="Stats Trainer", email=emails[0],
+                       password=generate_password_hash("password123"), role="trainer")
+        db.session.add(trainer)
+        db.session.commit()
+        student = User(name="Stats Student", email=emails[1],
+                       password=generate_password_hash("password123"), role="user", trainer_id=trainer.id)
+        course = Course(title="Feature Store Course", description="Learner stats test")
+        db.session.add_all([student, course])
+        db.session.commit()
+        db.session.add(Enrollment(user_id=student.id, course_id=course.id))
+        quizzes = [Quiz(course_id=course.id, trainer_id=trainer.id, question=f"Q{i}", correct_answer=f"a{i}")
+                   for i in range(4)]
+        db.session.add_all(quizzes)
+        db.session.commit()
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = student.id
+            sess["role"] = "user"
+
+        # ========== TEST 1: Updated on submission ==========
+        print("\n✅ Test 1 - take_quiz updates aggregates:")
+        for attempt, n_correct in enumerate([1, 2, 2, 4], start=1):
+            form = {f"answer_{q.id}": (q.correct_answer if i < n_correct else "wrong") for i, q in enumerate(quizzes)}
+            form.update(attempts=attempt, time_taken=120)
+            response = client.post(f"/take_quiz/{course.id}", data=form)
+            assert response.status_code == 200
+
+        stats = LearnerStats.query.filter_by(user_id=student.id, course_id=course.id).one()
+        scores = [p.score for p in UserProgress.query.filter_by(user_id=student.id, course_id=course.id)
+                  .order_by(UserProgress.id)]
+        assert stats.attempt_count == len(scores) == 4
+        assert stats.last_score == 100.0 and stats.last_seen is not None
+        assert stats.last_risk_score == UserProgress.query.filter_by(user_id=student.id).order_by(
+            UserProgress.id.desc()).first().risk_score
+        print(f"   {stats.attempt_count} attempts, mean {stats.mean_score:.1f}, last {stats.last_score:.1f}")
+
+        # ========== TEST 2: Matches recomputation ==========
+        print("\n✅ Test 2 - Running aggregates match full recomputation:")
+        assert np.isclose(stats.mean_score, np.mean(scores))
+        assert np.isclose(stats.score_variance, np.var(scores, ddof=1))
+        assert np.isclose(stats.trend_slope, np.polyfit(np.arange(1, 5), scores, 1)[0])
+
+        rng = np.random.default_rng(0)
+        many = np.round(rng.uniform(0, 100, 200), 2)
+        for score in many:
+            LearnerStats.record_attempt(student.id, 999999, float(score))
+        db.session.commit()
+        bulk = LearnerStats.query.filter_by(user_id=student.id, course_id=999999).one()
+        assert bulk.attempt_count == 200
+        assert np.isclose(bulk.mean_score, many.mean())
+        assert np.isclose(bulk.score_variance, many.var(ddof=1))
+        assert np.isclose(bulk.trend_slope, np.polyfit(np.arange(1, 201), many, 1)[0])
+        print(f"   200 attempts: mean {bulk.mean_score:.2f}, std {bulk.score_std:.2f}, "
+              f"slope {bulk.trend_slope:+.4f}")
+
+        # ========== TEST 3: Migration backfill ==========
+        print("\n✅ Test 3 - Migration backfill:")
+        work_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(work_dir, 'instance'))
+        conn = sqlite3.connect(os.path.join(work_dir, 'instance', 'database.db'))
+        conn.execute("CREATE TABLE user_progress (id INTEGER PRIMARY KEY, user_id INTEGER, course_id INTEGER, "
+                     "score FLOAT, attempts INTEGER, time_taken FLOAT, risk_score FLOAT)")
+        conn.executemany("INSERT INTO user_progress (user_id, course_id, score, risk_score) VALUES (?, ?, ?, ?)",
+                         [(student.id, 999999, float(score), 0.0) for score in many])
+        conn.commit()
+        conn.close()
+        cwd = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            assert migrate_learner_stats.migrate_database()
+        finally:
+            os.chdir(cwd)
+        conn = sqlite3.connect(os.path.join(work_dir, 'instance', 'database.db'))
+        row = conn.execute("SELECT attempt_count, score_sum, score_sq_sum, score_index_sum, last_score "
+                           "FROM learner_stats").fetchone()
+        conn.close()
+        expected = (bulk.attempt_count, bulk.score_sum, bulk.score_sq_sum, bulk.score_index_sum, bulk.last_score)
+        assert row[0] == expected[0] and np.allclose(row[1:], expected[1:])
+        print(f"   Backfilled sums match incremental updates")
+
+        # ========== TEST 4: Dashboard ==========
+        print("\n✅ Test 4 - Trainer dashboard shows aggregates:")
+        with client.session_transaction() as sess:
+            sess["user_id"] = trainer.id
+            sess["role"] = "trainer"
+        response_text = client.get("/my_trainees").data.decode()
+        assert "Feature Store Course" in response_text
+        assert f"avg {stats.mean_score:.1f}%" in response_text
+        print(f"   my_trainees shows avg {stats.mean_score:.1f}% and trend {stats.trend_slope:+.1f}/attempt")
+
+    print("\n" + "="*70)
+    print("✅ ALL LEARNER FEATURE STORE TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_learner_stats()
@@ -0,0 +1,120 @@
+"""
+Test suite for the LLM response cache
+
+Tests:
+1. Values round-trip compressed, keyed by template, model, parameters and input
+2. Expired entries are misses and get dropped
+3. The least recently used entries are evicted to stay within the byte budget
+4. Repeated enhance_script / PDF analysis calls skip the API
+"""
+
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+sys.path.insert(0, os.getcwd())
+
+import ai_engine as ai
+from llm_cache import LLMCache, cache_key
+
+class FakeChatCompletion:
+    """Stands in for the OpenAI API, counting the requests that reach it"""
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        content = f"1. Summary\nAnswer {self.calls} to: {kwargs['messages'][1]['content'][-40:]}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def test_llm_cache():
+    print("\n" + "="*70)
+    print("TESTING LLM RESPONSE CACHE")
+    print("="*70)
+
+    work_dir = tempfile.mkdtemp()
+
+    # ========== TEST 1: Round trip ==========
+    print("\n✅ Test 1 - Content-addressed, compressed entries:")
+    cache = LLMCache(os.path.join(work_dir, 'cache.db'), max_bytes=1024 * 1024, ttl_seconds=60)
+    params = {'max_tokens': 100, 'temperature': 0.5}
+    key = cache_key('t-v1', 'gpt', params, {'text': 'hello'})
+    assert key == cache_key('t-v1', 'gpt', dict(reversed(list(params.items()))), {'text': 'hello'})
+    assert key != cache_key('t-v2', 'gpt', params, {'text': 'hello'})
+    assert key != cache_key('t-v1', 'gpt', {'max_tokens': 100, 'temperature': 0.7}, {'text': 'hello'})
+
+    assert cache.get(key) is None
+    value = "A long lesson. " * 2000
+    cache.put(key, value)
+    assert cache.get(key) == value
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['entries'] == 1
+    assert stats['bytes'] < len(value) / 20
+    cache.put('dict', {'summary': 'ok', 'quiz': [1, 2]})
+    assert cache.get('dict') == {'summary': 'ok', 'quiz': [1, 2]}
+    print(f"   {len(value)} chars stored in {stats['bytes']} bytes")
+
+    # ========== TEST 2: TTL ==========
+    print("\n✅ Test 2 - Expired entries are misses:")
+    now = time.time()
+    cache.clock = lambda: now + 61
+    assert cache.get(key) is None and cache.stats()['expired'] == 1
+    assert cache.purge_expired() == 1
+    assert cache.stats()['entries'] == 0
+    cache.clock = time.time
+    print(f"   Entries older than {cache.ttl_seconds}s dropped")
+
+    # ========== TEST 3: LRU eviction ==========
+    print("\n✅ Test 3 - Size-bounded LRU:")
+    # Random hex compresses to about half, so the budget holds three ~650-byte entries
+    small = LLMCache(os.path.join(work_dir, 'small.db'), max_bytes=2200, ttl_seconds=0)
+    tick = iter(range(1000))
+    small.clock = lambda: next(tick)
+    for i in range(3):
+        small.put(f"k{i}", os.urandom(600).hex())
+    assert small.stats()['entries'] == 3
+    assert small.get("k0") is not None  # k0 is now the most recently used
+    small.put("k3", os.urandom(600).hex())
+    stats = small.stats()
+    assert stats['bytes'] <= small.max_bytes and stats['evictions'] == 1
+    assert small.get("k1") is None, "The least recently used entry should go first"
+    assert small.get("k0") is not None and small.get("k2") is not None
+    print(f"   Budget {small.max_bytes} bytes: k1 evicted, recently read k0 kept")
+
+    # ========== TEST 4: AI engine ==========
+    print("\n✅ Test 4 - Repeated AI requests are served from the cache:")
+    fake = FakeChatCompletion()
+    real_openai = ai.openai
+    ai.openai = SimpleNamespace(ChatCompletion=fake)
+    try:
+        engine = ai.NeuroLMSAI()
+        engine.use_openai = True
+        engine.cache = LLMCache(os.path.join(work_dir, 'engine.db'))
+
+        first = engine.enhance_script("Photosynthesis turns light into sugar.", "Biology")
+        started = time.perf_counter()
+        again = engine.enhance_script("Photosynthesis turns light into sugar.", "Biology")
+        hit_ms = (time.perf_counter() - started) * 1000
+        assert again == first and fake.calls == 1
+        engine.enhance_script("Photosynthesis turns light into sugar.", "Chemistry")
+        assert fake.calls == 2
+
+        document = "Cells divide by mitosis. " * 200
+        summary = engine._summarize_pdf_openai([document], 1000)
+        assert engine._summarize_pdf_openai([document], 1000) == summary and fake.calls == 3
+        assert summary['ai_generated']
+    finally:
+        ai.openai = real_openai
+
+    stats = engine.cache_stats()
+    assert stats['hits'] == 2 and stats['misses'] == 3 and stats['entries'] == 3
+    assert hit_ms < 50
+    print(f"   {fake.calls} API calls for 5 requests; cached re-upload answered in {hit_ms:.2f} ms")
+
+    print("\n" + "="*70)
+    print("✅ ALL LLM CACHE TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_llm_cache()
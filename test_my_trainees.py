@@ -98,6 +98,7 @@ with app.app_context():
     
     response = client.get("/my_trainees")
     print(f"   Status: {response.status_code}")
+    assert response.status_code == 200
     response_text = response.data.decode()
     print(f"   Contains page title: {'My Trainees' in response_text}")
     print(f"   Contains trainer name: {trainer.name in response_text}")
@@ -131,6 +132,7 @@ with app.app_context():
     response = client.get("/my_trainees")
     response_text = response.data.decode()
     print(f"   Status: {response.status_code}")
+    assert response.status_code == 200
     print(f"   Shows empty state message: {'no trainees assigned yet' in response_text.lower()}")
     
     # Test 7: Template structure
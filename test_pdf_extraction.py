@@ -0,0 +1,82 @@
+"""
+Test suite for parallel PDF text extraction
+
+Tests:
+1. Page ranges are contiguous and cover every page once
+2. A process pool returns the same pages, in order, as the serial loop
+3. Small documents and a single worker are extracted in-process
+4. The AI engine's page stream goes through the pool
+"""
+
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.getcwd())
+
+import pdf_extract
+from pdf_extract import extract_pages, page_ranges
+from benchmark_pdf_extraction import make_text_pdf, serial_extract
+import ai_engine as ai
+
+def test_pdf_extraction():
+    print("\n" + "="*70)
+    print("TESTING PARALLEL PDF EXTRACTION")
+    print("="*70)
+
+    # ========== TEST 1: Page ranges ==========
+    print("\n✅ Test 1 - Page ranges cover every page once:")
+    for page_count, workers in [(16, 2), (100, 4), (401, 3), (5, 8)]:
+        ranges = page_ranges(page_count, workers)
+        assert ranges[0][0] == 0 and ranges[-1][1] == page_count
+        assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+        sizes = [stop - start for start, stop in ranges]
+        assert max(sizes) - min(sizes) <= 1 and max(sizes) <= pdf_extract.MAX_RANGE_PAGES
+    print(f"   401 pages on 3 workers -> {len(page_ranges(401, 3))} ranges")
+
+    # ========== TEST 2: Pool matches the serial loop ==========
+    print("\n✅ Test 2 - Pool output matches the serial loop in page order:")
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'long.pdf')
+    texts = [f"Page {n}\nFractions are parts of a whole." if n % 7 else "" for n in range(60)]
+    make_text_pdf(path, texts)
+    pages = extract_pages(path, workers=3)
+    assert len(pages) == 60
+    assert [page.split("\n")[0] for page in pages] == [text.split("\n")[0] for text in texts]
+    assert "\n".join(page for page in pages if page).strip() == serial_extract(path)
+    # Workers are never forked from the (threaded) app process
+    assert pdf_extract.POOL_START_METHOD in ('forkserver', 'spawn')
+    print(f"   60 pages on 3 workers, {sum(1 for page in pages if not page)} blank pages kept in place")
+
+    # ========== TEST 3: In-process extraction ==========
+    print("\n✅ Test 3 - Small documents skip the pool:")
+    short = os.path.join(tmp_dir, 'short.pdf')
+    make_text_pdf(short, ["Only page"])
+    original = pdf_extract.ProcessPoolExecutor
+    pdf_extract.ProcessPoolExecutor = None
+    try:
+        assert extract_pages(short, workers=4) == ["Only page"]
+        assert extract_pages(path, workers=1) == pages
+    finally:
+        pdf_extract.ProcessPoolExecutor = original
+    print("   No processes started below PARALLEL_MIN_PAGES or with one worker")
+
+    # ========== TEST 4: Engine integration ==========
+    print("\n✅ Test 4 - The engine extracts through the pool:")
+    engine = ai.ai_engine
+    saved = engine.pdf_extract_workers
+    engine.pdf_extract_workers = 2
+    try:
+        engine_pages = [page for page in engine._pdf_page_stream(path) if page]
+        assert engine_pages == [page for page in pages if page]
+        assert "\n".join(engine_pages).strip() == serial_extract(path)
+        assert "error" in engine.summarize_pdf(os.path.join(tmp_dir, 'missing.pdf'))
+    finally:
+        engine.pdf_extract_workers = saved
+    print(f"   {len(engine_pages)} pages with text, same text as before")
+
+    print("\n" + "="*70)
+    print("✅ ALL PARALLEL PDF EXTRACTION TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_pdf_extraction()
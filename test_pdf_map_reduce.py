@@ -0,0 +1,129 @@
+"""
+Test suite for map-reduce summarization of long PDFs
+
+Tests:
+1. Pages are packed into chunks under the token budget, split only when too big
+2. Section summaries run in parallel, no more than max_workers at once
+3. Partial summaries are combined in a logarithmic number of levels
+4. The engine analyzes the whole of a long document, not just its first pages
+"""
+
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+sys.path.insert(0, os.getcwd())
+
+import ai_engine as ai
+from llm_cache import LLMCache
+from summarize_pipeline import estimate_tokens, iter_chunks, map_reduce
+
+class FakeChatCompletion:
+    """Stands in for the OpenAI API; every summary lists the page markers it was given"""
+    def __init__(self):
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def create(self, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        with self.lock:
+            self.prompts.append(prompt)
+        markers = " ".join(sorted(set(re.findall(r"PAGE-\d+", prompt)), key=lambda m: int(m[5:])))
+        if "Analyze this document" in prompt:
+            content = f"1. Summary\nCovers {markers}\n2. Key topics\nFractions\n3. Conclusions\nPractice"
+        else:
+            content = f"Section summary of {markers}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def test_pdf_map_reduce():
+    print("\n" + "="*70)
+    print("TESTING MAP-REDUCE PDF SUMMARIZATION")
+    print("="*70)
+
+    # ========== TEST 1: Chunking ==========
+    print("\n✅ Test 1 - Pages packed into budget-sized chunks:")
+    pages = [f"Page {n} text. " * 40 for n in range(10)]
+    chunks = list(iter_chunks(pages, max_tokens=400))
+    assert all(estimate_tokens(chunk) <= 400 for chunk in chunks)
+    assert "\n".join(chunks) == "\n".join(page.strip() for page in pages)
+    # A page that fits is never cut in two
+    assert all(any(page.strip() in chunk for chunk in chunks) for page in pages)
+
+    huge = "\n\n".join(f"Paragraph {n}. " + "word " * 200 for n in range(6))
+    pieces = list(iter_chunks(["short page", huge], max_tokens=400))
+    assert all(estimate_tokens(piece) <= 400 for piece in pieces) and len(pieces) > 2
+    assert all(f"Paragraph {n}." in "".join(pieces) for n in range(6))
+    print(f"   10 pages -> {len(chunks)} chunks; an oversized page split at paragraphs into {len(pieces)}")
+
+    # ========== TEST 2: Bounded parallelism ==========
+    print("\n✅ Test 2 - Section summaries run in parallel, bounded:")
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def slow_summary(chunk):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return "s"
+
+    started = time.perf_counter()
+    stats = map_reduce([f"chunk {n}" for n in range(12)], slow_summary, "".join, max_tokens=400, max_workers=4)
+    elapsed = time.perf_counter() - started
+    assert stats['map_calls'] == 12 and stats['reduce_calls'] == 0 and peak[0] == 4
+    assert elapsed < 12 * 0.05 / 2
+    print(f"   12 sections in {elapsed * 1000:.0f} ms with at most {peak[0]} at once")
+
+    # ========== TEST 3: Reduce levels ==========
+    print("\n✅ Test 3 - Partials combined level by level:")
+    # Each partial is ~100 tokens, so four fit a 400-token group
+    stats = map_reduce([str(n) for n in range(64)], lambda chunk: "x" * 396,
+                       lambda group: "y" * 396, max_tokens=400)
+    # 64 -> 16 -> 4 partials, which fit the final call together
+    assert len(stats['partials']) == 4
+    assert stats['reduce_levels'] == 2 and stats['reduce_calls'] == 16 + 4
+    print(f"   64 sections -> {stats['reduce_calls']} combine calls in {stats['reduce_levels']} levels")
+
+    # ========== TEST 4: Engine integration ==========
+    print("\n✅ Test 4 - The whole long document is analyzed:")
+    engine = ai.ai_engine
+    saved = (ai.openai, engine.use_openai, engine.cache)
+    fake = FakeChatCompletion()
+    ai.openai = SimpleNamespace(ChatCompletion=fake)
+    engine.use_openai = True
+    engine.cache = LLMCache(os.path.join(tempfile.mkdtemp(), 'cache.db'), max_bytes=0)
+    try:
+        short = engine._summarize_pdf_openai(["PAGE-0 a short handout"], 500)
+        try:
+            engine._summarize_pdf_openai("PAGE-0 a short handout", 500)
+            assert False, "a bare str must be rejected"
+        except TypeError:
+            pass
+        assert len(fake.prompts) == 1 and short["chunks"] == 1 and "PAGE-0" in short["summary"]
+
+        fake.prompts.clear()
+        pages = [f"PAGE-{n} " + "fractions are parts of a whole. " * 120 for n in range(60)]
+        text = "\n".join(pages)
+        assert len(text) > 8000 * 20
+        result = engine._summarize_pdf_openai(iter(pages), 500)
+        assert result["ai_generated"] and result["chunks"] > 1
+        # The final analysis sees every page, including the last ones the old 8000-character cut dropped
+        final = fake.prompts[-1]
+        assert "Analyze this document" in final and "section by section" in final
+        assert all(f"PAGE-{n}" in result["summary"] for n in range(60))
+        assert all(estimate_tokens(prompt) <= ai.SUMMARY_CHUNK_TOKENS + 200 for prompt in fake.prompts)
+        print(f"   {len(pages)} pages in {result['chunks']} chunks, {len(fake.prompts)} calls in all")
+    finally:
+        ai.openai, engine.use_openai, engine.cache = saved
+
+    print("\n" + "="*70)
+    print("✅ ALL MAP-REDUCE SUMMARIZATION TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_pdf_map_reduce()
@@ -0,0 +1,146 @@
+"""
+Test suite for streamed, memory-bounded PDF processing
+
+Tests:
+1. PageStream extracts pages only as they are consumed
+2. Page and byte ceilings stop oversized documents
+3. Chunking and map-reduce run in constant memory, in document order
+4. summarize_pdf streams the file, counts every page and reports truncation
+"""
+
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from itertools import islice
+from types import SimpleNamespace
+sys.path.insert(0, os.getcwd())
+
+import ai_engine as ai
+import pdf_extract
+from pdf_extract import PageStream
+from benchmark_pdf_extraction import make_text_pdf, sample_page, serial_extract
+from llm_cache import LLMCache
+from pdf_text_cache import PDFTextCache
+from summarize_pipeline import iter_chunks, map_reduce
+
+class FakeChatCompletion:
+    """Stands in for the OpenAI API; summaries name the first and last page they cover"""
+    def create(self, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        pages = [int(n) for n in re.findall(r"Page (\d+)", prompt)]
+        content = f"1. Summary\nPage {min(pages)} to Page {max(pages)}\n2. Key topics\nFractions"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def _span(text):
+    pages = [int(n) for n in re.findall(r"(\d+)", text)]
+    return min(pages), max(pages)
+
+def _pipeline_peak(page_count):
+    """Peak traced memory of chunking and map-reducing a generated document"""
+    pages = (f"Page {n}: " + "fractions are parts of a whole. " * 100 for n in range(page_count))
+    tracemalloc.start()
+    stats = map_reduce(iter_chunks(pages, 1000), lambda chunk: "s%d-%d" % _span(chunk),
+                       lambda group: "c%d-%d" % (_span(group[0])[0], _span(group[-1])[1]),
+                       max_tokens=40, max_workers=4)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, stats
+
+def test_pdf_streaming():
+    print("\n" + "="*70)
+    print("TESTING STREAMED PDF PROCESSING")
+    print("="*70)
+
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'manual.pdf')
+    make_text_pdf(path, [sample_page(n) for n in range(120)])
+
+    # ========== TEST 1: Lazy extraction ==========
+    print("\n✅ Test 1 - Pages are extracted as they are consumed:")
+    extracted = []
+    page_text = pdf_extract._page_text
+    pdf_extract._page_text = lambda reader, index: extracted.append(index) or page_text(reader, index)
+    try:
+        stream = PageStream(path, workers=1)
+        first = list(islice(stream, 3))
+        assert extracted == [0, 1, 2] and stream.pages_read == 3
+        assert first[0].startswith("Page 0 line 0")
+    finally:
+        pdf_extract._page_text = page_text
+
+    # Leaving a parallel stream early shuts its pool down without extracting the rest
+    started = time.perf_counter()
+    texts = iter(PageStream(path, workers=2))
+    assert next(texts).startswith("Page 0 line 0")
+    texts.close()
+    print(f"   3 of 120 pages read in-process; parallel stream closed after "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+    # ========== TEST 2: Ceilings ==========
+    print("\n✅ Test 2 - Page and byte ceilings:")
+    stream = PageStream(path, workers=1, max_pages=10)
+    assert len(list(stream)) == 10 and stream.truncated and stream.page_count == 120
+
+    page_bytes = len(sample_page(0).encode('utf-8'))
+    stream = PageStream(path, workers=2, max_bytes=int(page_bytes * 25.5))
+    pages = list(stream)
+    assert len(pages) == 25 and stream.truncated and stream.bytes_read <= page_bytes * 25.5
+    assert [page.split(" ")[1] for page in pages] == [str(n) for n in range(25)]
+
+    stream = PageStream(path, workers=2, max_pages=500, max_bytes=page_bytes * 500)
+    assert "\n".join(stream).strip() == serial_extract(path) and not stream.truncated
+    assert stream.word_count == len(serial_extract(path).split())
+    print(f"   Stopped at 10 pages and at 25 pages' worth of text; under the ceilings nothing is lost")
+
+    # ========== TEST 3: Constant-memory pipeline ==========
+    print("\n✅ Test 3 - Chunking and map-reduce in constant memory:")
+    small_peak, small = _pipeline_peak(200)
+    large_peak, large = _pipeline_peak(2000)
+    assert large['chunks'] == 10 * small['chunks'] and large['reduce_levels'] > small['reduce_levels']
+    assert large_peak < 2 * small_peak
+    # Partials come back in document order and cover every page once
+    spans = [_span(partial) for partial in large['partials']]
+    assert spans[0][0] == 0 and spans[-1][1] == 1999
+    assert all(a[1] + 1 == b[0] for a, b in zip(spans, spans[1:]))
+    print(f"   200 pages: {small_peak // 1024} KB peak, 2000 pages: {large_peak // 1024} KB peak "
+          f"({large['reduce_calls']} combine calls in {large['reduce_levels']} levels)")
+
+    # ========== TEST 4: summarize_pdf ==========
+    print("\n✅ Test 4 - summarize_pdf streams the whole file:")
+    engine = ai.ai_engine
+    saved = (ai.openai, engine.use_openai, engine.cache, engine.pdf_max_pages, engine.pdf_extract_workers,
+             engine.pdf_cache)
+    ai.openai = SimpleNamespace(ChatCompletion=FakeChatCompletion())
+    engine.use_openai = True
+    engine.cache = LLMCache(os.path.join(tmp_dir, 'cache.db'), max_bytes=0)
+    engine.pdf_extract_workers = 2
+    engine.pdf_cache = PDFTextCache(os.path.join(tmp_dir, 'pdf_text'))
+    try:
+        result = engine.summarize_pdf(path)
+        assert result["chunks"] > 1 and result["pages"] == 120 and "truncated" not in result
+        assert result["word_count"] == len(serial_extract(path).split())
+        assert result["summary"] == "Page 0 to Page 119"
+
+        engine.pdf_max_pages = 50
+        result = engine.summarize_pdf(path)
+        assert result["truncated"] and result["pages"] == 50 and result["summary"] == "Page 0 to Page 49"
+        assert "only its first 50 pages were analyzed" in ai.summarize_pdf(path)
+
+        engine.use_openai = False
+        result = engine.summarize_pdf(path)
+        assert not result["ai_generated"] and result["pages"] == 50
+        assert result["word_count"] == len(serial_extract(path).split()) * 50 // 120
+        print(f"   All 120 pages summarized and counted; capped at 50 with a note in the analysis")
+    finally:
+        (ai.openai, engine.use_openai, engine.cache,
+         engine.pdf_max_pages, engine.pdf_extract_workers, engine.pdf_cache) = saved
+
+    print("\n" + "="*70)
+    print("✅ ALL STREAMED PDF PROCESSING TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_pdf_streaming()
@@ -0,0 +1,175 @@
+"""
+Test suite for the content-hash cache of extracted PDF text
+
+Tests:
+1. Uploads are hashed while they are saved, and stored under their hash
+2. A repeat file, under any name, is served from the cache without PyPDF2
+3. Only complete extractions are stored; broken entries are dropped
+4. Least recently used entries are evicted over the byte budget
+5. upload_pdf passes the hash to the job, so re-uploads skip extraction
+"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.getcwd())
+
+import ai_engine as ai
+import pdf_extract
+from pdf_extract import PageStream
+from pdf_text_cache import PDFTextCache, file_hash, save_and_hash, save_upload
+from benchmark_pdf_extraction import make_text_pdf, sample_page, serial_extract
+from app import app, db, User, Course, AIJob
+from temp_database import temporary_database
+from werkzeug.security import generate_password_hash
+
+def _poll(client, job_id, timeout=20):
+    deadline = time.monotonic() + timeout
+    while True:
+        db.session.expire_all()
+        data = client.get(f"/ai_jobs/{job_id}").get_json()
+        if data["status"] in ("done", "failed") or time.monotonic() > deadline:
+            return data
+        time.sleep(0.02)
+
+def test_pdf_text_cache():
+    print("\n" + "="*70)
+    print("TESTING PDF TEXT CACHE")
+    print("="*70)
+
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'handout.pdf')
+    make_text_pdf(path, [sample_page(n) for n in range(40)])
+
+    # ========== TEST 1: Hash while saving ==========
+    print("\n✅ Test 1 - Uploads hashed while saved:")
+    with open(path, 'rb') as f:
+        data = f.read()
+    copy = os.path.join(tmp_dir, 'handout (renamed).pdf')
+    digest = save_and_hash(io.BytesIO(data), copy)
+    assert digest == hashlib.sha256(data).hexdigest() == file_hash(path)
+
+    # Each content gets its own file, so an upload cannot overwrite another one's queued file
+    uploads = os.path.join(tmp_dir, 'uploads')
+    stored, stored_hash = save_upload(io.BytesIO(data), uploads)
+    assert stored == os.path.join(uploads, digest + '.pdf') and stored_hash == digest
+    assert save_upload(io.BytesIO(data), uploads)[0] == stored
+    other, _ = save_upload(io.BytesIO(b"%PDF-1.4 other handout"), uploads)
+    assert other != stored and file_hash(stored) == digest
+    assert sorted(os.listdir(uploads)) == sorted(os.path.basename(p) for p in (stored, other))
+    print(f"   {len(data)} bytes -> {digest[:12]}…, stored as {os.path.basename(stored)[:12]}….pdf")
+
+    # ========== TEST 2: Repeat upload skips extraction ==========
+    print("\n✅ Test 2 - Repeat file served from the cache:")
+    cache = PDFTextCache(os.path.join(tmp_dir, 'cache'))
+    started = time.perf_counter()
+    first = PageStream(path, workers=1, cache=cache, content_hash=digest)
+    pages = list(first)
+    extract_ms = (time.perf_counter() - started) * 1000
+    assert not first.cached and cache.stats()['entries'] == 1
+
+    reader = pdf_extract.PdfReader
+    pdf_extract.PdfReader = None
+    try:
+        started = time.perf_counter()
+        again = PageStream(copy, workers=1, cache=cache, content_hash=digest)
+        assert list(again) == pages
+        hit_ms = (time.perf_counter() - started) * 1000
+    finally:
+        pdf_extract.PdfReader = reader
+    assert again.cached and again.page_count == 40 and again.word_count == first.word_count
+    assert "\n".join(pages).strip() == serial_extract(path)
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['bytes'] < len("".join(pages)) / 3
+    print(f"   Extracted in {extract_ms:.0f} ms, cached copy read in {hit_ms:.1f} ms "
+          f"({stats['bytes']} compressed bytes)")
+
+    # ========== TEST 3: Complete extractions only ==========
+    print("\n✅ Test 3 - Partial extractions and broken entries are not served:")
+    partial = PDFTextCache(os.path.join(tmp_dir, 'partial'))
+    texts = iter(PageStream(path, workers=1, cache=partial, content_hash=digest))
+    next(texts)
+    texts.close()
+    assert list(PageStream(path, workers=1, max_pages=5, cache=partial, content_hash=digest)) == pages[:5]
+    assert list(PageStream(path, workers=1, max_bytes=1000, cache=partial, content_hash=digest)) == []
+    assert partial.stats()['entries'] == 0 and os.listdir(partial.directory) == []
+
+    # A cached entry still honours the ceilings
+    capped = PageStream(path, workers=1, max_pages=5, cache=cache, content_hash=digest)
+    assert list(capped) == pages[:5] and capped.cached and capped.truncated
+
+    with open(cache._path(digest), 'wb') as f:
+        f.write(b"not gzip")
+    stream = PageStream(path, workers=1, cache=cache, content_hash=digest)
+    assert list(stream) == pages and not stream.cached and cache.errors == 1
+    restored = PageStream(path, workers=1, cache=cache, content_hash=digest)
+    assert list(restored) == pages and restored.cached
+    print("   Nothing stored for early stops or ceilings; a corrupt entry was re-extracted")
+
+    # ========== TEST 4: LRU eviction ==========
+    print("\n✅ Test 4 - Least recently used entries evicted:")
+    entry_bytes = os.path.getsize(cache._path(digest))
+    lru = PDFTextCache(os.path.join(tmp_dir, 'lru'), max_bytes=int(entry_bytes * 2.5))
+    now = [1000.0]
+    lru.clock = lambda: now[0]
+    for name in ("a", "b", "c"):
+        now[0] += 10
+        list(PageStream(path, workers=1, cache=lru, content_hash=name * 64))
+        if name == "b":
+            # Reading "a" makes "b" the least recently used
+            now[0] += 10
+            assert lru.get("a" * 64) is not None
+    assert lru.get("b" * 64) is None
+    assert lru.get("a" * 64) is not None and lru.get("c" * 64) is not None
+    assert lru.evictions == 1 and lru.stats()['bytes'] <= lru.max_bytes
+    print(f"   Budget of {lru.max_bytes} bytes: 'b' evicted, recently read 'a' kept")
+
+    # ========== TEST 5: Upload route ==========
+    print("\n✅ Test 5 - Re-uploads skip extraction:")
+    engine = ai.ai_engine
+    saved = (engine.pdf_cache, engine.use_openai)
+    engine.pdf_cache = PDFTextCache(os.path.join(tmp_dir, 'engine'))
+    engine.use_openai = False
+    try:
+        with temporary_database(), app.app_context():
+            trainer = User(name="Cache Trainer", email="pdf_cache_trainer@test.com",
+                           password=generate_password_hash("password123"), role="trainer")
+            course = Course(title="PDF Cache Course", description="Repeat upload test")
+            db.session.add_all([trainer, course])
+            db.session.commit()
+
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess["user_id"] = trainer.id
+                sess["role"] = "trainer"
+
+            results, paths = [], set()
+            for name in ("cache_test.pdf", "cache_test_renamed.pdf"):
+                client.post(f"/upload_pdf/{course.id}", data={"pdf": (io.BytesIO(data), name)},
+                            content_type="multipart/form-data")
+                job = AIJob.query.filter_by(user_id=trainer.id).order_by(AIJob.id.desc()).first()
+                assert job.to_dict()["status"] in ("queued", "running", "done")
+                paths.add(json.loads(job.payload)["path"])
+                results.append(_poll(client, job.id))
+            assert paths == {os.path.join("uploads", digest + ".pdf")}
+            os.remove(paths.pop())
+            assert all(result["status"] == "done" for result in results)
+            assert results[0]["result"] == results[1]["result"]
+            stats = engine.cache_stats()["pdf_text"]
+            assert stats["stores"] == 1 and stats["hits"] == 1 and stats["entries"] == 1
+    finally:
+        engine.pdf_cache, engine.use_openai = saved
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print("   Second upload under a new name answered from the cache")
+
+    print("\n" + "="*70)
+    print("✅ ALL PDF TEXT CACHE TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_pdf_text_cache()
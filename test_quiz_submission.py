@@ -102,6 +102,7 @@ with app.app_context():
     print(f"\n✅ Test 2 - Display Quiz Form:")
     response = client.get(f"/take_quiz/{course.id}")
     print(f"   Status: {response.status_code}")
+    assert response.status_code == 200
     response_text = response.data.decode()
     print(f"   Contains course title: {course.title in response_text}")
     print(f"   Contains questions: {('capital of France' in response_text and '2 + 2' in response_text)}")
@@ -120,6 +121,7 @@ with app.app_context():
         }
     )
     print(f"   Status: {response.status_code}")
+    assert response.status_code == 200
     response_text = response.data.decode()
     print(f"   Contains result page: {'Quiz Complete' in response_text or '100' in response_text}")
     print(f"   Contains score: {'Score' in response_text or '%' in response_text}")
@@ -155,6 +157,7 @@ with app.app_context():
         }
     )
     print(f"   Status: {response.status_code}")
+    assert response.status_code == 200
     
     # Verify UserProgress
     progress = UserProgress.query.filter_by(
@@ -184,6 +187,7 @@ with app.app_context():
         }
     )
     print(f"   Status: {response.status_code}")
+    assert response.status_code == 200
     
     progress = UserProgress.query.filter_by(
         user_id=student.id,
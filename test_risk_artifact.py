@@ -0,0 +1,97 @@
+"""
+Test suite for the risk model artifact format
+
+Tests:
+1. A trained forest round-trips through save/load unchanged
+2. Loaded arrays are read-only memory maps
+3. Corrupt checksums and newer format versions are rejected
+4. The shipped model artifact loads and predicts
+"""
+
+import os
+import struct
+import tempfile
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from risk_artifact import (
+    ArtifactError, ArtifactForest, ArtifactScaler, FORMAT_VERSION,
+    export_forest, load_artifact, save_artifact
+)
+from risk_model import risk_model
+
+def _small_forest():
+    rng = np.random.default_rng(7)
+    X = np.column_stack([rng.uniform(0, 100, 500), rng.integers(1, 6, 500), rng.uniform(60, 660, 500)])
+    y = (X[:, 0] < 50).astype(int) + (X[:, 1] > 3).astype(int) + (X[:, 2] > 300).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(scaler.transform(X), y)
+    return model, scaler, X
+
+def test_risk_artifact():
+    print("\n" + "="*70)
+    print("TESTING RISK MODEL ARTIFACT FORMAT")
+    print("="*70)
+
+    model, scaler, X = _small_forest()
+    path = os.path.join(tempfile.mkdtemp(), 'risk_model.nlrm')
+    save_artifact(path, export_forest(model, scaler), {'note': 'test'})
+
+    # ========== TEST 1: Round trip ==========
+    print("\n✅ Test 1 - Round trip:")
+    header, arrays = load_artifact(path)
+    assert header['format_version'] == FORMAT_VERSION
+    assert header['meta']['note'] == 'test'
+    forest, artifact_scaler = ArtifactForest(arrays, header), ArtifactScaler(arrays)
+    expected = model.predict_proba(scaler.transform(X))
+    actual = forest.predict_proba(artifact_scaler.transform(X))
+    assert np.allclose(expected, actual)
+    assert np.array_equal(model.predict(scaler.transform(X)), forest.predict(artifact_scaler.transform(X)))
+    print(f"   {forest.n_estimators} trees, {os.path.getsize(path)} bytes, predictions match")
+
+    # ========== TEST 2: Memory mapped ==========
+    print("\n✅ Test 2 - Read-only memory map:")
+    assert isinstance(arrays['threshold'].base, np.memmap) or isinstance(arrays['threshold'], np.memmap)
+    assert not arrays['threshold'].flags.writeable
+    # The lookup tables inference walks are mapped too, not rebuilt in private memory
+    for table in (forest._children, forest._feature, forest._class_values):
+        assert not table.flags.writeable and not table.flags.owndata
+    print("   Arrays and lookup tables are read-only views of the mapped file")
+
+    # ========== TEST 3: Corruption and versioning ==========
+    print("\n✅ Test 3 - Corruption and version checks:")
+    with open(path, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+    try:
+        load_artifact(path)
+        assert False, "Corrupt artifact should fail checksum"
+    except ArtifactError as e:
+        print(f"   Rejected corrupt file: {e}")
+
+    with open(path, 'r+b') as f:
+        f.seek(8)
+        f.write(struct.pack('<I', FORMAT_VERSION + 1))
+    try:
+        load_artifact(path)
+        assert False, "Newer format version should be rejected"
+    except ArtifactError as e:
+        print(f"   Rejected newer version: {e}")
+
+    # ========== TEST 4: Shipped model ==========
+    print("\n✅ Test 4 - Shipped artifact:")
+    info = risk_model.get_model_info()
+    print(f"   Model type: {info['model_type']}")
+    if os.path.exists(risk_model.artifact_path):
+        assert risk_model.predict_risk(40, 4, 400)['method'] == 'machine_learning'
+        _, shipped = load_artifact(risk_model.artifact_path)
+        assert {'children', 'feature_index', 'class_values'} <= set(shipped)
+
+    print("\n" + "="*70)
+    print("✅ ALL ARTIFACT TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_risk_artifact()
@@ -0,0 +1,155 @@
+"""
+Test suite for background risk scoring
+
+Tests:
+1. Queued submissions are scored in batches and written back in bulk
+2. The sweep picks up rows left pending by another process
+3. Async take_quiz returns before scoring and the result page polls for it
+"""
+
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.getcwd())
+
+import app as lms
+from app import app, db, User, Course, Quiz, Enrollment, UserProgress, LearnerStats, ProgressRiskVersion, \
+    ProgressRiskExplanation
+from risk_model import risk_model, calculate_risk
+import risk_scoring
+from risk_scoring import BackgroundRiskScorer
+from temp_database import temporary_database
+from sqlalchemy import bindparam, text
+from werkzeug.security import generate_password_hash
+
+def test_async_risk_scoring():
+    print("\n" + "="*70)
+    print("TESTING BACKGROUND RISK SCORING")
+    print("="*70)
+
+    with temporary_database(), app.app_context():
+        emails = ["async_trainer@test.com", "async_student@test.com", "async_other@test.com"]
+
+        trainer = User(name="Async Trainer", email=emails[0],
+                       password=generate_password_hash("password123"), role="trainer")
+        db.session.add(trainer)
+        db.session.commit()
+        student = User(name="Async Student", email=emails[1],
+                       password=generate_password_hash("password123"), role="user", trainer_id=trainer.id)
+        other = User(name="Async Other", email=emails[2],
+                     password=generate_password_hash("password123"), role="user")
+        course = Course(title="Async Scoring Course", description="Background scoring test")
+        db.session.add_all([student, other, course])
+        db.session.commit()
+        db.session.add(Enrollment(user_id=student.id, course_id=course.id))
+        quizzes = [Quiz(course_id=course.id, trainer_id=trainer.id, question=f"Q{i}", correct_answer=f"a{i}")
+                   for i in range(4)]
+        db.session.add_all(quizzes)
+        db.session.commit()
+
+        # ========== TEST 1: Batched scoring ==========
+        print("\n✅ Test 1 - Queued rows are scored in batches:")
+        rng = np.random.default_rng(0)
+        pending = [UserProgress(user_id=student.id, course_id=course.id, score=float(rng.uniform(0, 100)),
+                                attempts=int(rng.integers(1, 6)), time_taken=float(rng.uniform(60, 600)))
+                   for _ in range(50)]
+        db.session.add_all(pending)
+        LearnerStats.record_attempt(student.id, course.id, pending[-1].score)
+        db.session.commit()
+
+        scorer = BackgroundRiskScorer(risk_model, db.engine, workers=2, max_batch=32, max_wait=0.05)
+        for progress in pending:
+            scorer.submit(progress.id)
+        assert scorer.wait_idle()
+        scorer.stop()
+
+        db.session.expire_all()
+        X = np.array([[p.score, p.attempts, p.time_taken] for p in pending])
+        expected = risk_model.predict_risk_batch(X)['risk_score']
+        assert np.allclose([p.risk_score for p in pending], expected)
+        stats = scorer.stats()
+        assert stats['scored'] == 50 and stats['batches'] < 50
+        last = LearnerStats.query.filter_by(user_id=student.id, course_id=course.id).one()
+        assert np.isclose(last.last_risk_score, pending[-1].risk_score)
+        print(f"   50 rows scored in {stats['batches']} batches, learner_stats updated")
+
+        # ========== TEST 2: Sweep ==========
+        print("\n✅ Test 2 - Sweep scores orphaned pending rows:")
+        orphan = UserProgress(user_id=student.id, course_id=course.id, score=35.0, attempts=3, time_taken=500.0)
+        db.session.add(orphan)
+        db.session.commit()
+        sweeper = BackgroundRiskScorer(risk_model, db.engine)
+        assert sweeper.score_pending() >= 1
+        assert sweeper.score_pending([orphan.id]) == 0, "Scored rows must not be rewritten"
+        db.session.expire_all()
+        assert orphan.risk_score == calculate_risk(35.0, 3, 500.0)
+
+        # A row another process scored between our select and update keeps that process's version
+        db.session.get(ProgressRiskVersion, orphan.id).model_version = "other-process"
+        db.session.commit()
+        select_pending = risk_scoring.SELECT_PENDING_BY_ID
+        risk_scoring.SELECT_PENDING_BY_ID = text(
+            "SELECT id, user_id, course_id, score, attempts, time_taken FROM user_progress WHERE id IN :ids"
+        ).bindparams(bindparam('ids', expanding=True))
+        late = UserProgress(user_id=student.id, course_id=course.id, score=80.0, attempts=1, time_taken=120.0)
+        db.session.add(late)
+        db.session.commit()
+        update_rows = risk_scoring.UPDATE_RISK_ROWS
+        risk_scoring.UPDATE_RISK_ROWS = 1
+        try:
+            assert sweeper.score_pending([orphan.id]) == 0
+            # One bulk update per chunk only claims the rows still pending
+            assert sweeper.score_pending([orphan.id, late.id]) == 1
+        finally:
+            risk_scoring.SELECT_PENDING_BY_ID = select_pending
+            risk_scoring.UPDATE_RISK_ROWS = update_rows
+        db.session.expire_all()
+        assert db.session.get(ProgressRiskVersion, orphan.id).model_version == "other-process"
+        assert late.risk_score == calculate_risk(80.0, 1, 120.0)
+        assert db.session.get(ProgressRiskVersion, late.id).model_version == risk_model.scoring_version
+        print(f"   Orphaned row scored: {orphan.risk_score:.1f}%")
+
+        # ========== TEST 3: Async take_quiz ==========
+        print("\n✅ Test 3 - Async submission and result polling:")
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = student.id
+            sess["role"] = "user"
+
+        previous_mode = lms.RISK_SCORING_MODE
+        lms.RISK_SCORING_MODE = 'async'
+        try:
+            form = {f"answer_{q.id}": (q.correct_answer if i < 2 else "wrong") for i, q in enumerate(quizzes)}
+            form.update(attempts=2, time_taken=300)
+            response_text = client.post(f"/take_quiz/{course.id}", data=form).data.decode()
+        finally:
+            lms.RISK_SCORING_MODE = previous_mode
+        assert "Calculating" in response_text and "/risk_status/" in response_text
+
+        progress = UserProgress.query.filter_by(user_id=student.id).order_by(UserProgress.id.desc()).first()
+        deadline = time.monotonic() + 10
+        while True:
+            # Requests share this test's app context, so drop the cached row between polls
+            db.session.expire_all()
+            status = client.get(f"/risk_status/{progress.id}").get_json()
+            if status["status"] == "done" or time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+        assert status["status"] == "done"
+        assert status["risk_score"] == calculate_risk(50.0, 2, 300.0)
+        assert db.session.get(ProgressRiskVersion, progress.id).model_version == risk_model.scoring_version
+        print(f"   Polled risk: {status['risk_score']:.1f}%")
+
+        with client.session_transaction() as sess:
+            sess["user_id"] = other.id
+        response = client.get(f"/risk_status/{progress.id}")
+        assert response.status_code == 403
+        assert response.get_json() == {"error": "Unauthorized Access"}
+
+    print("\n" + "="*70)
+    print("✅ ALL BACKGROUND RISK SCORING TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_async_risk_scoring()
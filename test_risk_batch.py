@@ -0,0 +1,70 @@
+"""
+Test suite for batch risk scoring
+
+Tests:
+1. predict_risk_batch matches per-row predict_risk on the ML path
+2. Vectorized rule-based fallback matches _rule_based_risk
+3. Column inputs and row inputs give the same result
+4. calculate_risk still returns a single float
+"""
+
+import numpy as np
+from risk_model import risk_model, calculate_risk, RiskAssessmentModel
+
+def test_risk_batch():
+    print("\n" + "="*70)
+    print("TESTING BATCH RISK SCORING")
+    print("="*70)
+
+    rng = np.random.default_rng(0)
+    n = 200
+    rows = np.column_stack([
+        np.round(rng.uniform(0, 100, n), 2),
+        rng.integers(1, 7, n),
+        np.round(rng.uniform(30, 700, n))
+    ])
+
+    # ========== TEST 1: ML path matches scalar ==========
+    print("\n✅ Test 1 - Batch vs scalar (ML path):")
+    batch = risk_model.predict_risk_batch(rows)
+    for i, (score, attempts, time_taken) in enumerate(rows):
+        single = risk_model.predict_risk(score, attempts, time_taken)
+        assert single['risk_score'] == batch['risk_score'][i]
+        assert single['risk_level'] == batch['risk_level'][i]
+        assert single['confidence'] == batch['confidence'][i]
+    print(f"   {n} rows match, method: {batch['method']}")
+
+    # ========== TEST 2: Rule-based path matches scalar ==========
+    print("\n✅ Test 2 - Vectorized rule-based fallback:")
+    untrained = RiskAssessmentModel()
+    untrained._install(None, None)
+
+    grid = np.array([[s, a, t] for s in (0, 49.9, 50, 69.9, 70, 100)
+                     for a in (1, 2, 3, 4) for t in (0, 180, 181, 300, 301)])
+    rules = untrained.predict_risk_batch(grid)
+    assert rules['method'] == 'rule_based'
+    for i, (score, attempts, time_taken) in enumerate(grid):
+        expected = untrained._rule_based_risk(score, attempts, time_taken)
+        assert expected['risk_score'] == rules['risk_score'][i]
+        assert expected['risk_level'] == rules['risk_level'][i]
+    print(f"   {len(grid)} boundary rows match")
+
+    # ========== TEST 3: Column inputs ==========
+    print("\n✅ Test 3 - Column inputs:")
+    columns = risk_model.predict_risk_batch(rows[:, 0], rows[:, 1], rows[:, 2])
+    assert np.array_equal(columns['risk_score'], batch['risk_score'])
+    print("   Columns and rows agree")
+
+    # ========== TEST 4: Legacy wrapper ==========
+    print("\n✅ Test 4 - calculate_risk wrapper:")
+    risk = calculate_risk(55, 2, 200)
+    assert isinstance(risk, float)
+    assert risk == risk_model.predict_risk(55, 2, 200)['risk_score']
+    print(f"   calculate_risk(55, 2, 200) = {risk}")
+
+    print("\n" + "="*70)
+    print("✅ ALL BATCH RISK TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_risk_batch()
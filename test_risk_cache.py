@@ -0,0 +1,67 @@
+"""
+Test suite for the risk prediction cache
+
+Tests:
+1. Repeat inputs are served from the cache
+2. Inputs that quantize to the same key share an entry
+3. The cache is bounded and evicts least recently used entries
+4. Installing a new model invalidates cached predictions
+"""
+
+from risk_model import RiskAssessmentModel, PredictionCache
+
+def test_risk_cache():
+    print("\n" + "="*70)
+    print("TESTING RISK PREDICTION CACHE")
+    print("="*70)
+
+    model = RiskAssessmentModel()
+    if not model.is_trained:
+        print("   No trained model available, skipping")
+        return
+
+    # ========== TEST 1: Hits and misses ==========
+    print("\n✅ Test 1 - Hits and misses:")
+    first = model.predict_risk(66.67, 2, 200)
+    second = model.predict_risk(66.67, 2, 200)
+    stats = model.cache.stats()
+    assert first == second
+    assert stats['hits'] == 1 and stats['misses'] == 1
+    print(f"   Stats: {stats}")
+
+    # ========== TEST 2: Quantized keys ==========
+    print("\n✅ Test 2 - Quantized keys:")
+    model.predict_risk(200 / 3, 2.0, 200.2)
+    assert model.cache.stats()['hits'] == 2
+    print(f"   66.666..., 200.2s reused the 66.67, 200s entry")
+
+    # ========== TEST 3: Bounded LRU ==========
+    print("\n✅ Test 3 - LRU eviction:")
+    cache = PredictionCache(maxsize=2)
+    cache.put(cache.key(10, 1, 60), {'risk_score': 1.0}, cache.generation)
+    cache.put(cache.key(20, 1, 60), {'risk_score': 2.0}, cache.generation)
+    cache.get(cache.key(10, 1, 60))
+    cache.put(cache.key(30, 1, 60), {'risk_score': 3.0}, cache.generation)
+    assert cache.get(cache.key(20, 1, 60)) is None, "Least recently used entry should be evicted"
+    assert cache.get(cache.key(10, 1, 60)) is not None
+    assert cache.stats()['evictions'] == 1
+    print(f"   Stats: {cache.stats()}")
+
+    # ========== TEST 4: Invalidation ==========
+    print("\n✅ Test 4 - Invalidation on model swap:")
+    generation = model.cache.generation
+    model._install(model.model, model.scaler)
+    assert model.cache.stats()['size'] == 0
+    stale = PredictionCache()
+    stale.invalidate()
+    stale.put(stale.key(10, 1, 60), {'risk_score': 1.0}, generation=0)
+    assert stale.stats()['size'] == 0, "Results from an older model must not be cached"
+    assert model.cache.generation == generation + 1
+    print("   Cache cleared when model was reinstalled")
+
+    print("\n" + "="*70)
+    print("✅ ALL RISK CACHE TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_risk_cache()
@@ -0,0 +1,132 @@
+"""
+Test suite for per-course risk models
+
+Tests:
+1. Courses with enough history get their own model; others keep the global one
+2. Single and batched predictions route each row to its course's model
+3. The course model cache stays within its memory budget
+4. Re-scoring tags rows with their course model's version
+"""
+
+import os
+import sqlite3
+import tempfile
+import numpy as np
+from sqlalchemy import create_engine
+from app import db, UserProgress, ProgressRiskVersion, ProgressRiskExplanation, LearnerStats
+from risk_artifact import ArtifactForest, load_artifact, lookup_tables
+from risk_model import RiskAssessmentModel
+from risk_scoring import rescore_progress
+
+def _insert_course(conn, course_id, n_learners, seed):
+    """Learners whose next score mirrors the last one, unlike the synthetic global data"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for learner in range(n_learners):
+        score = rng.uniform(0, 100)
+        for attempt in range(1, 7):
+            rows.append((1000 * course_id + learner, course_id, round(score, 2), attempt, rng.uniform(60, 600)))
+            score = float(np.clip(100 - score + rng.normal(0, 5), 0, 100))
+    conn.executemany("INSERT INTO user_progress (user_id, course_id, score, attempts, time_taken) "
+                     "VALUES (?, ?, ?, ?, ?)", rows)
+
+def test_course_models():
+    print("\n" + "="*70)
+    print("TESTING PER-COURSE RISK MODELS")
+    print("="*70)
+
+    work_dir = tempfile.mkdtemp()
+    model = RiskAssessmentModel()
+    model._install(None, None)
+    model.artifact_path = os.path.join(work_dir, 'models', 'risk_model.nlrm')
+    model.refresh_interval = 0
+    model.hyperparameters['n_estimators'] = 20
+    model.train_model()
+    assert model.model_version == 'v0001'
+
+    db_path = os.path.join(work_dir, 'database.db')
+    engine = create_engine(f"sqlite:///{db_path}")
+    db.metadata.create_all(engine, tables=[UserProgress.__table__, ProgressRiskVersion.__table__,
+                                           ProgressRiskExplanation.__table__, LearnerStats.__table__])
+    conn = sqlite3.connect(db_path)
+    _insert_course(conn, 1, 100, seed=1)
+    _insert_course(conn, 2, 5, seed=2)
+    _insert_course(conn, 3, 100, seed=3)
+    conn.commit()
+    conn.close()
+
+    # ========== TEST 1: Training ==========
+    print("\n✅ Test 1 - Per-course training:")
+    # Courses 1 and 3 have 600 attempts, of which 500 have a follow-up to label them
+    assert model.train_course_models(db_path, min_rows=501) == {}
+    results = model.train_course_models(db_path, min_rows=500)
+    assert results == {1: 'v0001', 3: 'v0001'}, results
+    assert model.course_model_versions() == {1: 'v0001', 3: 'v0001'}
+    meta = model.course_registry(1).describe()[0]['meta']
+    assert meta['course_id'] == 1 and meta['test_accuracy'] > meta['global_test_accuracy']
+    print(f"   Course 1: {meta['history_rows']} attempts, accuracy {meta['test_accuracy']} "
+          f"vs global {meta['global_test_accuracy']}; course 2 too small")
+
+    # ========== TEST 2: Routing ==========
+    print("\n✅ Test 2 - Predictions use the course model:")
+    own = model.predict_risk(90, 1, 200, course_id=1)
+    assert own['model_version'] == 'course-1/v0001' and own['method'] == 'machine_learning'
+    assert model.predict_risk(90, 1, 200, course_id=2) == model.predict_risk(90, 1, 200)
+    assert model.predict_risk(90, 1, 200)['model_version'] == 'v0001'
+    print(f"   Score 90: course 1 {own['risk_level']}, global {model.predict_risk(90, 1, 200)['risk_level']}")
+
+    rng = np.random.default_rng(0)
+    # Already quantized like the scalar path's prediction cache keys
+    X = np.column_stack([np.round(rng.uniform(0, 100, 300), 2), rng.integers(1, 6, 300),
+                         np.round(rng.uniform(60, 600, 300))])
+    course_ids = rng.choice([1, 2, 3, None], 300)
+    batch = model.predict_risk_batch(X, course_ids=course_ids)
+    assert batch['method'] == 'machine_learning'
+    for i in range(len(X)):
+        single = model.predict_risk(*X[i], course_id=course_ids[i])
+        assert single['risk_score'] == batch['risk_score'][i]
+        assert single['confidence'] == batch['confidence'][i]
+        assert single['model_version'] == batch['model_version'][i]
+    print(f"   300 mixed-course rows match single predictions")
+
+    # ========== TEST 3: Memory budget ==========
+    print("\n✅ Test 3 - LRU within memory budget:")
+    model.course_models.invalidate()
+    model.predict_risk(50, 2, 200, course_id=1)
+    one_model = model.course_models.stats()['bytes']
+    # Lookup tables count toward the budget, mapped or (for older artifacts) built in private memory
+    header, arrays = load_artifact(model.course_registry(1).path('v0001'))
+    legacy = {name: array for name, array in arrays.items() if name not in lookup_tables(arrays)}
+    assert one_model == ArtifactForest(legacy, header).nbytes == sum(array.nbytes for array in arrays.values())
+    model.course_models.max_bytes = int(one_model * 1.5)
+    for course_id in [1, 3, 1, 3]:
+        expected = model.course_registry(course_id).active_version()
+        assert model.predict_risk(50, 2, 200, course_id=course_id)['model_version'] == f"course-{course_id}/{expected}"
+        assert model.course_models.stats()['bytes'] <= model.course_models.max_bytes
+    stats = model.course_models.stats()
+    assert stats['models'] == 1 and stats['evictions'] >= 3
+    print(f"   Budget {model.course_models.max_bytes // 1024} KB: {stats['loads']} loads, "
+          f"{stats['evictions']} evictions, {stats['bytes'] // 1024} KB resident")
+    model.course_models.max_bytes = 64 * 1024 * 1024
+
+    # ========== TEST 4: Re-scoring ==========
+    print("\n✅ Test 4 - Rescore tags course model versions:")
+    stats = rescore_progress(model, engine, chunk_size=500, pause=0,
+                             checkpoint_path=os.path.join(work_dir, 'risk_rescore.json'))
+    assert stats['complete']
+    conn = sqlite3.connect(db_path)
+    tags = {course_id: versions for course_id, versions in conn.execute(
+        "SELECT p.course_id, GROUP_CONCAT(DISTINCT v.model_version) FROM user_progress AS p "
+        "LEFT JOIN progress_risk_version AS v ON v.progress_id = p.id GROUP BY p.course_id")}
+    conn.close()
+    assert tags == {1: 'course-1/v0001', 2: 'v0001', 3: 'course-3/v0001'}, tags
+    again = rescore_progress(model, engine, pause=0, checkpoint_path=None)
+    assert again['rescored'] == 0 and again['scanned'] == stats['scanned']
+    print(f"   {stats['rescored']} rows tagged: {tags}")
+
+    print("\n" + "="*70)
+    print("✅ ALL PER-COURSE RISK MODEL TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_course_models()
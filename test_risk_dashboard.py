@@ -156,6 +156,7 @@ with app.app_context():
     
     response = client.get("/risk_dashboard")
     print(f"   Status: {response.status_code}")
+    assert response.status_code == 200
     response_text = response.data.decode()
     
     # Test 3: Verify trainer names are displayed
@@ -203,6 +204,7 @@ with app.app_context():
     print(f"   Contains table headers: {'Trainee Name' in response_text and 'Course' in response_text}")
     print(f"   Contains Score column: {'📊 Score' in response_text}")
     print(f"   Contains Risk Score column: {'🎯 Risk Score' in response_text}")
+    assert '🎯 Risk Score' in response_text
     print(f"   Contains Risk Level column: {'⚠️ Risk Level' in response_text}")
 
 print("\n" + "="*60)
@@ -0,0 +1,164 @@
+"""
+Test suite for per-feature risk explanations
+
+Tests:
+1. Forest contributions add up to the expected risk, batch and single alike
+2. Rule-based and per-course scores are explained too
+3. Quiz submissions store the explanation with the score, replacing a stale one
+4. Both dashboards show explanations, backfilling only rows the current model scored
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+sys.path.insert(0, os.getcwd())
+
+from app import (app, db, User, Course, Quiz, Enrollment, UserProgress, ProgressRiskExplanation,
+                 ProgressRiskVersion, risk_model)
+from risk_artifact import load_artifact
+from risk_model import FEATURE_NAMES, RiskAssessmentModel, batch_explanations, batch_versions
+from temp_database import temporary_database
+from werkzeug.security import generate_password_hash
+
+def _expected_risk(model, X):
+    probabilities = model.model.predict_proba(model.scaler.transform(X))
+    return probabilities @ (np.asarray(model.model.classes_) / 3 * 100)
+
+def test_risk_explanations():
+    print("\n" + "="*70)
+    print("TESTING RISK EXPLANATIONS")
+    print("="*70)
+
+    work_dir = tempfile.mkdtemp()
+    model = RiskAssessmentModel()
+    model._install(None, None)
+    model.artifact_path = os.path.join(work_dir, 'models', 'risk_model.nlrm')
+    model.refresh_interval = 0
+    model.hyperparameters['n_estimators'] = 30
+    model.train_model()
+
+    # ========== TEST 1: Additivity ==========
+    print("\n✅ Test 1 - Contributions add up to the expected risk:")
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.uniform(0, 100, 2000), rng.integers(1, 6, 2000), rng.uniform(60, 600, 2000)])
+    batch = model.predict_risk_batch(X, explain=True)
+    assert batch['contributions'].shape == (2000, len(FEATURE_NAMES))
+    total = batch['baseline'] + batch['contributions'].sum(axis=1)
+    # Each of the four terms is rounded to 2 decimals
+    assert np.abs(total - _expected_risk(model, X)).max() <= 0.03
+    assert np.array_equal(batch['risk_score'], model.predict_risk_batch(X)['risk_score'])
+
+    # Single predictions are cached on the quantized features, explained or not
+    key = model.cache.key(*X[7])
+    quantized = model.predict_risk_batch([key], explain=True)
+    single = model.predict_risk(*X[7], explain=True)
+    assert single['explanation'] == batch_explanations(quantized)[0]
+    assert single['risk_score'] == quantized['risk_score'][0]
+    hits = model.cache.hits
+    plain = model.predict_risk(*X[7])
+    assert model.cache.hits == hits + 1 and 'explanation' not in plain
+    assert model.predict_risk(*X[7], explain=True) == single and model.cache.hits == hits + 2
+    struggling = model.predict_risk(20, 5, 550, explain=True)['explanation']
+    assert struggling['score'] > 0 and struggling['attempts'] > 0 and struggling['time_taken'] > 0
+    print(f"   Score 20, 5 attempts, 550s: {struggling}")
+
+    # ========== TEST 2: Rule-based and per-course ==========
+    print("\n✅ Test 2 - Rule-based and per-course explanations:")
+    rules = model._rule_based_risk_batch(X, explain=True)
+    assert np.array_equal(rules['baseline'] + rules['contributions'].sum(axis=1), rules['risk_score'])
+    assert RiskAssessmentModel._batch_row(rules, 0)['explanation']['baseline'] == 0.0
+
+    # The global model republished as a course model explains exactly as the global one does
+    _, arrays = load_artifact(model.registry.path(model.model_version), mmap=False)
+    model.course_registry(5).publish(arrays, {'course_id': 5})
+    course_ids = rng.choice([5, None], len(X))
+    mixed = model.predict_risk_batch(X, course_ids=course_ids, explain=True)
+    assert not np.isnan(mixed['contributions']).any()
+    assert np.allclose(mixed['contributions'], batch['contributions'])
+    assert model.predict_risk(*X[0], course_id=5, explain=True)['model_version'] == 'course-5/v0001'
+    print(f"   Rule points split per feature; {len(X)} mixed-course rows explained")
+
+    with temporary_database(), app.app_context():
+        emails = ["explain_trainer@test.com", "explain_student@test.com", "explain_admin@test.com"]
+
+        trainer = User(name="Explain Trainer", email=emails[0],
+                       password=generate_password_hash("password123"), role="trainer")
+        admin = User(name="Explain Admin", email=emails[2],
+                     password=generate_password_hash("password123"), role="admin")
+        db.session.add_all([trainer, admin])
+        db.session.commit()
+        student = User(name="Explain Student", email=emails[1],
+                       password=generate_password_hash("password123"), role="user", trainer_id=trainer.id)
+        course = Course(title="Explanation Course", description="Risk explanation test")
+        db.session.add_all([student, course])
+        db.session.commit()
+        db.session.add(Enrollment(user_id=student.id, course_id=course.id))
+        quizzes = [Quiz(course_id=course.id, trainer_id=trainer.id, question=f"Q{i}", correct_answer=f"a{i}")
+                   for i in range(4)]
+        db.session.add_all(quizzes)
+        db.session.commit()
+
+        # ========== TEST 3: Quiz submission ==========
+        print("\n✅ Test 3 - take_quiz stores the explanation with the score:")
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = student.id
+            sess["role"] = "user"
+        # Left behind by a deleted progress row whose id SQLite hands out again
+        next_id = (db.session.query(db.func.max(UserProgress.id)).scalar() or 0) + 1
+        db.session.add(ProgressRiskExplanation(progress_id=next_id, baseline=99.0, score_contribution=0.0,
+                                               attempts_contribution=0.0, time_contribution=0.0))
+        db.session.commit()
+        form = {f"answer_{q.id}": "wrong" for q in quizzes}
+        form.update(attempts=4, time_taken=500)
+        assert client.post(f"/take_quiz/{course.id}", data=form).status_code == 200
+
+        db.session.expire_all()
+        submitted = UserProgress.query.filter_by(user_id=student.id).one()
+        assert submitted.id == next_id and submitted.risk_score is not None
+        stored = db.session.get(ProgressRiskExplanation, submitted.id)
+        expected = risk_model.predict_risk(0.0, 4, 500.0, course_id=course.id, explain=True)['explanation']
+        assert stored.baseline == expected['baseline'] != 99.0
+        assert stored.score_contribution == expected['score']
+        print(f"   Scored {submitted.risk_score:.1f}: {stored.summary}")
+
+        # ========== TEST 4: Dashboards ==========
+        print("\n✅ Test 4 - Dashboards show explanations:")
+        # Scored before explanations existed: by an older model, before versions were kept, and by the current model
+        legacy = [UserProgress(user_id=student.id, course_id=course.id, score=float(s), attempts=2,
+                               time_taken=200.0, risk_score=50.0) for s in (90, 45, 30, 60)]
+        db.session.add_all(legacy)
+        db.session.commit()
+        current = batch_versions(risk_model.predict_risk_batch([[30, 2, 200]], course_ids=[course.id]))[0]
+        db.session.add(ProgressRiskVersion(progress_id=legacy[0].id, model_version="v0000-retired"))
+        db.session.add_all([ProgressRiskVersion(progress_id=p.id, model_version=current) for p in legacy[2:]])
+        db.session.commit()
+        legacy_ids = [p.id for p in legacy]
+
+        with client.session_transaction() as sess:
+            sess["user_id"] = admin.id
+            sess["role"] = "admin"
+        page = client.get("/risk_dashboard").data.decode()
+        backfilled = ProgressRiskExplanation.query.filter(
+            ProgressRiskExplanation.progress_id.in_(legacy_ids + [submitted.id])).all()
+        assert sorted(e.progress_id for e in backfilled) == sorted(legacy_ids[2:] + [submitted.id])
+        for explanation in backfilled:
+            assert explanation.summary in page
+        print(f"   Admin dashboard: {len(backfilled) - 1} rows scored by {current} backfilled; "
+              f"older and unversioned rows wait for the rescore")
+
+        with client.session_transaction() as sess:
+            sess["user_id"] = trainer.id
+            sess["role"] = "trainer"
+        page = client.get("/my_trainees").data.decode()
+        latest = db.session.get(ProgressRiskExplanation, max(legacy_ids))
+        assert "Latest risk" in page and latest.summary in page
+        print(f"   Trainer view: latest attempt {latest.summary}")
+
+    print("\n" + "="*70)
+    print("✅ ALL RISK EXPLANATION TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_risk_explanations()
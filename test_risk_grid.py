@@ -0,0 +1,103 @@
+"""
+Test suite for the dense risk lookup grid
+
+Tests:
+1. Compiling a grid stores uint8 arrays next to the model and reports disagreement
+2. Grid points reproduce the forest; out-of-grid rows fall back to the forest
+3. Other workers map the grid; stale grids are ignored and pruned with their version
+"""
+
+import os
+import tempfile
+import numpy as np
+from risk_grid import grid_path, load_grid
+from risk_model import RiskAssessmentModel
+
+# Small grid keeps the test fast; same layout as the default
+AXES = {'score': (0.0, 2.0, 51), 'attempts': (1.0, 1.0, 6), 'time_taken': (0.0, 20.0, 46)}
+
+def test_risk_grid():
+    print("\n" + "="*70)
+    print("TESTING RISK LOOKUP GRID")
+    print("="*70)
+
+    tmp_dir = tempfile.mkdtemp()
+    model = RiskAssessmentModel()
+    model._install(None, None)
+    model.artifact_path = os.path.join(tmp_dir, 'risk_model.nlrm')
+    model.hyperparameters['n_estimators'] = 20
+    model.train_model()
+
+    # ========== TEST 1: Compile ==========
+    print("\n✅ Test 1 - Compile grid:")
+    info = model.compile_grid(AXES, validate_samples=20000)
+    path = grid_path(model.registry.path(model.model_version))
+    assert os.path.exists(path)
+    assert model.grid.category.dtype == np.uint8 and model.grid.confidence.dtype == np.uint8
+    assert model.grid.category.shape == (51, 6, 46)
+    assert not model.grid.category.flags.writeable, "Grid should be a read-only mapping"
+    report = info['disagreement']
+    assert report['samples'] == 20000 and report['in_grid'] == 20000
+    assert 0 <= report['category_mismatch_rate'] < 0.2
+    assert report['max_confidence_diff'] >= report['p99_confidence_diff']
+    print(f"   {info['cells']} cells, {info['nbytes']} bytes")
+    print(f"   Disagreement: {report}")
+
+    # ========== TEST 2: Lookups ==========
+    print("\n✅ Test 2 - Grid lookups:")
+    grid_points = np.array([[50.0, 2, 200], [10.0, 5, 600], [88.0, 1, 60], [34.0, 3, 900]])
+    forest_probabilities = model.model.predict_proba(model.scaler.transform(grid_points))
+    batch = model.predict_risk_batch(grid_points)
+    assert 'probabilities' not in batch
+    assert np.array_equal(batch['risk_score'], np.round(forest_probabilities.argmax(axis=1) / 3 * 100, 2))
+    assert np.allclose(batch['confidence'], forest_probabilities.max(axis=1) * 100, atol=0.5)
+    for i, row in enumerate(grid_points):
+        single = model.predict_risk(*row)
+        assert single['risk_level'] == batch['risk_level'][i]
+        assert single['confidence'] == batch['confidence'][i]
+        assert single['method'] == 'machine_learning'
+    print("   Grid points match the forest; single and batch agree")
+
+    outside = np.array([[50.0, 25, 200], [50.0, 2, 5000], [np.nan, 2, 200]])
+    batch = model.predict_risk_batch(outside)
+    forest_probabilities = model.model.predict_proba(model.scaler.transform(outside))
+    assert np.allclose(batch['confidence'], np.round(forest_probabilities.max(axis=1) * 100, 2))
+    assert model.predict_risk(50.0, 25, 200)['confidence'] == batch['confidence'][0]
+    print("   Out-of-grid rows scored by the forest")
+
+    # ========== TEST 3: Sharing, staleness, pruning ==========
+    print("\n✅ Test 3 - Workers, stale grids and pruning:")
+    worker = RiskAssessmentModel()
+    worker.artifact_path = model.artifact_path
+    worker._load_model()
+    assert worker.grid is not None and worker.grid.shape == model.grid.shape
+    assert worker.get_model_info()['lookup_grid']['disagreement'] == report
+
+    compiled_version = model.model_version
+    model.train_model(n_samples=800)
+    assert model.grid is None, "A new model must not reuse the old grid"
+    os.link(path, grid_path(model.registry.path(model.model_version)))
+    assert load_grid(grid_path(model.registry.path(model.model_version)),
+                     'not-this-model') is None
+    fresh = RiskAssessmentModel()
+    fresh.artifact_path = model.artifact_path
+    fresh._load_model()
+    assert fresh.model_version == model.model_version and fresh.grid is None
+    print("   Grid from another model version ignored")
+
+    os.remove(grid_path(model.registry.path(model.model_version)))
+    model.compile_grid(AXES, validate_samples=1000)
+    fresh.refresh()
+    assert fresh.grid is not None, "Running worker should pick up a newly compiled grid"
+    print("   Running worker picked up the compiled grid")
+
+    model.registry.prune(keep=1)
+    assert not os.path.exists(path), f"Grid for pruned {compiled_version} should be removed"
+    print("   Pruning removed the old version's grid")
+
+    print("\n" + "="*70)
+    print("✅ ALL LOOKUP GRID TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_risk_grid()
@@ -0,0 +1,104 @@
+"""
+Test suite for training the risk model on UserProgress history
+
+Tests:
+1. Attempts are paired with follow-ups and labeled from the outcome
+2. A full build trains from streamed chunks and stores a checkpoint
+3. An incremental update only consumes attempts after the checkpoint
+4. The forest is capped at max_trees
+"""
+
+import os
+import sqlite3
+import tempfile
+import numpy as np
+from risk_model import RiskAssessmentModel, _outcome_labels
+
+def _create_history(db_path, n_users, attempts_per_user, start_user=0, seed=0):
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_progress (
+            id INTEGER PRIMARY KEY, user_id INTEGER, course_id INTEGER,
+            score REAL, attempts INTEGER, time_taken REAL, risk_score REAL
+        )
+    """)
+    rows = []
+    for user_id in range(start_user, start_user + n_users):
+        ability = rng.uniform(20, 95)
+        for attempt in range(1, attempts_per_user + 1):
+            score = float(np.clip(ability + rng.normal(0, 10) + 3 * attempt, 0, 100))
+            rows.append((user_id, 1, score, attempt, float(rng.uniform(60, 600)), None))
+    conn.executemany(
+        "INSERT INTO user_progress (user_id, course_id, score, attempts, time_taken, risk_score) "
+        "VALUES (?, ?, ?, ?, ?, ?)", rows
+    )
+    conn.commit()
+    conn.close()
+
+def test_risk_history():
+    print("\n" + "="*70)
+    print("TESTING RISK MODEL HISTORY TRAINING")
+    print("="*70)
+
+    tmp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(tmp_dir, 'history.db')
+    _create_history(db_path, n_users=200, attempts_per_user=6)
+
+    model = RiskAssessmentModel()
+    model._install(None, None)
+    model.artifact_path = os.path.join(tmp_dir, 'risk_model.nlrm')
+
+    # ========== TEST 1: Pairing and labels ==========
+    print("\n✅ Test 1 - Follow-up pairing:")
+    labels = _outcome_labels(np.array([40, 40, 40, 40]), np.array([80, 60, 45, 30]))
+    assert labels.tolist() == [0, 1, 2, 3]
+    chunks = list(model.iter_progress_history(db_path, chunk_size=300))
+    pairs = sum(len(y) for _, y, _ in chunks)
+    assert pairs == 200 * 5, "Every attempt but each learner's last has a follow-up"
+    assert all(len(y) <= 300 for _, y, _ in chunks)
+    print(f"   {pairs} labeled pairs in {len(chunks)} chunks")
+
+    # ========== TEST 2: Full build ==========
+    print("\n✅ Test 2 - Full build from history:")
+    assert model.train_from_history(db_path, incremental=False, chunk_size=300, trees_per_chunk=5)
+    meta = model.model.meta
+    assert meta['history_rows'] == pairs
+    assert model.model.n_estimators == 5 * len(chunks)
+    assert model.predict_risk(30, 4, 500)['method'] == 'machine_learning'
+    print(f"   {model.model.n_estimators} trees, checkpoint id {meta['last_progress_id']}")
+
+    # ========== TEST 3: Incremental update ==========
+    print("\n✅ Test 3 - Incremental update:")
+    assert not model.train_from_history(db_path, chunk_size=300), "Nothing new to learn"
+    _create_history(db_path, n_users=50, attempts_per_user=4, start_user=1000, seed=1)
+    trees_before = model.model.n_estimators
+    assert model.train_from_history(db_path, chunk_size=300, trees_per_chunk=5)
+    assert model.model.meta['history_rows'] == pairs + 50 * 3
+    assert model.model.n_estimators == trees_before + 5
+    reloaded = RiskAssessmentModel()
+    reloaded.artifact_path = model.artifact_path
+    reloaded._load_model()
+    assert reloaded.model.meta['last_progress_id'] == model.model.meta['last_progress_id']
+    print(f"   Added 150 pairs, {model.model.n_estimators} trees")
+
+    # ========== TEST 4: Tree cap ==========
+    print("\n✅ Test 4 - max_trees cap:")
+    assert model.train_from_history(db_path, incremental=False, chunk_size=100,
+                                    trees_per_chunk=5, max_trees=20)
+    assert model.model.n_estimators == 20
+
+    # Chunk forests follow the tuned hyperparameters
+    model.hyperparameters['max_depth'] = 3
+    assert model.train_from_history(db_path, incremental=False, chunk_size=300, trees_per_chunk=5)
+    assert model.model.max_depth <= 3 and model.model.meta['hyperparameters']['max_depth'] == 3
+    X = np.array([[30, 4, 500], [90, 1, 100]])
+    assert model.predict_risk_batch(X)['probabilities'].shape == (2, 4)
+    print(f"   Capped at {model.model.n_estimators} trees")
+
+    print("\n" + "="*70)
+    print("✅ ALL HISTORY TRAINING TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_risk_history()
@@ -0,0 +1,70 @@
+"""
+Test suite for the NumPy forest evaluator
+
+Tests:
+1. Importing risk_model and scoring does not import sklearn
+2. ArtifactForest matches sklearn predict_proba/predict for single rows and batches
+3. Chunk boundaries do not change results
+"""
+
+import subprocess
+import sys
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from risk_artifact import ArtifactForest, ArtifactScaler, export_forest
+
+def test_risk_inference():
+    print("\n" + "="*70)
+    print("TESTING NUMPY FOREST INFERENCE")
+    print("="*70)
+
+    # ========== TEST 1: No sklearn at runtime ==========
+    print("\n✅ Test 1 - Scoring without sklearn:")
+    code = (
+        "import sys, risk_model\n"
+        "risk_model.risk_model.predict_risk(55, 2, 200)\n"
+        "print('sklearn' in sys.modules)\n"
+    )
+    env_output = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, text=True,
+        env={'RISK_MODEL_TRAINING_MODE': 'off', 'PATH': ''}
+    )
+    assert env_output.stdout.strip() == 'False', env_output.stdout + env_output.stderr
+    print("   sklearn not imported by risk_model")
+
+    # ========== TEST 2: Matches sklearn ==========
+    print("\n✅ Test 2 - Matches sklearn:")
+    rng = np.random.default_rng(3)
+    X = np.column_stack([rng.uniform(0, 100, 3000), rng.poisson(2, 3000) + 1, rng.uniform(60, 660, 3000)])
+    y = np.digitize(40 * (X[:, 0] < 50) + 30 * (X[:, 1] > 3) + 30 * (X[:, 2] > 300)
+                    + rng.normal(0, 5, 3000), [25, 50, 75])
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42).fit(scaler.transform(X), y)
+
+    arrays = export_forest(model, scaler)
+    forest, artifact_scaler = ArtifactForest(arrays), ArtifactScaler(arrays)
+
+    test_X = np.column_stack([rng.uniform(-10, 110, 10000), rng.integers(0, 9, 10000), rng.uniform(0, 900, 10000)])
+    expected = model.predict_proba(scaler.transform(test_X))
+    actual = forest.predict_proba(artifact_scaler.transform(test_X))
+    assert np.allclose(expected, actual, atol=1e-12)
+    assert np.array_equal(model.predict(scaler.transform(test_X)), forest.predict(artifact_scaler.transform(test_X)))
+
+    single = forest.predict_proba(artifact_scaler.transform(test_X[:1]))
+    assert np.allclose(single, expected[:1], atol=1e-12)
+    print(f"   {len(test_X)} rows match, max abs diff {np.abs(expected - actual).max():.2e}")
+
+    # ========== TEST 3: Chunking ==========
+    print("\n✅ Test 3 - Chunk boundaries:")
+    forest.chunk_rows = 7
+    chunked = forest.predict_proba(artifact_scaler.transform(test_X[:100]))
+    assert np.allclose(chunked, actual[:100])
+    print("   Results independent of chunk size")
+
+    print("\n" + "="*70)
+    print("✅ ALL NUMPY INFERENCE TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_risk_inference()
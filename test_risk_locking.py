@@ -0,0 +1,86 @@
+"""
+Test suite for cross-process risk model training
+
+Tests:
+1. The training lock excludes other processes and is re-entrant within one
+2. Workers starting together train once; the rest load the published model
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from risk_registry import FileLock, ModelRegistry
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HOLD_LOCK = """
+import sys
+from risk_registry import FileLock
+lock = FileLock(sys.argv[1])
+lock.acquire()
+print('locked', flush=True)
+sys.stdin.read()
+"""
+
+WORKER = """
+import json, risk_model
+m = risk_model.risk_model
+print(json.dumps({'version': m.model_version, 'state': m.training_state,
+                  'method': m.predict_risk(40, 4, 400)['method']}))
+"""
+
+def _env(**overrides):
+    return dict(os.environ, PYTHONPATH=REPO_DIR, **overrides)
+
+def test_risk_locking():
+    print("\n" + "="*70)
+    print("TESTING CROSS-PROCESS RISK MODEL TRAINING")
+    print("="*70)
+
+    # ========== TEST 1: File lock ==========
+    print("\n✅ Test 1 - Training lock:")
+    lock_path = os.path.join(tempfile.mkdtemp(), 'registry', '.training.lock')
+    holder = subprocess.Popen([sys.executable, '-c', HOLD_LOCK, lock_path],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=_env())
+    try:
+        assert holder.stdout.readline().strip() == 'locked'
+        lock = FileLock(lock_path)
+        assert not lock.acquire(blocking=False), "Lock held by another process"
+        print("   Second process blocked while the first holds the lock")
+    finally:
+        holder.stdin.close()
+        holder.wait(timeout=30)
+
+    assert lock.acquire(blocking=False), "Lock released when its holder exits"
+    assert lock.acquire(blocking=False), "Re-entrant within the holding thread"
+    lock.release()
+    lock.release()
+    print("   Acquired after release; re-entrant in the same thread")
+
+    # ========== TEST 2: Concurrent startup ==========
+    print("\n✅ Test 2 - Concurrent worker startup:")
+    work_dir = tempfile.mkdtemp()
+    workers = [
+        subprocess.Popen([sys.executable, '-c', WORKER], cwd=work_dir, stdout=subprocess.PIPE,
+                         stderr=subprocess.DEVNULL, text=True, env=_env(RISK_MODEL_TRAINING_MODE='blocking'))
+        for _ in range(4)
+    ]
+    results = [json.loads(worker.communicate(timeout=300)[0].strip().splitlines()[-1]) for worker in workers]
+    for result in results:
+        print(f"   {result}")
+
+    registry = ModelRegistry(os.path.join(work_dir, 'models', 'registry'))
+    assert registry.versions() == ['v0001'], f"Expected a single training run, got {registry.versions()}"
+    assert {r['version'] for r in results} == {'v0001'}
+    assert [r['state'] for r in results].count('trained') == 1
+    assert all(r['method'] == 'machine_learning' for r in results)
+    print("   One worker trained, the others loaded its model")
+
+    print("\n" + "="*70)
+    print("✅ ALL CROSS-PROCESS TRAINING TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_risk_locking()
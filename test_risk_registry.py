@@ -0,0 +1,84 @@
+"""
+Test suite for the risk model registry
+
+Tests:
+1. Publishing creates numbered versions with their metrics
+2. A running worker picks up a newly activated version without restarting
+3. Rollback restores the previously active version
+4. Pruning keeps recent versions and never removes the active one
+"""
+
+import os
+import tempfile
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from risk_artifact import export_forest
+from risk_model import RiskAssessmentModel
+
+def _arrays(n_estimators, seed):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.uniform(0, 100, 400), rng.integers(1, 6, 400), rng.uniform(60, 660, 400)])
+    y = (X[:, 0] < 50).astype(int) + (X[:, 1] > 3) + (X[:, 2] > 300)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=5, random_state=seed)
+    return export_forest(model.fit(scaler.transform(X), y), scaler, classes=range(4))
+
+def _worker(models_dir):
+    worker = RiskAssessmentModel()
+    worker._install(None, None)
+    worker.artifact_path = os.path.join(models_dir, 'risk_model.nlrm')
+    worker.refresh_interval = 0
+    worker._load_model()
+    return worker
+
+def test_risk_registry():
+    print("\n" + "="*70)
+    print("TESTING RISK MODEL REGISTRY")
+    print("="*70)
+
+    models_dir = tempfile.mkdtemp()
+    trainer = _worker(models_dir)
+    registry = trainer.registry
+
+    # ========== TEST 1: Publish ==========
+    print("\n✅ Test 1 - Versioned publish:")
+    trainer._publish(_arrays(5, 1), {'test_accuracy': 0.81})
+    trainer._publish(_arrays(7, 2), {'test_accuracy': 0.84})
+    assert registry.versions() == ['v0001', 'v0002']
+    assert registry.active_version() == 'v0002' == trainer.model_version
+    entries = registry.describe()
+    assert entries[0]['meta']['test_accuracy'] == 0.81 and entries[1]['active']
+    print(f"   Versions: {[(e['version'], e['meta']['test_accuracy']) for e in entries]}")
+
+    # ========== TEST 2: Hot swap ==========
+    print("\n✅ Test 2 - Hot swap in a running worker:")
+    worker = _worker(models_dir)
+    assert worker.model_version == 'v0002' and worker.model.n_estimators == 7
+    version = registry.publish(_arrays(9, 3), {'test_accuracy': 0.86})
+    assert worker.predict_risk(40, 4, 400)['method'] == 'machine_learning'
+    assert worker.model_version == version and worker.model.n_estimators == 9
+    print(f"   Worker now serving {worker.model_version} without restart")
+
+    # ========== TEST 3: Rollback ==========
+    print("\n✅ Test 3 - Rollback:")
+    assert registry.rollback() == 'v0002'
+    worker.predict_risk_batch([[40, 4, 400]])
+    assert worker.model_version == 'v0002'
+    assert registry.rollback() == 'v0001'
+    assert registry.rollback() is None, "Nothing older to roll back to"
+    print(f"   Active now {registry.active_version()}")
+
+    # ========== TEST 4: Prune ==========
+    print("\n✅ Test 4 - Prune:")
+    removed = registry.prune(keep=1)
+    assert 'v0001' not in removed and registry.active_version() == 'v0001'
+    assert set(registry.versions()) == {'v0001', 'v0003'}
+    print(f"   Removed {removed}, kept {registry.versions()}")
+
+    print("\n" + "="*70)
+    print("✅ ALL REGISTRY TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_risk_registry()
@@ -0,0 +1,114 @@
+"""
+Test suite for the nightly risk re-scoring job
+
+Tests:
+1. Every stale row is rescored in chunks and tagged with the model version
+2. An interrupted run resumes from its checkpoint without redoing work
+3. Activating a new model version makes every row stale again
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import numpy as np
+from sqlalchemy import create_engine
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from app import db, UserProgress, ProgressRiskVersion, ProgressRiskExplanation, LearnerStats
+from risk_artifact import export_forest
+from risk_model import RiskAssessmentModel
+from risk_scoring import rescore_progress
+
+def _arrays(n_estimators, seed):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.uniform(0, 100, 400), rng.integers(1, 6, 400), rng.uniform(60, 660, 400)])
+    y = (X[:, 0] < 50).astype(int) + (X[:, 1] > 3) + (X[:, 2] > 300)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=5, random_state=seed)
+    return export_forest(model.fit(scaler.transform(X), y), scaler, classes=range(4))
+
+def _versions(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT p.id, p.risk_score, v.model_version FROM user_progress AS p "
+                        "LEFT JOIN progress_risk_version AS v ON v.progress_id = p.id ORDER BY p.id").fetchall()
+    conn.close()
+    return rows
+
+def test_risk_rescore():
+    print("\n" + "="*70)
+    print("TESTING RISK RE-SCORING JOB")
+    print("="*70)
+
+    work_dir = tempfile.mkdtemp()
+    model = RiskAssessmentModel()
+    model._install(None, None)
+    model.artifact_path = os.path.join(work_dir, 'models', 'risk_model.nlrm')
+    model.refresh_interval = 0
+    model._publish(_arrays(10, 1), {})
+    assert model.model_version == 'v0001'
+
+    db_path = os.path.join(work_dir, 'database.db')
+    engine = create_engine(f"sqlite:///{db_path}")
+    db.metadata.create_all(engine, tables=[UserProgress.__table__, ProgressRiskVersion.__table__,
+                                           ProgressRiskExplanation.__table__, LearnerStats.__table__])
+    conn = sqlite3.connect(db_path)
+    rng = np.random.default_rng(0)
+    n = 5000
+    X = np.column_stack([np.round(rng.uniform(0, 100, n), 2), rng.integers(1, 6, n), rng.uniform(60, 660, n)])
+    conn.executemany("INSERT INTO user_progress (user_id, course_id, score, attempts, time_taken, risk_score) "
+                     "VALUES (?, ?, ?, ?, ?, ?)",
+                     [(i % 50, 1, float(s), int(a), float(t), -1.0) for i, (s, a, t) in enumerate(X)])
+    # A handful already scored by this model must be left alone
+    conn.executemany("INSERT INTO progress_risk_version VALUES (?, 'v0001', NULL)", [(i,) for i in range(1, 11)])
+    conn.commit()
+    conn.close()
+    with engine.begin() as conn:
+        conn.execute(LearnerStats.__table__.insert(), [{'user_id': u, 'course_id': 1} for u in range(50)])
+
+    checkpoint_path = os.path.join(work_dir, 'risk_rescore.json')
+
+    # ========== TEST 1 and 2: Interrupted run, then resume ==========
+    print("\n✅ Test 1 - Chunked rescore, interrupted:")
+    first = rescore_progress(model, engine, chunk_size=700, pause=0,
+                             checkpoint_path=checkpoint_path, max_rows=2000)
+    assert first['rescored'] == 2000 and not first['complete'] and first['chunks'] == 3
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    assert checkpoint['model_version'] == 'v0001' and checkpoint['last_id'] == 2010
+    print(f"   Stopped after {first['rescored']} rows, checkpoint at id {checkpoint['last_id']}")
+
+    print("\n✅ Test 2 - Resume from checkpoint:")
+    second = rescore_progress(model, engine, chunk_size=700, pause=0, checkpoint_path=checkpoint_path)
+    assert second['complete'] and second['resumed_from'] == 2010
+    assert first['rescored'] + second['rescored'] == n - 10
+
+    rows = _versions(db_path)
+    assert all(version == 'v0001' for _, _, version in rows)
+    assert all(score == -1.0 for _, score, _ in rows[:10]), "Rows already on this version were rewritten"
+    expected = model.predict_risk_batch(X[10:])['risk_score']
+    assert np.array_equal([score for _, score, _ in rows[10:]], expected)
+    conn = sqlite3.connect(db_path)
+    last_risk = dict(conn.execute("SELECT user_id, last_risk_score FROM learner_stats").fetchall())
+    conn.close()
+    assert last_risk[49] == rows[-1][1], "Latest attempt's score should reach learner_stats"
+    print(f"   Resumed after id {second['resumed_from']}; all {n} rows on v0001")
+
+    # ========== TEST 3: New model version ==========
+    print("\n✅ Test 3 - New active version rescores everything:")
+    model.registry.publish(_arrays(15, 2), {})
+    third = rescore_progress(model, engine, chunk_size=1000, pause=0, checkpoint_path=checkpoint_path)
+    assert third['model_version'] == 'v0002' and third['resumed_from'] == 0
+    assert third['complete'] and third['rescored'] == n
+    rows = _versions(db_path)
+    assert all(version == 'v0002' for _, _, version in rows)
+    assert np.array_equal([score for _, score, _ in rows], model.predict_risk_batch(X)['risk_score'])
+    assert rescore_progress(model, engine, pause=0, checkpoint_path=checkpoint_path)['rescored'] == 0
+    print(f"   {third['rescored']} rows moved to v0002 in {third['seconds']}s")
+
+    print("\n" + "="*70)
+    print("✅ ALL RISK RE-SCORING TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_risk_rescore()
@@ -0,0 +1,105 @@
+"""
+Test suite for the shared risk inference process
+
+Tests:
+1. Predictions over the socket match scoring in-process
+2. Concurrent requests from many workers are micro-batched
+3. Remote-mode workers hold no model and fall back to rule-based when the server is down
+"""
+
+import os
+import tempfile
+import threading
+import numpy as np
+from risk_model import RiskAssessmentModel
+from risk_server import RiskInferenceClient, RiskInferenceServer
+
+def _remote_worker(socket_path):
+    previous = {key: os.environ.get(key) for key in ('RISK_INFERENCE_MODE', 'RISK_INFERENCE_SOCKET')}
+    os.environ.update(RISK_INFERENCE_MODE='remote', RISK_INFERENCE_SOCKET=socket_path)
+    try:
+        return RiskAssessmentModel()
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+def test_risk_server():
+    print("\n" + "="*70)
+    print("TESTING RISK INFERENCE SERVER")
+    print("="*70)
+
+    tmp_dir = tempfile.mkdtemp()
+    model = RiskAssessmentModel()
+    model._install(None, None)
+    model.artifact_path = os.path.join(tmp_dir, 'risk_model.nlrm')
+    model.hyperparameters['n_estimators'] = 20
+    model.train_model()
+
+    socket_path = os.path.join(tmp_dir, 'risk.sock')
+    server = RiskInferenceServer(model, socket_path, max_batch=256, max_wait=0.005)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # ========== TEST 1: Socket predictions ==========
+    print("\n✅ Test 1 - Predictions over the socket:")
+    client = RiskInferenceClient(socket_path)
+    X = np.array([[40, 4, 400], [90, 1, 100], [65.5, 2, 250]])
+    remote, local = client.predict_batch(X), model.predict_risk_batch(X)
+    assert remote['method'] == local['method'] == 'machine_learning'
+    assert np.array_equal(remote['risk_score'], local['risk_score'])
+    assert np.array_equal(remote['confidence'], local['confidence'])
+    assert list(remote['risk_level']) == list(local['risk_level'])
+    print(f"   {list(remote['risk_level'])} match in-process scoring")
+
+    # ========== TEST 2: Micro-batching ==========
+    print("\n✅ Test 2 - Concurrent workers are micro-batched:")
+    rng = np.random.default_rng(0)
+    rows = np.column_stack([rng.uniform(0, 100, 320), rng.integers(1, 6, 320), rng.uniform(60, 660, 320)])
+    expected = model.predict_risk_batch(rows)
+    errors = []
+
+    def worker(indices):
+        for i in indices:
+            result = client.predict_batch(rows[i:i + 1])
+            if result['risk_score'][0] != expected['risk_score'][i]:
+                errors.append(i)
+
+    before = client.stats()['batching']
+    threads = [threading.Thread(target=worker, args=(range(k, 320, 16),)) for k in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = client.stats()['batching']
+    requests, batches = stats['requests'] - before['requests'], stats['batches'] - before['batches']
+    print(f"   {requests} requests in {batches} batches")
+    assert not errors, f"Wrong results for rows {errors}"
+    assert requests == 320
+    assert batches < requests, "Concurrent requests should share batches"
+
+    # ========== TEST 3: Remote workers and fallback ==========
+    print("\n✅ Test 3 - Remote-mode worker and fallback:")
+    web_worker = _remote_worker(socket_path)
+    assert web_worker.model is None and web_worker.get_model_info()['inference_mode'] == 'remote'
+    result = web_worker.predict_risk(40, 4, 400)
+    assert result['method'] == 'machine_learning'
+    assert result['risk_score'] == model.predict_risk(40, 4, 400)['risk_score']
+    assert web_worker.predict_risk_batch(X)['method'] == 'machine_learning'
+    print(f"   Remote prediction: {result['risk_level']} ({result['confidence']}%)")
+
+    server.shutdown()
+    server.server_close()
+    assert not os.path.exists(socket_path)
+    result = web_worker.predict_risk(40, 4, 400)
+    assert result == web_worker._rule_based_risk(40, 4, 400)
+    assert web_worker.predict_risk_batch(X)['method'] == 'rule_based'
+    print(f"   Server down, fell back to: {result['method']}")
+
+    print("\n" + "="*70)
+    print("✅ ALL RISK INFERENCE SERVER TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_risk_server()
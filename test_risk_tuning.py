@@ -0,0 +1,65 @@
+"""
+Test suite for risk model hyperparameter tuning
+
+Tests:
+1. Every grid candidate is cross-validated in the process pool
+2. Results report accuracy, size and latency, best first
+3. A latency budget excludes slow candidates
+4. Applying the best candidate installs it and updates hyperparameters
+"""
+
+import os
+import tempfile
+from risk_model import RiskAssessmentModel
+
+GRID = {'n_estimators': [5, 20], 'max_depth': [4, 8]}
+
+def test_risk_tuning():
+    print("\n" + "="*70)
+    print("TESTING RISK MODEL TUNING")
+    print("="*70)
+
+    model = RiskAssessmentModel()
+    model._install(None, None)
+    model.artifact_path = os.path.join(tempfile.mkdtemp(), 'risk_model.nlrm')
+
+    # ========== TEST 1: Grid search ==========
+    print("\n✅ Test 1 - Parallel grid search:")
+    report = model.tune_model(GRID, cv=3, n_samples=600, n_jobs=2)
+    assert len(report['results']) == 4
+    print(f"   {len(report['results'])} candidates in {report['search_seconds']}s")
+
+    # ========== TEST 2: Report contents ==========
+    print("\n✅ Test 2 - Accuracy, size and latency:")
+    for result in report['results']:
+        for key in ('cv_accuracy', 'model_bytes', 'n_nodes', 'single_p50_us', 'single_p99_us', 'batch_per_row_us'):
+            assert key in result, f"Missing {key}"
+        print(f"   {result['params']}: acc={result['cv_accuracy']} bytes={result['model_bytes']} "
+              f"p99={result['single_p99_us']}us")
+    accuracies = [r['cv_accuracy'] for r in report['results']]
+    assert accuracies == sorted(accuracies, reverse=True)
+    assert report['best'] is report['results'][0]
+
+    # ========== TEST 3: Latency budget ==========
+    print("\n✅ Test 3 - Latency budget:")
+    budget = min(r['single_p99_us'] for r in report['results'])
+    report = model.tune_model(GRID, n_iter=2, cv=3, n_samples=600, n_jobs=2, max_latency_us=0.001)
+    assert len(report['results']) == 2
+    assert report['best'] is None
+    print(f"   Impossible budget selects nothing (fastest p99 was {budget}us)")
+
+    # ========== TEST 4: Apply ==========
+    print("\n✅ Test 4 - Apply best candidate:")
+    report = model.tune_model(GRID, cv=3, n_samples=600, n_jobs=2, apply=True)
+    assert model.is_trained
+    assert model.model.n_estimators == report['best']['params']['n_estimators']
+    assert model.hyperparameters['max_depth'] == report['best']['params']['max_depth']
+    assert model.registry.active_version() == model.model_version
+    print(f"   Installed {report['best']['params']}")
+
+    print("\n" + "="*70)
+    print("✅ ALL TUNING TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_risk_tuning()
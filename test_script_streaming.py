@@ -0,0 +1,143 @@
+"""
+Test suite for streamed AI lesson generation
+
+Tests:
+1. enhance_script_stream yields pieces that join to enhance_script's lesson
+2. Cached and fallback lessons stream too
+3. The stream route sends its first byte before the model finishes
+4. The Script row is saved once the stream completes
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+sys.path.insert(0, os.getcwd())
+
+import ai_engine as ai
+from app import app, db, User, Course, Script
+from llm_cache import LLMCache
+from temp_database import temporary_database
+from werkzeug.security import generate_password_hash
+
+LESSON_PIECES = ["\n  ", "Introduction", ": fractions ", "are parts", " of a whole.", "\n\nPractice", "!", "  \n"]
+
+class FakeChatCompletion:
+    """Stands in for the OpenAI API; streams LESSON_PIECES with a delay before each"""
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def _chunks(self):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(role="assistant"))])
+        for piece in LESSON_PIECES:
+            time.sleep(self.delay)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace())])
+
+    def create(self, stream=False, **kwargs):
+        self.calls += 1
+        if stream:
+            return self._chunks()
+        content = "".join(LESSON_PIECES)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def _events(body):
+    """Parse a server-sent event stream into (event, data) pairs"""
+    events = []
+    for block in body.split("\n\n"):
+        lines = [line for line in block.split("\n") if line and not line.startswith(":")]
+        if lines:
+            event = next((line[7:] for line in lines if line.startswith("event: ")), "message")
+            events.append((event, json.loads("".join(line[6:] for line in lines if line.startswith("data: ")))))
+    return events
+
+def test_script_streaming():
+    print("\n" + "="*70)
+    print("TESTING STREAMED LESSON GENERATION")
+    print("="*70)
+
+    engine = ai.ai_engine
+    saved = (ai.openai, engine.use_openai, engine.cache)
+    fake = FakeChatCompletion()
+    ai.openai = SimpleNamespace(ChatCompletion=fake)
+    engine.use_openai = True
+    try:
+        # ========== TEST 1: Stream matches the blocking call ==========
+        print("\n✅ Test 1 - Streamed pieces join to the full lesson:")
+        engine.cache = LLMCache(os.path.join(tempfile.mkdtemp(), 'cache.db'), max_bytes=0)
+        pieces = list(engine.enhance_script_stream("Fractions", "Maths"))
+        assert len(pieces) > 3
+        assert "".join(pieces) == engine.enhance_script("Fractions", "Maths")
+        assert pieces[0].endswith("Subject: Maths\n\nIntroduction")
+        assert "Practice!\n\n=====" in "".join(pieces)
+        print(f"   {len(pieces)} pieces, whitespace trimmed like the blocking call")
+
+        # ========== TEST 2: Cached and fallback ==========
+        print("\n✅ Test 2 - Cached and fallback lessons stream:")
+        engine.cache = LLMCache(os.path.join(tempfile.mkdtemp(), 'cache.db'))
+        first = "".join(engine.enhance_script_stream("Fractions", "Maths"))
+        calls = fake.calls
+        cached = list(engine.enhance_script_stream("Fractions", "Maths"))
+        assert "".join(cached) == first and fake.calls == calls and len(cached) == 2
+        assert engine.enhance_script("Fractions", "Maths") == first and fake.calls == calls
+
+        engine.use_openai = False
+        fallback = list(engine.enhance_script_stream("Fractions", "Maths"))
+        assert "".join(fallback) == engine.enhance_script("Fractions", "Maths") and len(fallback) > 10
+        engine.use_openai = True
+        print(f"   Cache hit served without the API; fallback in {len(fallback)} lines")
+
+        with temporary_database(), app.app_context():
+            trainer = User(name="Stream Trainer", email="stream_trainer@test.com",
+                           password=generate_password_hash("password123"), role="trainer")
+            course = Course(title="Streaming Course", description="Streamed lesson test")
+            db.session.add_all([trainer, course])
+            db.session.commit()
+
+            client = app.test_client()
+            assert client.post(f"/upload_script/{course.id}/stream",
+                               data={"script": "x"}).data.decode() == "Unauthorized Access"
+            with client.session_transaction() as sess:
+                sess["user_id"] = trainer.id
+                sess["role"] = "trainer"
+            assert "/stream" in client.get(f"/upload_script/{course.id}").data.decode()
+
+            # ========== TEST 3: Time to first byte ==========
+            print("\n✅ Test 3 - First byte arrives before the model finishes:")
+            engine.cache = LLMCache(os.path.join(tempfile.mkdtemp(), 'cache.db'))
+            fake.delay = 0.05
+            started = time.perf_counter()
+            response = client.post(f"/upload_script/{course.id}/stream", data={"script": "Streamed fractions"},
+                                   buffered=False)
+            assert response.mimetype == "text/event-stream"
+            chunks = iter(response.response)
+            next(chunks)
+            first_byte = time.perf_counter() - started
+            body = "".join(chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in chunks)
+            total = time.perf_counter() - started
+            response.close()
+            fake.delay = 0.0
+            assert first_byte < 0.1 and total > len(LESSON_PIECES) * 0.05
+            print(f"   First byte after {first_byte * 1000:.1f} ms, full lesson after {total * 1000:.0f} ms")
+
+            # ========== TEST 4: Saved on completion ==========
+            print("\n✅ Test 4 - Script saved once the stream completes:")
+            events = _events(body)
+            text = "".join(data["text"] for event, data in events if event == "message")
+            assert events[-1][0] == "done"
+            script = db.session.get(Script, events[-1][1]["script_id"])
+            assert script.course_id == course.id and script.original_script == "Streamed fractions"
+            assert script.ai_script == text == engine.enhance_script("Streamed fractions")
+            print(f"   Script #{script.id} saved with {len(text)} characters")
+    finally:
+        ai.openai, engine.use_openai, engine.cache = saved
+
+    print("\n" + "="*70)
+    print("✅ ALL STREAMED LESSON TESTS PASSED!")
+    print("="*70)
+
+if __name__ == "__main__":
+    test_script_streaming()